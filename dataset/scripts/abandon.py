@@ -0,0 +1,239 @@
+import argparse
+from typing import List, Optional, Sequence
+import numpy as np
+
+from postprocess_yolov8 import class_mask, class_table
+
+# Logique "objet abandonné": objet immobile au-delà d'un seuil de temps sans personne à proximité
+# Entrée par frame: pistes (K,7) [x1, y1, x2, y2, track_id, score, cls] (sortie de tracking.ByteTracker)
+# et l'horodatage t (secondes). Tous les seuils sont en secondes: le résultat ne dépend pas de la
+# cadence, ni des frames sautées par le MotionGate.
+#
+# États par objet (tableaux indexés par track_id, triés):
+#   MOVING      dérive > tolérance depuis le point d'ancrage -> chrono d'immobilité remis à zéro
+#   ATTENDED    immobile, personne à moins de person_radius
+#   UNATTENDED  immobile, plus personne à proximité depuis unattended_since
+#   ABANDONED   immobile >= stationary_s ET sans personne >= unattended_s (alerte émise une fois)
+# Événements: 'owner_left' (ATTENDED -> UNATTENDED après avoir été accompagné),
+#             'abandoned', 'cleared' (fin d'alerte: retour d'une personne, reprise du mouvement ou disparition).
+# Proximité personne: grille spatiale de pas person_radius, seules les 3x3 cellules voisines
+# sont testées -> O(N) par frame au lieu de O(N x P).
+
+MOVING, ATTENDED, UNATTENDED, ABANDONED = 0, 1, 2, 3
+STATE_NAMES = ('moving', 'attended', 'unattended', 'abandoned')
+
+
+class PersonGrid:
+    def __init__(self, centers: np.ndarray, cell: float):
+        self.cell = float(cell)
+        g = np.floor(centers / self.cell).astype(np.int64)
+        keys = self._key(g[:, 0], g[:, 1])
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.pts = centers[order]
+
+    @staticmethod
+    def _key(gx: np.ndarray, gy: np.ndarray) -> np.ndarray:
+        # cellules décalées pour rester positives (coordonnées jusqu'à +-2^20 cellules)
+        return (gx + (1 << 20)) * (1 << 21) + (gy + (1 << 20))
+
+    def any_within(self, q: np.ndarray, radius: float) -> np.ndarray:
+        # q: (N,2) -> (N,) bool, au moins une personne à distance <= radius (radius <= cell)
+        hit = np.zeros(q.shape[0], dtype=bool)
+        if self.keys.size == 0 or q.shape[0] == 0:
+            return hit
+        g = np.floor(q / self.cell).astype(np.int64)
+        r2 = radius * radius
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                k = self._key(g[:, 0] + dx, g[:, 1] + dy)
+                lo = np.searchsorted(self.keys, k, side='left')
+                cnt = np.searchsorted(self.keys, k, side='right') - lo
+                total = int(cnt.sum())
+                if total == 0:
+                    continue
+                qi = np.repeat(np.arange(q.shape[0]), cnt)
+                # indices des personnes de chaque plage [lo, lo+cnt) mises bout à bout
+                starts = np.repeat(lo - np.concatenate([[0], np.cumsum(cnt)[:-1]]), cnt)
+                pi = starts + np.arange(total)
+                d = self.pts[pi] - q[qi]
+                ok = (d * d).sum(axis=1) <= r2
+                hit[qi[ok]] = True
+        return hit
+
+
+class AbandonEngine:
+    def __init__(self, stationary_s: float = 10.0, unattended_s: float = 5.0, person_radius: float = 150.0,
+                 drift_px: float = 10.0, drift_ratio: float = 0.1, forget_s: float = 3.0,
+                 person_classes: Sequence[int] = (), object_classes: Optional[Sequence[int]] = None):
+        # drift: tolérance = max(drift_px, drift_ratio * diagonale de la boîte)
+        # forget_s: durée sans voir une piste avant de l'oublier (piste perdue par le tracker)
+        # object_classes: None = toute classe qui n'est pas une personne
+        self.stationary_s = stationary_s
+        self.unattended_s = unattended_s
+        self.person_radius = person_radius
+        self.drift_px = drift_px
+        self.drift_ratio = drift_ratio
+        self.forget_s = forget_s
+        self.person_classes = np.asarray(person_classes, dtype=np.int64)
+        self.object_classes = None if object_classes is None else np.asarray(object_classes, dtype=np.int64)
+        # tables par classe: partage personnes / objets par simple indexation à chaque frame
+        self._person_lut = class_table(self.person_classes)
+        self._object_lut = None if object_classes is None else class_table(self.object_classes)
+        self.reset()
+
+    def reset(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.box = np.zeros((0, 4), dtype=np.float32)
+        self.anchor = np.zeros((0, 2))
+        self.still_since = np.zeros(0)
+        self.alone_since = np.full(0, np.nan)
+        self.last_seen = np.zeros(0)
+        self.was_attended = np.zeros(0, dtype=bool)
+        self.state = np.zeros(0, dtype=np.int8)
+        self.events_total = 0
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    def _split(self, tracks: np.ndarray):
+        cls = tracks[:, 6].astype(np.int64)
+        is_person = class_mask(cls, self._person_lut)
+        is_obj = ~is_person
+        if self._object_lut is not None:
+            is_obj &= class_mask(cls, self._object_lut)
+        return tracks[is_person], tracks[is_obj]
+
+    def _add(self, ids: np.ndarray, boxes: np.ndarray, centers: np.ndarray, t: float):
+        n = ids.size
+        self.ids = np.concatenate([self.ids, ids])
+        self.box = np.concatenate([self.box, boxes.astype(np.float32)])
+        self.anchor = np.concatenate([self.anchor, centers])
+        self.still_since = np.concatenate([self.still_since, np.full(n, t)])
+        self.alone_since = np.concatenate([self.alone_since, np.full(n, np.nan)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(n, t)])
+        self.was_attended = np.concatenate([self.was_attended, np.zeros(n, dtype=bool)])
+        self.state = np.concatenate([self.state, np.full(n, MOVING, dtype=np.int8)])
+        order = np.argsort(self.ids, kind='stable')
+        self._take(order)
+
+    def _take(self, idx: np.ndarray):
+        for name in ('ids', 'box', 'anchor', 'still_since', 'alone_since', 'last_seen', 'was_attended', 'state'):
+            setattr(self, name, getattr(self, name)[idx])
+
+    def _events(self, kind: str, rows: np.ndarray, t: float, reason: str = '') -> List[dict]:
+        evs = []
+        for i in rows:
+            ev = {'type': kind, 'track_id': int(self.ids[i]), 't': float(t),
+                  'box': [float(v) for v in self.box[i]],
+                  'stationary_s': float(t - self.still_since[i])}
+            if not np.isnan(self.alone_since[i]):
+                ev['unattended_s'] = float(t - self.alone_since[i])
+            if reason:
+                ev['reason'] = reason
+            evs.append(ev)
+        self.events_total += len(evs)
+        return evs
+
+    def update(self, tracks: np.ndarray, t: float) -> List[dict]:
+        # tracks: (K,7) pistes actives à l'instant t (secondes) -> liste d'événements émis
+        tracks = np.asarray(tracks, dtype=np.float32).reshape(-1, 7)
+        persons, objs = self._split(tracks)
+        events = []
+
+        ids = objs[:, 4].astype(np.int64)
+        boxes = objs[:, :4]
+        centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1).astype(np.float64)
+        pos = np.searchsorted(self.ids, ids)
+        known = (pos < self.ids.size) & (self.ids[np.minimum(pos, max(self.ids.size - 1, 0))] == ids) if self.ids.size else np.zeros(ids.size, bool)
+        if (~known).any():
+            self._add(ids[~known], boxes[~known], centers[~known], t)
+            pos = np.searchsorted(self.ids, ids)
+        rows = pos
+        self.box[rows] = boxes
+        self.last_seen[rows] = t
+
+        # immobilité avec tolérance de dérive
+        diag = np.hypot(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        tol = np.maximum(self.drift_px, self.drift_ratio * diag)
+        drift = np.hypot(*(centers - self.anchor[rows]).T) if rows.size else np.zeros(0)
+        moved = drift > tol
+        mv = rows[moved]
+        alerted = mv[self.state[mv] == ABANDONED]
+        events += self._events('cleared', alerted, t, 'moved')
+        self.anchor[mv] = centers[moved]
+        self.still_since[mv] = t
+        self.alone_since[mv] = np.nan
+        self.was_attended[mv] = False
+        self.state[mv] = MOVING
+
+        # proximité personne (grille spatiale)
+        if persons.shape[0]:
+            pc = np.stack([(persons[:, 0] + persons[:, 2]) / 2, (persons[:, 1] + persons[:, 3]) / 2], axis=1).astype(np.float64)
+            near = PersonGrid(pc, self.person_radius).any_within(centers, self.person_radius)
+        else:
+            near = np.zeros(rows.size, dtype=bool)
+
+        st = rows[~moved]
+        near_st = near[~moved]
+        # retour d'une personne près d'un objet non surveillé / abandonné
+        back = st[near_st & (self.state[st] == ABANDONED)]
+        events += self._events('cleared', back, t, 'person_returned')
+        att = st[near_st]
+        self.state[att] = ATTENDED
+        self.was_attended[att] = True
+        self.alone_since[att] = np.nan
+
+        alone = st[~near_st]
+        newly = alone[np.isnan(self.alone_since[alone])]
+        self.alone_since[newly] = t
+        owner_left = newly[self.was_attended[newly]]
+        events += self._events('owner_left', owner_left, t)
+        self.state[alone[self.state[alone] < UNATTENDED]] = UNATTENDED
+
+        cand = alone[self.state[alone] == UNATTENDED]
+        trig = cand[(t - self.still_since[cand] >= self.stationary_s) & (t - self.alone_since[cand] >= self.unattended_s)]
+        self.state[trig] = ABANDONED
+        events += self._events('abandoned', trig, t)
+
+        # pistes disparues depuis plus de forget_s: oubliées (alerte levée si besoin)
+        gone = np.flatnonzero(t - self.last_seen > self.forget_s)
+        if gone.size:
+            events += self._events('cleared', gone[self.state[gone] == ABANDONED], t, 'gone')
+            keep = np.ones(self.ids.size, dtype=bool)
+            keep[gone] = False
+            self._take(np.flatnonzero(keep))
+        return events
+
+    def states(self, track_ids: np.ndarray) -> np.ndarray:
+        # état courant (MOVING..ABANDONED) des track_ids donnés, -1 si inconnu (personne, classe ignorée)
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        out = np.full(track_ids.size, -1, dtype=np.int8)
+        if self.ids.size == 0 or track_ids.size == 0:
+            return out
+        pos = np.minimum(np.searchsorted(self.ids, track_ids), self.ids.size - 1)
+        ok = self.ids[pos] == track_ids
+        out[ok] = self.state[pos[ok]]
+        return out
+
+    def abandoned(self) -> np.ndarray:
+        # (M,5) [x1, y1, x2, y2, track_id] des objets actuellement en alerte
+        m = self.state == ABANDONED
+        return np.concatenate([self.box[m], self.ids[m, None].astype(np.float32)], axis=1)
+
+
+def add_abandon_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--abandon', action='store_true', help='Logique objet abandonné (active --track)')
+    ap.add_argument('--stationary-s', type=float, default=10.0, help='Durée d\'immobilité avant alerte (s)')
+    ap.add_argument('--unattended-s', type=float, default=5.0, help='Durée sans personne à proximité avant alerte (s)')
+    ap.add_argument('--person-radius', type=float, default=150.0, help='Rayon de proximité personne (pixels)')
+    ap.add_argument('--drift-px', type=float, default=10.0, help='Dérive tolérée du centre (pixels)')
+    ap.add_argument('--person-classes', type=int, nargs='*', default=[], help='Ids de classe "personne" (vide pour un modèle mono-classe objet)')
+
+
+def abandon_from_args(args) -> Optional[AbandonEngine]:
+    if not getattr(args, 'abandon', False):
+        return None
+    return AbandonEngine(stationary_s=args.stationary_s, unattended_s=args.unattended_s,
+                         person_radius=args.person_radius, drift_px=args.drift_px,
+                         person_classes=args.person_classes)
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import cv2
+import numpy as np
+
+# Inférence hors ligne par lots sur des dossiers complets (re-scoring d'archives)
+# - décodage (imread) + letterbox + quantification dans un pool de threads, deux lots en avance
+#   sur l'inférence (cv2 relâche le GIL) ; un Preprocessor par thread
+# - un invoke() par lot de B images (entrée redimensionnée par Detector.set_batch)
+# - décodage + NMS vectorisés sur toute la sortie (B, C, N) (Detector.postprocess_batch)
+# - annotation + écriture des images (et labels YOLO txt) renvoyées au pool, sous outdir (et
+#   outdir/labels) avec le chemin relatif au dossier source: sous-dossiers conservés
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def list_images(source: str, max_images: int = 0) -> List[str]:
+    # dossier (récursif) ou image seule, ordre déterministe ; max_images = 0 -> toutes
+    if os.path.isfile(source):
+        return [source]
+    paths = []
+    for root, _, files in os.walk(source):
+        paths.extend(os.path.join(root, f) for f in files if os.path.splitext(f)[1].lower() in IMG_EXTS)
+    paths.sort()
+    return paths[:max_images] if max_images else paths
+
+
+class _Loader:
+    def __init__(self, det, rgb: bool):
+        self.det = det
+        self.rgb = rgb
+        self._local = threading.local()
+
+    def __call__(self, path: str):
+        im = cv2.imread(path)
+        if im is None:
+            return path, None, None
+        pre = getattr(self._local, 'pre', None)
+        if pre is None:
+            pre = self._local.pre = self.det.new_preprocessor()
+        src = cv2.cvtColor(im, cv2.COLOR_BGR2RGB) if self.rgb else im
+        # copie: le tenseur du Preprocessor est réutilisé par la tâche suivante du même thread
+        return path, im, pre(src)[0].copy()
+
+
+def output_name(path: str, root: str = '') -> str:
+    # chemin de sortie relatif: relatif à root (dossier source), sinon nom de fichier seul
+    if root and os.path.isdir(root):
+        return os.path.relpath(path, root)
+    return os.path.basename(path)
+
+
+def save_result(path: str, im: np.ndarray, d, outdir: str, color: Tuple[int, int, int], save_txt: bool, root: str = ''):
+    for b, s in zip(d.boxes, d.scores):
+        x1, y1, x2, y2 = map(int, b.tolist())
+        cv2.rectangle(im, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(im, f"obj {s:.2f}", (x1, max(0, y1 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    rel = output_name(path, root)
+    out = os.path.join(outdir, rel)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    cv2.imwrite(out, im)
+    if save_txt:
+        # format YOLO: cls cx cy w h conf (normalisés)
+        h, w = im.shape[:2]
+        b = d.boxes.astype(np.float64)
+        xywh = np.stack([(b[:, 0] + b[:, 2]) / 2 / w, (b[:, 1] + b[:, 3]) / 2 / h,
+                         (b[:, 2] - b[:, 0]) / w, (b[:, 3] - b[:, 1]) / h], axis=1)
+        txt = os.path.join(outdir, 'labels', os.path.splitext(rel)[0] + '.txt')
+        os.makedirs(os.path.dirname(txt), exist_ok=True)
+        with open(txt, 'w', encoding='utf-8') as f:
+            for c, row, s in zip(d.classes, xywh, d.scores):
+                f.write(f"{int(c)} {row[0]:.6f} {row[1]:.6f} {row[2]:.6f} {row[3]:.6f} {s:.5f}\n")
+
+
+def run_directory(det, paths: List[str], outdir: str, batch: int = 8, workers: int = 4,
+                  color: Tuple[int, int, int] = (0, 165, 255), rgb: bool = True, save_txt: bool = False,
+                  root: str = '') -> dict:
+    # rgb: les scripts images (PIL historiquement) passent du RGB au modèle
+    # root: dossier source (SOURCE), pour garder les sous-dossiers dans outdir
+    os.makedirs(outdir, exist_ok=True)
+    batch = det.set_batch(max(1, batch))
+    load = _Loader(det, rgb)
+    infer_ms, n_done, n_bad, n_batches = [], 0, 0, 0
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()
+        saves = deque()
+        it = iter(paths)
+
+        def refill():
+            while len(pending) < 3 * batch:
+                p = next(it, None)
+                if p is None:
+                    return
+                pending.append(pool.submit(load, p))
+
+        refill()
+        while pending:
+            items = []
+            while pending and len(items) < batch:
+                path, im, row = pending.popleft().result()
+                if im is None:
+                    print(f"[WARN] Image illisible: {path}")
+                    n_bad += 1
+                    continue
+                items.append((path, im, row))
+            refill()
+            if not items:
+                continue
+            t0 = time.perf_counter()
+            raw = det.invoke_batch([r for _, _, r in items])
+            infer_ms.append((time.perf_counter() - t0) * 1000)
+            dets = det.postprocess_batch(raw, [im.shape[:2] for _, im, _ in items])
+            for (path, im, _), d in zip(items, dets):
+                saves.append(pool.submit(save_result, path, im, d, outdir, color, save_txt, root))
+            while len(saves) > 4 * batch:
+                saves.popleft().result()
+            n_done += len(items)
+            n_batches += 1
+            if n_batches % 10 == 0:
+                print(f"[INFO] {n_done}/{len(paths)} images")
+        while saves:
+            saves.popleft().result()
+    wall = time.perf_counter() - t_start
+    st = {
+        'images': n_done,
+        'unreadable': n_bad,
+        'batch': batch,
+        'wall_s': wall,
+        'img_per_s': n_done / wall if wall > 0 else 0.0,
+        'infer_ms_per_batch': float(np.mean(infer_ms)) if infer_ms else 0.0,
+    }
+    print(f"[STATS] images={n_done} batch={batch} {st['img_per_s']:.1f} img/s invoke={st['infer_ms_per_batch']:.1f} ms/lot wall={wall:.1f} s")
+    return st
@@ -0,0 +1,172 @@
+import os
+import json
+import random
+import hashlib
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# Cache disque des tenseurs de calibration pour la quantification statique (ONNX / TFLite)
+# - chaque image est décodée + letterboxée une seule fois, dans un pool de threads (cv2 relâche le
+#   GIL), directement dans un tableau uint8 (N, 3, S, S) NCHW RGB: <cache_dir>/calib_<empreinte>.npy
+# - empreinte: SHA1 de (chemins, tailles, mtimes, imgsz, couleur de padding, interpolation, version)
+#   -> même liste + mêmes paramètres = réutilisation, sans décodage ; sinon reconstruction
+# - lecture par np.memmap: les lots sont servis en float32 /255, NCHW (ONNX) ou NHWC (TFLite),
+#   préparés à l'avance dans un thread (batches(prefetch=...))
+# - uint8 plutôt que float32: 4x moins de disque, valeurs identiques après /255
+# Même fichier pour quantize_int8_onnx.py et tflite_int8_quantize.py (même imgsz, même liste).
+# Letterbox identique à l'inférence (preprocess.Preprocessor: cv2 INTER_LINEAR, padding centré).
+#   python dataset/scripts/calib_cache.py --calib valid/images --imgsz 640 --calib-max 200
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+CACHE_VERSION = 1
+INTERP = {'linear': cv2.INTER_LINEAR, 'area': cv2.INTER_AREA, 'cubic': cv2.INTER_CUBIC}
+
+
+def list_calib_images(source: str, max_images: int = 0, seed: Optional[int] = 0) -> List[str]:
+    # source: dossier (non récursif) ou liste .txt (make_calib_list.py), une image par ligne
+    # ordre déterministe: tri puis mélange à graine fixe (seed=None: ordre trié)
+    if os.path.isfile(source):
+        with open(source, 'r', encoding='utf-8') as f:
+            paths = [ln.strip() for ln in f if ln.strip()]
+    else:
+        paths = sorted(os.path.join(source, f) for f in os.listdir(source)
+                       if os.path.splitext(f)[1].lower() in IMG_EXTS)
+        if seed is not None:
+            random.Random(seed).shuffle(paths)
+    return paths[:max_images] if max_images else paths
+
+
+def letterbox_rgb(path: str, imgsz: int, color=(114, 114, 114), interp: str = 'linear') -> Optional[np.ndarray]:
+    # -> (3, S, S) uint8 RGB, ou None si l'image est illisible
+    im = cv2.imread(path, cv2.IMREAD_COLOR)
+    if im is None:
+        return None
+    h, w = im.shape[:2]
+    r = min(imgsz / w, imgsz / h)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    if (nw, nh) != (w, h):
+        im = cv2.resize(im, (nw, nh), interpolation=INTERP[interp])
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    out = np.empty((3, imgsz, imgsz), dtype=np.uint8)
+    out[:] = np.asarray(color, dtype=np.uint8)[:, None, None]
+    out[:, top:top + nh, left:left + nw] = im[..., ::-1].transpose(2, 0, 1)
+    return out
+
+
+def fingerprint(paths: Sequence[str], imgsz: int, color=(114, 114, 114), interp: str = 'linear') -> str:
+    h = hashlib.sha1(json.dumps({'v': CACHE_VERSION, 'imgsz': imgsz, 'color': list(color), 'interp': interp}).encode())
+    for p in paths:
+        try:
+            st = os.stat(p)
+            h.update(f"{os.path.abspath(p)}|{st.st_size}|{st.st_mtime_ns}\n".encode('utf-8'))
+        except OSError:
+            h.update(f"{os.path.abspath(p)}|missing\n".encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class CalibCache:
+    def __init__(self, paths: Sequence[str], imgsz: int, cache_dir: str = 'runs/calib_cache',
+                 color=(114, 114, 114), interp: str = 'linear', workers: int = 0):
+        if interp not in INTERP:
+            raise ValueError(f"Interpolation inconnue: {interp}")
+        self.paths = list(paths)
+        self.imgsz = imgsz
+        self.key = fingerprint(self.paths, imgsz, color, interp)
+        self.path = os.path.join(cache_dir, f'calib_{self.key}.npy')
+        self.built = False
+        if not os.path.exists(self.path):
+            os.makedirs(cache_dir, exist_ok=True)
+            self._build(color, interp, workers or os.cpu_count() or 1)
+            self.built = True
+        with open(self.path + '.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.data = np.load(self.path, mmap_mode='r')
+        # lignes des images illisibles exclues du service
+        self.valid = np.asarray(self.meta['valid'], dtype=np.int64)
+
+    def _build(self, color, interp, workers):
+        n, s = len(self.paths), self.imgsz
+        tmp = self.path + f'.{os.getpid()}.tmp'
+        arr = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=(n, 3, s, s))
+        ok = np.zeros(n, dtype=bool)
+
+        def load(i, arr=arr):
+            # arr lié en argument: `del load, arr` libère le memmap avant os.replace (Windows)
+            row = letterbox_rgb(self.paths[i], s, color, interp)
+            if row is not None:
+                arr[i] = row
+                ok[i] = True
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(load, range(n)))
+        arr.flush()
+        del load, arr
+        for i in np.flatnonzero(~ok):
+            print(f"[WARN] Image de calibration illisible: {self.paths[i]}")
+        meta = {'version': CACHE_VERSION, 'imgsz': s, 'color': list(color), 'interp': interp,
+                'paths': self.paths, 'valid': np.flatnonzero(ok).tolist()}
+        # en-tête JSON écrit avant le .npy: un .npy présent a toujours ses métadonnées
+        with open(self.path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.path)
+
+    def __len__(self) -> int:
+        return int(self.valid.size)
+
+    def batch(self, start: int, size: int = 1, layout: str = 'nchw') -> np.ndarray:
+        # lot [start, start+size) en float32 /255 (dernier lot éventuellement plus court)
+        x = self.data[self.valid[start:start + size]].astype(np.float32)
+        x *= np.float32(1.0 / 255.0)
+        return x if layout == 'nchw' else np.ascontiguousarray(x.transpose(0, 2, 3, 1))
+
+    def batches(self, size: int = 1, layout: str = 'nchw', prefetch: int = 2, limit: int = 0) -> Iterator[np.ndarray]:
+        # ordre du cache (déterministe) ; prefetch > 0: lots suivants préparés dans un thread
+        # (lecture memmap + conversion float) pendant que le quantizer traite le lot courant
+        # limit: seulement les `limit` premières images (0 = toutes)
+        n = min(len(self), limit) if limit else len(self)
+        jobs = [(i, min(size, n - i)) for i in range(0, n, size)]
+        if prefetch <= 0:
+            for i, k in jobs:
+                yield self.batch(i, k, layout)
+            return
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = deque()
+            it = iter(jobs)
+            for i, k in itertools.islice(it, prefetch + 1):
+                pending.append(pool.submit(self.batch, i, k, layout))
+            while pending:
+                x = pending.popleft().result()
+                job = next(it, None)
+                if job is not None:
+                    pending.append(pool.submit(self.batch, job[0], job[1], layout))
+                yield x
+
+
+def add_calib_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--calib', default='valid/images', help='Dossier d\'images ou liste .txt (make_calib_list.py)')
+    ap.add_argument('--calib-max', type=int, default=200, help='Images de calibration (0 = toutes)')
+    ap.add_argument('--calib-seed', type=int, default=0, help='Graine du tirage des images d\'un dossier')
+    ap.add_argument('--calib-cache', default='runs/calib_cache', help='Dossier du cache des tenseurs de calibration')
+    ap.add_argument('--calib-workers', type=int, default=0, help='Threads de pré-traitement (0 = nb de cœurs)')
+
+
+def calib_from_args(args, imgsz: int) -> CalibCache:
+    paths = list_calib_images(args.calib, args.calib_max, args.calib_seed)
+    if not paths:
+        raise SystemExit(f"[ERREUR] Aucune image de calibration: {args.calib}")
+    return CalibCache(paths, imgsz, args.calib_cache, workers=args.calib_workers)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Pré-calcule le cache des tenseurs de calibration INT8')
+    ap.add_argument('--imgsz', type=int, default=640)
+    add_calib_args(ap)
+    a = ap.parse_args()
+    c = calib_from_args(a, a.imgsz)
+    print(f"[CALIB] {c.path} images={len(c)}/{len(c.paths)} {'construit' if c.built else 'réutilisé'}")
@@ -0,0 +1,561 @@
+import os
+import time
+import argparse
+from typing import Optional, Sequence, Tuple
+import numpy as np
+
+from postprocess_yolov8 import REG_MAX, STRIDES, DFLDecoder, QuantizedDecoder, batched_nms, decode_yolov8_batch, decode_yolov8_output, n_anchors, scale_coords
+from preprocess import Preprocessor, invalidate
+
+# Interface commune des backends d'inférence YOLOv8 (sans NMS dans le graphe)
+#   det = create_detector(args)           # ou TFLiteDetector / OnnxDetector / ReplayDetector
+#   d = det.detect(frame)                  # Detections en coordonnées image
+#   boxes, scores, cls = det.infer(crop)   # espace réseau (imgsz), ex. tuiles ROI
+# Multi-classes: classes = argmax des scores, seuils par classe (det.class_conf, --class-conf),
+# NMS par classe (batched_nms, décalage de coordonnées) sauf det.agnostic (--agnostic-nms).
+#   det.set_batch(8); dets = det.detect_batch(frames)   # traitement hors ligne par lots
+# L'introspection du modèle (layout NCHW/NHWC, quantification entrée/sortie, transposition
+# de la sortie) est faite une fois au chargement (ModelInfo) ; la boucle par frame ne fait
+# plus que: écrire l'entrée -> invoke -> déquantifier/décoder -> NMS -> coordonnées image.
+# Un Detector n'est pas thread-safe: une instance par thread d'inférence.
+
+
+class Detections:
+    __slots__ = ('boxes', 'scores', 'classes', 'pre_ms', 'infer_ms', 'post_ms')
+
+    def __init__(self, boxes: np.ndarray, scores: np.ndarray, classes: Optional[np.ndarray] = None,
+                 pre_ms: float = 0.0, infer_ms: float = 0.0, post_ms: float = 0.0):
+        self.boxes = boxes  # (N,4) float32 xyxy
+        self.scores = scores  # (N,)
+        self.classes = np.zeros(scores.shape[0], dtype=np.int32) if classes is None else classes
+        self.pre_ms = pre_ms
+        self.infer_ms = infer_ms
+        self.post_ms = post_ms
+
+    def __len__(self) -> int:
+        return self.scores.shape[0]
+
+    @classmethod
+    def empty(cls) -> 'Detections':
+        return cls(np.zeros((0, 4), np.float32), np.zeros((0,), np.float32))
+
+
+HEADS = ('auto', 'decoded', 'raw')
+
+
+def resolve_head(model: str, head: str = 'auto', meta: Optional[dict] = None) -> str:
+    # auto: métadonnée 'yolo_head' (ONNX exporté par export_raw_head.py) ou nom de fichier *rawhead*
+    if head != 'auto':
+        return head
+    if (meta or {}).get('yolo_head') == 'raw' or 'rawhead' in os.path.basename(model or '').lower():
+        return 'raw'
+    return 'decoded'
+
+
+class ModelInfo:
+    # Paramètres du modèle figés au chargement
+    # - nombre d'ancres attendu déduit de imgsz (strides 8/16/32: 8400 en 640, 3549 en 416, 2100 en 320),
+    #   ce qui fixe l'axe des ancres de la sortie ((1, C, N) ou (1, N, C)) et donc nc
+    # - chemin de décodage choisi une fois (float, octets bruts quantifiés, tête brute DFL):
+    #   decode() / decode_batch() / output() n'ont plus de test par frame
+    # head='raw': sortie = tête brute (DFL + logits de classe), décodée en NumPy (DFLDecoder)
+    def __init__(self, in_shape: Sequence[int], in_dtype, in_quant, out_shape: Sequence[int], out_dtype, out_quant,
+                 head: str = 'decoded'):
+        self.in_shape = tuple(int(v) for v in in_shape)
+        if len(self.in_shape) != 4:
+            raise ValueError(f"Unsupported input rank: {self.in_shape}")
+        self.nchw = self.in_shape[1] == 3 and self.in_shape[3] != 3
+        self.imgsz = self.in_shape[2] if self.nchw else self.in_shape[1]
+        self.in_dtype = np.dtype(in_dtype)
+        self.in_quant = tuple(in_quant) if in_quant is not None else (0.0, 0)
+        self.out_shape = tuple(int(v) for v in out_shape)
+        if len(self.out_shape) != 3:
+            raise ValueError(f"Unsupported output rank: {self.out_shape}")
+        self.out_dtype = np.dtype(out_dtype)
+        self.dequant = self.out_dtype in (np.uint8, np.int8)
+        s, z = tuple(out_quant) if out_quant is not None else (0.0, 0)
+        self.out_scale = np.float32(s if s != 0 else 1.0)
+        self.out_zero = np.float32(z)
+        self.anchors = n_anchors(self.imgsz)
+        # (1, N, C) -> (1, C, N) attendu par les décodeurs ; axe des ancres repéré par leur nombre
+        if self.out_shape[2] == self.anchors:
+            self.transpose = False
+        elif self.out_shape[1] == self.anchors:
+            self.transpose = True
+        else:
+            raise ValueError(f"Sortie {self.out_shape}: {self.anchors} ancres attendues pour imgsz={self.imgsz} "
+                             f"(strides {'/'.join(map(str, STRIDES))})")
+        # sortie quantifiée: seuillage sur les octets bruts, déquantification des seules ancres retenues
+        self.qdecoder = QuantizedDecoder(self.out_scale, self.out_zero, self.out_dtype) if self.dequant else None
+        self.head = head
+        self.dfl = None
+        c = self.out_shape[2] if self.transpose else self.out_shape[1]
+        # nombre de classes: C = 4 + nc (boîtes décodées) ou 4 * REG_MAX + nc (tête brute)
+        self.nc = c - (4 * REG_MAX if head == 'raw' else 4)
+        if self.nc < 1:
+            raise ValueError(f"Sortie {self.out_shape}: {c} canaux, trop peu pour une tête {head}")
+        if head == 'raw':
+            self.dfl = DFLDecoder(self.imgsz, nc=self.nc, qdecoder=self.qdecoder)
+            self.dfl.check(self.anchors)
+        self._compile()
+
+    def _compile(self):
+        # fonctions par frame spécialisées: vue (B, C, N) de la sortie brute + décodeur
+        cn = (lambda raw: np.transpose(raw, (0, 2, 1))) if self.transpose else (lambda raw: raw)
+        if self.dequant:
+            zero, scale = self.out_zero, self.out_scale
+            self.output = lambda raw: cn((raw.astype(np.float32) - zero) * scale)
+        else:
+            self.output = cn
+        if self.dfl is not None:
+            dec, dec_batch, view = self.dfl, self.dfl.batch, cn
+        elif self.qdecoder is not None:
+            dec, dec_batch, view = self.qdecoder, self.qdecoder.batch, cn
+        else:
+            dec, dec_batch, view = decode_yolov8_output, decode_yolov8_batch, self.output
+        # decode(raw, conf): sortie brute (1, ...) -> boxes xyxy (espace réseau), scores, classes au-dessus
+        # de conf (scalaire ou tableau (nc,) de seuils par classe) ; decode_batch: + indice d'image
+        self.decode = lambda raw, conf: dec(view(raw), conf)
+        self.decode_batch = lambda raw, conf: dec_batch(view(raw), conf)
+
+    def input_detail(self, index=None) -> dict:
+        return {'index': index, 'shape': self.in_shape, 'dtype': self.in_dtype.type, 'quantization': self.in_quant}
+
+    def __str__(self) -> str:
+        return (f"input={self.in_shape} {'NCHW' if self.nchw else 'NHWC'} {self.in_dtype} quant={self.in_quant} | "
+                f"output={self.out_shape} ancres={self.anchors} nc={self.nc} {self.out_dtype} quant=({float(self.out_scale)}, {int(self.out_zero)})"
+                f"{' transposée' if self.transpose else ''}{' tête brute (DFL NumPy)' if self.dfl is not None else ''}")
+
+
+class Detector:
+    backend = 'base'
+
+    def __init__(self, conf: float = 0.25, iou: float = 0.45):
+        self.conf = conf
+        self.iou = iou
+        self.info = None
+        self._pre = {}
+        self.batch = 1
+        self.timing = {'pre_ms': 0.0, 'infer_ms': 0.0, 'post_ms': 0.0}
+        # record_conf: si défini, detect() garde aussi les candidats avant NMS (score >= record_conf,
+        # coordonnées image) dans self.candidates, pour rejouer conf / NMS hors ligne (replay.py)
+        self.record_conf = None
+        self.candidates = None
+        # class_conf: {classe: seuil} (les autres classes gardent conf) ; agnostic: NMS toutes classes confondues
+        self.class_conf = {}
+        self.agnostic = False
+        self._thr = {}
+
+    @property
+    def imgsz(self) -> int:
+        return self.info.imgsz
+
+    @property
+    def nc(self) -> int:
+        return self.info.nc
+
+    def thresholds(self, conf: Optional[float] = None):
+        # seuil transmis au décodeur: conf, ou tableau (nc,) si des seuils par classe sont définis
+        conf = self.conf if conf is None else conf
+        if not self.class_conf:
+            return conf
+        key = (conf, tuple(sorted(self.class_conf.items())))
+        thr = self._thr.get(key)
+        if thr is None:
+            bad = [c for c in self.class_conf if not 0 <= c < self.nc]
+            if bad:
+                raise ValueError(f"Seuils pour des classes absentes du modèle (nc={self.nc}): {bad}")
+            thr = self._thr[key] = np.full(self.nc, conf, dtype=np.float32)
+            for c, v in self.class_conf.items():
+                thr[c] = v
+        return thr
+
+    def nms(self, boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, batch_idx: Optional[np.ndarray] = None):
+        # NMS par classe (décalage de coordonnées, un seul appel) sauf avec agnostic
+        return batched_nms(boxes, scores, self.iou, classes=None if self.agnostic else classes, batch_idx=batch_idx)
+
+    def reset(self):
+        # état par vidéo: aucun pour un modèle (voir ReplayDetector)
+        pass
+
+    def preprocessor(self, slot: str = 'main') -> Preprocessor:
+        # Un Preprocessor par "slot" (image entière, tuiles ROI...): chacun garde sa géométrie
+        pre = self._pre.get(slot)
+        if pre is None:
+            pre = self._pre[slot] = Preprocessor(self.info.imgsz, self.info.input_detail(self._input_index()))
+        return pre
+
+    def _input_index(self):
+        return None
+
+    # Étapes élémentaires (utilisées séparément par le bench):
+    #   resized = preprocessor(slot).resize(frame) -> fill(resized, slot) -> raw = invoke() -> info.decode(raw, conf)
+    def fill(self, resized: np.ndarray, slot: str = 'main'):
+        raise NotImplementedError
+
+    def invoke(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def infer(self, frame: np.ndarray, slot: str = 'main') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # -> boxes xyxy dans l'espace réseau (imgsz x imgsz), scores, classes, après NMS
+        t0 = time.perf_counter()
+        self.fill(self.preprocessor(slot).resize(frame), slot)
+        t1 = time.perf_counter()
+        raw = self.invoke()
+        t2 = time.perf_counter()
+        thr = self.thresholds()
+        if self.record_conf is None:
+            boxes, scores, classes = self.info.decode(raw, thr)
+        else:
+            boxes, scores, classes = self.info.decode(raw, min(float(np.min(thr)), self.record_conf))
+            self.candidates = (boxes, scores, classes)
+            m = scores >= (thr if np.ndim(thr) == 0 else thr[classes])
+            boxes, scores, classes = boxes[m], scores[m], classes[m]
+        if boxes.size:
+            keep = self.nms(boxes, scores, classes)
+            boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+        t3 = time.perf_counter()
+        self.timing['pre_ms'] = (t1 - t0) * 1000
+        self.timing['infer_ms'] = (t2 - t1) * 1000
+        self.timing['post_ms'] = (t3 - t2) * 1000
+        return boxes, scores, classes
+
+    def detect(self, frame: np.ndarray, slot: str = 'main', idx: Optional[int] = None) -> Detections:
+        # frame: HxWx3 uint8, transmise telle quelle au modèle (BGR OpenCV dans les scripts vidéo)
+        # idx: numéro de frame source (1..N), ignoré par les modèles (voir ReplayDetector)
+        boxes, scores, classes = self.infer(frame, slot)
+        if boxes.size:
+            t0 = time.perf_counter()
+            boxes = scale_coords((self.imgsz, self.imgsz), boxes.copy(), (frame.shape[0], frame.shape[1]))
+            self.timing['post_ms'] += (time.perf_counter() - t0) * 1000
+        if self.record_conf is not None and self.candidates[0].size:
+            cb, cs, cc = self.candidates
+            self.candidates = (scale_coords((self.imgsz, self.imgsz), cb.copy(), (frame.shape[0], frame.shape[1])), cs, cc)
+        return Detections(boxes, scores, classes, **self.timing)
+
+    # Mode batch: l'entrée est redimensionnée à (B, ...) ; chaque image est préparée par un
+    # Preprocessor indépendant (new_preprocessor(), un par thread de décodage), les lignes sont
+    # copiées dans le tenseur batch, puis décodage + NMS vectorisés sur toute la sortie (B, C, N).
+    def set_batch(self, batch: int) -> int:
+        # -> taille de batch effective (1 si le modèle ne l'accepte pas)
+        return 1
+
+    def new_preprocessor(self) -> Preprocessor:
+        return Preprocessor(self.info.imgsz, self.info.input_detail())
+
+    def invoke_batch(self, rows) -> np.ndarray:
+        # rows: liste de tenseurs (1, ...) (len <= batch) -> sortie brute (len, ...)
+        raise NotImplementedError
+
+    def postprocess_batch(self, raw: np.ndarray, shapes) -> list:
+        # raw: sortie brute (B, ...) ; shapes: [(h, w)] des images d'origine -> [Detections]
+        t0 = time.perf_counter()
+        n = len(shapes)
+        boxes, scores, classes, bi = self.info.decode_batch(raw[:n], self.thresholds())
+        if boxes.size:
+            keep = self.nms(boxes, scores, classes, batch_idx=bi)
+            boxes, scores, classes, bi = boxes[keep], scores[keep], classes[keep], bi[keep]
+            order = np.argsort(bi, kind='stable')
+            boxes, scores, classes, bi = boxes[order], scores[order], classes[order], bi[order]
+            # letterbox inverse par boîte (gain / padding / clip de son image)
+            hw = np.asarray(shapes, dtype=np.float64)[bi]
+            gain = np.minimum(self.imgsz / hw[:, 0], self.imgsz / hw[:, 1])
+            pad = ((self.imgsz - hw[:, 1] * gain) / 2, (self.imgsz - hw[:, 0] * gain) / 2)
+            boxes = scale_coords((self.imgsz, self.imgsz), boxes.copy(), None, gain=gain, pad=pad,
+                                 clip_shape=(hw[:, 0], hw[:, 1]))
+        bounds = np.searchsorted(bi, np.arange(n + 1))
+        post_ms = (time.perf_counter() - t0) * 1000
+        return [Detections(boxes[a:b], scores[a:b], classes[a:b], post_ms=post_ms / max(n, 1))
+                for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def detect_batch(self, frames) -> list:
+        # Version séquentielle (un Preprocessor par ligne) ; voir batch_infer.py pour le décodage parallèle
+        out = []
+        for i in range(0, len(frames), self.batch):
+            chunk = frames[i:i + self.batch]
+            rows = []
+            for j, f in enumerate(chunk):
+                pre = self._pre.get(f'batch{j}')
+                if pre is None:
+                    pre = self._pre[f'batch{j}'] = self.new_preprocessor()
+                rows.append(pre(f)[0])
+            t0 = time.perf_counter()
+            raw = self.invoke_batch(rows)
+            infer_ms = (time.perf_counter() - t0) * 1000
+            dets = self.postprocess_batch(raw, [f.shape[:2] for f in chunk])
+            for d in dets:
+                d.infer_ms = infer_ms / len(chunk)
+            out.extend(dets)
+        return out
+
+    def describe(self) -> str:
+        return f"[INFO] Backend={self.backend} {self.info}"
+
+
+def _tflite_api():
+    # tensorflow complet en priorité (poste de dev), sinon tflite_runtime (cible embarquée)
+    try:
+        import tensorflow as tf
+        return tf.lite.Interpreter, getattr(getattr(tf.lite, 'experimental', None), 'load_delegate', None)
+    except ImportError:
+        from tflite_runtime.interpreter import Interpreter, load_delegate
+        return Interpreter, load_delegate
+
+
+class TFLiteDetector(Detector):
+    backend = 'tflite'
+
+    def __init__(self, model: str, conf: float = 0.25, iou: float = 0.45, threads: Optional[int] = None,
+                 providers: Sequence[str] = (), imgsz: Optional[int] = None, head: str = 'auto'):
+        # providers: bibliothèques de délégués TFLite (.so, ex. NPU / GPU), dans l'ordre de préférence
+        # imgsz: redimensionne l'entrée (resize_tensor_input) si le modèle l'accepte, sinon ValueError
+        # head: 'raw' pour un modèle coupé avant DFL (auto: nom de fichier *rawhead*)
+        super().__init__(conf, iou)
+        Interpreter, load_delegate = _tflite_api()
+        kwargs = {'model_path': model}
+        if threads:
+            kwargs['num_threads'] = threads
+        if providers:
+            if load_delegate is None:
+                raise RuntimeError("Délégués TFLite non disponibles dans cette installation")
+            kwargs['experimental_delegates'] = [load_delegate(p) for p in providers]
+        self.model = model
+        self.interpreter = Interpreter(**kwargs)
+        self.interpreter.allocate_tensors()
+        inp = self.interpreter.get_input_details()[0]
+        if imgsz:
+            shape = [int(v) for v in inp['shape']]
+            nchw = shape[1] == 3 and shape[3] != 3
+            want = [1, 3, imgsz, imgsz] if nchw else [1, imgsz, imgsz, 3]
+            if shape != want:
+                try:
+                    self.interpreter.resize_tensor_input(inp['index'], want, strict=False)
+                    self.interpreter.allocate_tensors()
+                except (RuntimeError, ValueError) as e:
+                    raise ValueError(f"{model}: entrée {shape} non redimensionnable en {want} ({e})") from e
+                inp = self.interpreter.get_input_details()[0]
+        out = self.interpreter.get_output_details()[0]
+        self._in_index = inp['index']
+        self._out_index = out['index']
+        self.info = ModelInfo(inp['shape'], inp['dtype'], inp.get('quantization'),
+                              out['shape'], out['dtype'], out.get('quantization'), head=resolve_head(model, head))
+
+    def _input_index(self):
+        return self._in_index
+
+    def fill(self, resized, slot='main'):
+        # écriture directe dans le buffer d'entrée de l'interpreter
+        self.preprocessor(slot).fill_into(self.interpreter, resized)
+
+    def invoke(self):
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._out_index)
+
+    def _resize_input(self, batch: int):
+        shape = list(self.info.in_shape)
+        shape[0] = batch
+        self.interpreter.resize_tensor_input(self._in_index, shape, strict=False)
+        self.interpreter.allocate_tensors()
+        invalidate(self.interpreter)
+
+    def set_batch(self, batch):
+        if batch == self.batch:
+            return batch
+        try:
+            self._resize_input(batch)
+        except (RuntimeError, ValueError) as e:
+            print(f"[WARN] {self.model}: batch {batch} refusé ({e}), batch 1")
+            self._resize_input(1)
+            batch = 1
+        self.batch = batch
+        return batch
+
+    def invoke_batch(self, rows):
+        buf = self.interpreter.tensor(self._in_index)()
+        np.concatenate(rows, axis=0, out=buf[:len(rows)])
+        del buf
+        # entrée écrasée hors Preprocessor: le prochain fill() doit repeindre le padding
+        invalidate(self.interpreter)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._out_index)[:len(rows)]
+
+
+_ORT_DTYPES = {
+    'tensor(float)': np.float32,
+    'tensor(float16)': np.float16,
+    'tensor(uint8)': np.uint8,
+    'tensor(int8)': np.int8,
+}
+
+
+class OnnxDetector(Detector):
+    backend = 'onnx'
+
+    def __init__(self, model: str, conf: float = 0.25, iou: float = 0.45, threads: Optional[int] = None,
+                 providers: Sequence[str] = (), imgsz: int = 640, head: str = 'auto'):
+        # providers: execution providers ONNX Runtime, filtrés selon ceux disponibles (CPU en dernier recours)
+        # imgsz: utilisé seulement si les dimensions d'entrée du modèle sont dynamiques
+        # head: 'raw' pour un modèle coupé avant DFL (auto: métadonnée yolo_head ou nom *rawhead*)
+        super().__init__(conf, iou)
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        if threads:
+            so.intra_op_num_threads = threads
+            so.inter_op_num_threads = 1
+        available = ort.get_available_providers()
+        wanted = list(providers) or ['CUDAExecutionProvider', 'CPUExecutionProvider']
+        chosen = [p for p in wanted if p in available] or ['CPUExecutionProvider']
+        self.model = model
+        self.sess = ort.InferenceSession(model, sess_options=so, providers=chosen)
+        self.providers = self.sess.get_providers()
+        inp = self.sess.get_inputs()[0]
+        out = self.sess.get_outputs()[0]
+        self._in_name = inp.name
+        self._out_name = out.name
+        self._dynamic_batch = not (isinstance(inp.shape[0], int) and inp.shape[0] > 0)
+        shape = [d if isinstance(d, int) and d > 0 else None for d in inp.shape]
+        nchw = shape[1] == 3
+        in_shape = (1, 3, shape[2] or imgsz, shape[3] or imgsz) if nchw else (1, shape[1] or imgsz, shape[2] or imgsz, 3)
+        in_dtype = _ORT_DTYPES.get(inp.type)
+        if in_dtype is None:
+            raise ValueError(f"Type d'entrée ONNX non supporté: {inp.type}")
+        # sortie possiblement dynamique: une inférence à blanc fixe sa forme (sert aussi de warmup)
+        probe = self.sess.run([self._out_name], {self._in_name: np.zeros(in_shape, dtype=in_dtype)})[0]
+        meta = self.sess.get_modelmeta().custom_metadata_map
+        self.info = ModelInfo(in_shape, in_dtype, None, probe.shape, probe.dtype, None, head=resolve_head(model, head, meta))
+        self._feed = None
+
+    def fill(self, resized, slot='main'):
+        self._feed = self.preprocessor(slot).fill(resized)
+
+    def invoke(self):
+        return self.sess.run([self._out_name], {self._in_name: self._feed})[0]
+
+    def set_batch(self, batch):
+        if batch > 1 and not self._dynamic_batch:
+            print(f"[WARN] {self.model}: batch fixe à 1 dans le graphe (exporter avec dynamic=True), batch 1")
+            batch = 1
+        self.batch = batch
+        self._batch_buf = np.empty((batch,) + self.info.in_shape[1:], dtype=self.info.in_dtype)
+        return batch
+
+    def invoke_batch(self, rows):
+        buf = self._batch_buf[:len(rows)] if self.batch > 1 else rows[0]
+        if self.batch > 1:
+            np.concatenate(rows, axis=0, out=buf)
+        return self.sess.run([self._out_name], {self._in_name: buf})[0]
+
+    def describe(self) -> str:
+        return super().describe() + f" providers={self.providers}"
+
+
+class ReplayDetector(Detector):
+    backend = 'replay'
+
+    def __init__(self, path: Optional[str] = None, conf: float = 0.25, imgsz: int = 640, latency_ms: float = 0.0):
+        # Rejoue des détections enregistrées (.npz: frame, boxes, scores[, classes]) sans modèle,
+        # cherchées par numéro de frame source (detect(idx=...), frames sautées par le gate comprises),
+        # à défaut par compteur d'appels à detect() ; sans fichier: aucune détection (stub).
+        # Détections en coordonnées image: pas de tuiles ROI (--roi refusé par create_detector)
+        # latency_ms: simule le temps d'inférence d'un backend réel (bench du pipeline)
+        super().__init__(conf, 0.0)
+        self.path = path
+        self.latency_ms = latency_ms
+        nc = 1
+        if path:
+            rec = np.load(path)
+            frames = rec['frame'].astype(np.int64)
+            order = np.argsort(frames, kind='stable')
+            self._frames = frames[order]
+            self._boxes = rec['boxes'][order].astype(np.float32)
+            self._scores = rec['scores'][order].astype(np.float32)
+            self._classes = rec['classes'][order].astype(np.int32) if 'classes' in rec.files else np.zeros(order.size, np.int32)
+            nc = int(self._classes.max()) + 1 if self._classes.size else 1
+        else:
+            self._frames = np.zeros(0, np.int64)
+        self.info = ModelInfo((1, imgsz, imgsz, 3), np.uint8, None, (1, 4 + nc, n_anchors(imgsz)), np.float32, None)
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+
+    def infer(self, frame, slot='main'):
+        raise NotImplementedError("ReplayDetector: détections en coordonnées image uniquement (pas de tuiles ROI)")
+
+    def detect(self, frame, slot='main', idx=None):
+        self.calls += 1
+        i = self.calls if idx is None else int(idx)
+        t0 = time.perf_counter()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        lo, hi = np.searchsorted(self._frames, [i, i + 1])
+        if hi <= lo:
+            d = Detections.empty()
+        else:
+            thr = self.thresholds()
+            cls = self._classes[lo:hi]
+            keep = np.flatnonzero(self._scores[lo:hi] >= (thr if np.ndim(thr) == 0 else thr[cls])) + lo
+            d = Detections(self._boxes[keep], self._scores[keep], self._classes[keep])
+        d.infer_ms = (time.perf_counter() - t0) * 1000
+        self.timing['infer_ms'] = d.infer_ms
+        return d
+
+    def describe(self) -> str:
+        return f"[INFO] Backend=replay source={self.path or 'stub'} latency={self.latency_ms} ms"
+
+
+BACKENDS = {'tflite': TFLiteDetector, 'onnx': OnnxDetector, 'replay': ReplayDetector}
+
+
+def backend_for(model: str, backend: str = 'auto') -> str:
+    if backend != 'auto':
+        return backend
+    ext = os.path.splitext(model or '')[1].lower()
+    if ext == '.onnx':
+        return 'onnx'
+    if ext in ('.npz', ''):
+        return 'replay'
+    return 'tflite'
+
+
+def add_detector_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--backend', choices=['auto'] + list(BACKENDS), default='auto', help='Backend d\'inférence (auto: selon l\'extension du modèle)')
+    ap.add_argument('--threads', type=int, default=0, help='Threads d\'inférence (0 = défaut du backend)')
+    ap.add_argument('--providers', nargs='*', default=[], help='ONNX: execution providers ; TFLite: bibliothèques de délégués')
+    ap.add_argument('--head', choices=HEADS, default='auto', help='Sortie du modèle: decoded (boîtes) ou raw (tête brute, DFL en NumPy) ; auto: métadonnée / nom *rawhead*')
+    ap.add_argument('--class-conf', nargs='*', default=[], metavar='CLS:CONF', help='Seuils de confiance par classe (ex. 0:0.5 3:0.3), --conf pour les autres')
+    ap.add_argument('--agnostic-nms', action='store_true', help='NMS toutes classes confondues (défaut: par classe)')
+    ap.add_argument('--replay-latency-ms', type=float, default=0.0, help='Backend replay: latence d\'inférence simulée')
+
+
+def parse_class_conf(items) -> dict:
+    # ['0:0.5', '3:0.3'] -> {0: 0.5, 3: 0.3}
+    out = {}
+    for it in items:
+        try:
+            c, v = it.split(':')
+            out[int(c)] = float(v)
+        except ValueError:
+            raise ValueError(f"--class-conf: attendu CLASSE:SEUIL, reçu '{it}'")
+    return out
+
+
+def create_detector(args) -> Detector:
+    backend = backend_for(args.model, args.backend)
+    if backend == 'tflite':
+        det = TFLiteDetector(args.model, conf=args.conf, iou=args.iou, threads=args.threads or None, providers=args.providers,
+                             head=args.head)
+    elif backend == 'onnx':
+        det = OnnxDetector(args.model, conf=args.conf, iou=args.iou, threads=args.threads or None,
+                           providers=args.providers, imgsz=args.imgsz, head=args.head)
+    else:
+        if getattr(args, 'roi', False):
+            raise SystemExit("[ERREUR] --roi incompatible avec le backend replay (détections enregistrées en coordonnées image)")
+        det = ReplayDetector(args.model or None, conf=args.conf, imgsz=args.imgsz, latency_ms=args.replay_latency_ms)
+    det.class_conf = parse_class_conf(getattr(args, 'class_conf', []))
+    det.agnostic = getattr(args, 'agnostic_nms', False)
+    det.thresholds()  # classes inconnues du modèle -> erreur au démarrage
+    if det.imgsz != args.imgsz:
+        print(f"[WARN] --imgsz {args.imgsz} ignoré: le modèle attend {det.imgsz}")
+        args.imgsz = det.imgsz
+    return det
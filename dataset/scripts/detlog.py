@@ -0,0 +1,204 @@
+import os
+import json
+import argparse
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+# Journal de détections compact (remplace la ré-inférence quand on ne fait que réajuster des seuils)
+# <base>_det.bin : en-tête 512 o (magic + JSON: fps, source, modèle, dtype) puis enregistrements
+#                  à largeur fixe, un par détection, dans l'ordre des frames
+# <base>_det.bin.idx : même en-tête puis une ligne par frame traitée (y compris sans détection):
+#                  frame, t, premier enregistrement, nombre -> seek par frame ou par temps
+# Écriture incrémentale par blocs (un crash ne perd que le bloc en cours) ; lecture par np.memmap,
+# seules les pages de la plage demandée sont lues.
+
+MAGIC = b'DETLOG1\n'
+HEADER_SIZE = 512
+DET_DTYPE = np.dtype([('frame', '<u4'), ('t', '<f4'), ('track', '<i4'), ('cls', '<i2'),
+                      ('score', '<f2'), ('box', '<i2', (4,))])  # 24 o, box xyxy en pixels image
+INDEX_DTYPE = np.dtype([('frame', '<u4'), ('t', '<f4'), ('start', '<u8'), ('count', '<u4')])
+
+
+def _write_header(f, meta: dict):
+    raw = json.dumps(meta, sort_keys=True).encode('utf-8')
+    if len(MAGIC) + len(raw) + 1 > HEADER_SIZE:
+        raise ValueError("Métadonnées trop longues pour l'en-tête")
+    f.write(MAGIC + raw + b' ' * (HEADER_SIZE - len(MAGIC) - len(raw) - 1) + b'\n')
+
+
+def _read_header(path: str) -> dict:
+    with open(path, 'rb') as f:
+        head = f.read(HEADER_SIZE)
+    if not head.startswith(MAGIC) or len(head) < HEADER_SIZE:
+        raise ValueError(f"Pas un journal de détections: {path}")
+    return json.loads(head[len(MAGIC):].decode('utf-8'))
+
+
+class DetLogWriter:
+    def __init__(self, path: str, fps: float, flush_frames: int = 250, **meta):
+        # meta: informations libres (source, model, conf...) stockées dans l'en-tête
+        self.path = path
+        self.flush_frames = flush_frames
+        meta.update({'fps': fps, 'dtype': DET_DTYPE.descr})
+        self.meta = meta
+        self._f = open(path, 'wb')
+        self._fi = open(path + '.idx', 'wb')
+        _write_header(self._f, meta)
+        _write_header(self._fi, meta)
+        self._recs, self._rows = [], []
+        self.records = 0
+        self.frames = 0
+
+    def write(self, frame: int, t: float, boxes: np.ndarray, scores: np.ndarray,
+              ids: Optional[np.ndarray] = None, classes: Optional[np.ndarray] = None):
+        # ids: -1 sans tracking ; classes: 0 pour un modèle mono-classe
+        n = len(scores)
+        rec = np.zeros(n, dtype=DET_DTYPE)
+        rec['frame'] = frame
+        rec['t'] = t
+        rec['track'] = -1 if ids is None else ids
+        rec['cls'] = 0 if classes is None else classes
+        rec['score'] = scores
+        if n:
+            rec['box'] = np.clip(np.rint(np.asarray(boxes, dtype=np.float32).reshape(-1, 4)), -32768, 32767)
+        row = np.zeros(1, dtype=INDEX_DTYPE)
+        row['frame'], row['t'], row['start'], row['count'] = frame, t, self.records, n
+        self._recs.append(rec)
+        self._rows.append(row)
+        self.records += n
+        self.frames += 1
+        if len(self._rows) >= self.flush_frames:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self._f.write(np.concatenate(self._recs).tobytes())
+            self._fi.write(np.concatenate(self._rows).tobytes())
+            self._recs, self._rows = [], []
+        self._f.flush()
+        self._fi.flush()
+
+    def close(self):
+        if self._f.closed:
+            return
+        self.flush()
+        self._f.close()
+        self._fi.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _memmap(path: str, dtype: np.dtype) -> np.ndarray:
+    n = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if n <= 0:
+        return np.zeros(0, dtype=dtype)
+    # fichier en cours d'écriture: les octets d'un enregistrement incomplet sont ignorés
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(n,))
+
+
+class DetLogReader:
+    def __init__(self, path: str):
+        self.path = path
+        self.meta = _read_header(path)
+        if np.dtype([tuple(d) for d in self.meta['dtype']]) != DET_DTYPE:
+            raise ValueError(f"Format d'enregistrement inattendu: {path}")
+        self.fps = float(self.meta.get('fps', 25.0))
+        self.index = _memmap(path + '.idx', INDEX_DTYPE)
+        self.records = _memmap(path, DET_DTYPE)
+        if self.index.size:
+            # index en avance sur les enregistrements (écriture interrompue): dernières frames ignorées
+            end = self.index['start'].astype(np.int64) + self.index['count']
+            self.index = self.index[:np.searchsorted(end, self.records.size, side='right')]
+
+    def __len__(self) -> int:
+        return self.records.size
+
+    @property
+    def n_frames(self) -> int:
+        return self.index.size
+
+    @property
+    def duration(self) -> float:
+        return float(self.index['t'][-1] - self.index['t'][0]) if self.index.size else 0.0
+
+    def frame_range(self, t0: Optional[float] = None, t1: Optional[float] = None) -> Tuple[int, int]:
+        # -> [i0, i1) lignes d'index des frames avec t0 <= t < t1
+        t = self.index['t']
+        i0 = 0 if t0 is None else int(np.searchsorted(t, t0, side='left'))
+        i1 = t.size if t1 is None else int(np.searchsorted(t, t1, side='left'))
+        return i0, max(i0, i1)
+
+    def _slice(self, i0: int, i1: int) -> np.ndarray:
+        if i1 <= i0:
+            return self.records[:0]
+        a = int(self.index['start'][i0])
+        b = int(self.index['start'][i1 - 1]) + int(self.index['count'][i1 - 1])
+        return self.records[a:b]
+
+    def between(self, t0: Optional[float] = None, t1: Optional[float] = None) -> np.ndarray:
+        # enregistrements (vue memmap) des frames t0 <= t < t1
+        return self._slice(*self.frame_range(t0, t1))
+
+    def frame(self, frame: int) -> np.ndarray:
+        i = int(np.searchsorted(self.index['frame'], frame))
+        if i >= self.index.size or self.index['frame'][i] != frame:
+            return self.records[:0]
+        return self._slice(i, i + 1)
+
+    def iter_frames(self, t0: Optional[float] = None, t1: Optional[float] = None,
+                    chunk: int = 4096) -> Iterator[Tuple[int, float, np.ndarray]]:
+        # -> (frame, t, enregistrements) pour chaque frame traitée, y compris sans détection ;
+        # lecture par blocs de chunk frames (une copie contiguë par bloc, pas par frame)
+        i0, i1 = self.frame_range(t0, t1)
+        for c0 in range(i0, i1, chunk):
+            c1 = min(c0 + chunk, i1)
+            rows = np.array(self.index[c0:c1])
+            recs = np.array(self._slice(c0, c1))
+            offs = rows['start'].astype(np.int64) - int(rows['start'][0])
+            for k in range(rows.size):
+                o = offs[k]
+                yield int(rows['frame'][k]), float(rows['t'][k]), recs[o:o + rows['count'][k]]
+
+
+def to_tracks(recs: np.ndarray) -> np.ndarray:
+    # enregistrements -> (K,7) [x1, y1, x2, y2, track_id, score, cls] (format ByteTracker / AbandonEngine)
+    out = np.empty((recs.size, 7), dtype=np.float32)
+    out[:, :4] = recs['box']
+    out[:, 4] = recs['track']
+    out[:, 5] = recs['score']
+    out[:, 6] = recs['cls']
+    return out
+
+
+def add_detlog_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--no-det-log', action='store_true', help='Ne pas écrire le journal de détections <vidéo>_det.bin')
+
+
+def detlog_path(outdir: str, base: str) -> str:
+    return os.path.join(outdir, base + '_det.bin')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Résumé d\'un journal de détections (_det.bin)')
+    ap.add_argument('path')
+    ap.add_argument('--t0', type=float, default=None)
+    ap.add_argument('--t1', type=float, default=None)
+    ap.add_argument('--conf', type=float, default=0.0, help='Score min. pour le comptage')
+    args = ap.parse_args()
+    log = DetLogReader(args.path)
+    recs = log.between(args.t0, args.t1)
+    i0, i1 = log.frame_range(args.t0, args.t1)
+    keep = recs['score'] >= args.conf
+    print(f"[INFO] {args.path} meta={log.meta.get('source', '')} fps={log.fps:.2f} frames={log.n_frames} "
+          f"detections={len(log)} durée={log.duration:.1f} s")
+    print(f"[RANGE] frames={i1 - i0} detections={int(keep.sum())} (score >= {args.conf}) "
+          f"pistes={np.unique(recs['track'][keep & (recs['track'] >= 0)]).size}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+from ultralytics import YOLO
+from ultralytics.nn.modules import Detect
+import os
+import shutil
+import torch
+
+# Exporte le modèle YOLOv8 coupé avant le décodage de la tête (DFL, ancres, sigmoïde)
+# Sortie (1, 4*16 + nc, N): distributions DFL brutes + logits de classe, N = ancres des 3 échelles
+# (8400 en 640, 2100 en 320). Le décodage est fait en NumPy (postprocess_yolov8.DFLDecoder,
+# --head raw) avec des grilles d'ancres précalculées: le graphe exporté n'a plus les opérations
+# softmax / concat / mul du décodage, coûteuses ou non supportées sur certains NPU.
+# Le nom du fichier contient '_rawhead' (détection automatique, --head auto) ; en ONNX la
+# métadonnée yolo_head=raw est ajoutée. Quantification ensuite avec quantize_int8_onnx.py ou
+# tflite_int8_quantize.py comme pour le modèle complet.
+
+MODEL_PT = os.getenv("MODEL_PT", r"runs/detect/train3/weights/best.pt")
+IMGSZ = int(os.getenv("IMGSZ", "640"))
+FORMAT = os.getenv("FORMAT", "onnx")  # onnx | tf (SavedModel)
+
+
+def raw_forward(self, x):
+    # concat par échelle des sorties cv2 (boîtes DFL) et cv3 (classes), sans _inference()
+    b = x[0].shape[0]
+    return torch.cat([torch.cat((self.cv2[i](x[i]), self.cv3[i](x[i])), 1).view(b, self.no, -1) for i in range(self.nl)], 2)
+
+
+Detect.forward = raw_forward
+m = YOLO(MODEL_PT)
+print(f"Export tête brute ({FORMAT}) depuis: {MODEL_PT} (imgsz={IMGSZ})")
+path = m.export(format=FORMAT, imgsz=IMGSZ, **({"keras": False} if FORMAT == "tf" else {}))
+
+root, ext = os.path.splitext(str(path).rstrip("/\\"))
+dst = f"{root}_rawhead{ext}"
+if os.path.exists(dst):
+    shutil.rmtree(dst) if os.path.isdir(dst) else os.remove(dst)
+shutil.move(str(path), dst)
+if FORMAT == "onnx":
+    import onnx
+    model = onnx.load(dst)
+    onnx.helper.set_model_props(model, {**{p.key: p.value for p in model.metadata_props}, "yolo_head": "raw"})
+    onnx.save(model, dst)
+print("Modèle tête brute:", dst)
@@ -0,0 +1,163 @@
+import os
+import argparse
+from typing import Optional
+import numpy as np
+
+# MotionGate logiciel: référence ("golden model") de l'IP HLS MotionGate
+# N'exécute l'inférence que s'il y a du mouvement ; sinon les dernières détections sont réutilisées.
+#
+# Spécification (entiers uniquement, reproductible bit à bit en HLS avec ap_uint / ap_int):
+#  1. Sommes par canal sur des blocs SxS (S = 2^k), reste de l'image ignoré:
+#                                   SB, SG, SR = somme des B, G, R du bloc
+#  2. Gris du bloc (moyenne + luminance fusionnées, un seul arrondi):
+#                                   g = (29*SB + 150*SG + 77*SR + (128 << 2k)) >> (8 + 2k)
+#  3. Fond de référence:
+#     - mode 'diff':    ref = g de la frame précédente
+#     - mode 'running': bg en virgule fixe Q8.F (F = frac_bits), ref = bg >> F,
+#                       puis bg += ((g << F) - bg) >> alpha_shift   (décalage arithmétique)
+#     À la première frame: bg = g << F (resp. ref = g), et la frame est déclarée "mouvement".
+#  4. changed = nombre de blocs avec |g - ref| > threshold
+#  5. motion = changed >= min_area
+#  6. Décision: infer = motion OU cooldown restant > 0 OU (refresh > 0 et refresh frames
+#     consécutives sautées). Un mouvement recharge cooldown ; une frame sans mouvement
+#     avec cooldown > 0 le décrémente.
+# Le fond est mis à jour à chaque frame, que l'inférence soit lancée ou non.
+
+
+class MotionGate:
+    def __init__(self, scale: int = 8, threshold: int = 20, min_area: int = 4, cooldown: int = 5,
+                 mode: str = 'running', alpha_shift: int = 3, frac_bits: int = 4, refresh: int = 0):
+        if scale < 1 or scale > 128 or scale & (scale - 1):
+            raise ValueError(f"scale doit être une puissance de 2 entre 1 et 128, reçu {scale}")
+        if mode not in ('diff', 'running'):
+            raise ValueError(f"Mode MotionGate inconnu: {mode}")
+        self.scale = scale
+        self.shift = 2 * (scale.bit_length() - 1)
+        self.threshold = threshold
+        self.min_area = min_area
+        self.cooldown = cooldown
+        self.mode = mode
+        self.alpha_shift = alpha_shift
+        self.frac_bits = frac_bits
+        self.refresh = refresh
+        self.reset()
+
+    def reset(self):
+        self.bg = None  # int32 (Q8.F en mode running, uint8 étendu en mode diff)
+        self.mask = None  # dernier masque de blocs en mouvement (bool, taille réduite)
+        self.changed = 0
+        self.cooldown_left = 0
+        self.skipped_run = 0
+        self.frames = 0
+        self.inferred = 0
+
+    def reduce(self, frame_bgr: np.ndarray) -> np.ndarray:
+        # étapes 1 + 2 -> (H/S, W/S) int32
+        # Accumulation ligne par ligne puis colonne par colonne (S additions vectorisées
+        # chacune), bien plus rapide qu'un sum(axis=(1,3)) sur le tableau 5D.
+        s = self.scale
+        h, w = frame_bgr.shape[:2]
+        hs, ws = h // s, w // s
+        rows = np.ascontiguousarray(frame_bgr[:hs * s, :ws * s]).reshape(hs, s, ws * s * 3)
+        acc = rows[:, 0].astype(np.uint16)  # S*255 tient dans 16 bits pour S <= 128
+        for i in range(1, s):
+            acc += rows[:, i]
+        cols = acc.reshape(hs, ws, s, 3)
+        blk = cols[:, :, 0].astype(np.int32)
+        for i in range(1, s):
+            blk += cols[:, :, i]
+        return (29 * blk[..., 0] + 150 * blk[..., 1] + 77 * blk[..., 2] + (128 << self.shift)) >> (8 + self.shift)
+
+    def update(self, frame_bgr: np.ndarray) -> bool:
+        # True = lancer l'inférence sur cette frame
+        g = self.reduce(frame_bgr)
+        self.frames += 1
+        if self.bg is None or self.bg.shape != g.shape:
+            self.bg = g << self.frac_bits if self.mode == 'running' else g
+            self.mask = np.ones(g.shape, dtype=bool)
+            self.changed = int(g.size)
+            motion = True
+        else:
+            if self.mode == 'running':
+                ref = self.bg >> self.frac_bits
+                self.bg = self.bg + (((g << self.frac_bits) - self.bg) >> self.alpha_shift)
+            else:
+                ref = self.bg
+                self.bg = g
+            self.mask = np.abs(g - ref) > self.threshold
+            self.changed = int(np.count_nonzero(self.mask))
+            motion = self.changed >= self.min_area
+        if motion:
+            self.cooldown_left = self.cooldown
+            infer = True
+        elif self.cooldown_left > 0:
+            self.cooldown_left -= 1
+            infer = True
+        else:
+            infer = bool(self.refresh) and self.skipped_run + 1 >= self.refresh
+        self.skipped_run = 0 if infer else self.skipped_run + 1
+        self.inferred += int(infer)
+        return infer
+
+    def stats(self) -> dict:
+        gated = self.frames - self.inferred
+        return {
+            'frames': self.frames,
+            'inferred': self.inferred,
+            'gated': gated,
+            'gated_ratio': gated / self.frames if self.frames else 0.0,
+        }
+
+
+def add_gate_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--motion-gate', action='store_true', help='Sauter l\'inférence sur les frames statiques (réutilise les dernières détections)')
+    ap.add_argument('--gate-mode', choices=['running', 'diff'], default='running', help='Fond moyenné (running) ou frame précédente (diff)')
+    ap.add_argument('--gate-scale', type=int, default=8, help='Facteur de réduction (puissance de 2)')
+    ap.add_argument('--gate-thresh', type=int, default=20, help='Seuil |diff| en niveaux de gris')
+    ap.add_argument('--gate-min-area', type=int, default=4, help='Nb min de blocs changés pour déclarer un mouvement')
+    ap.add_argument('--gate-cooldown', type=int, default=5, help='Frames inférées après la fin du mouvement')
+    ap.add_argument('--gate-alpha-shift', type=int, default=3, help='Vitesse du fond: bg += diff >> alpha_shift')
+    ap.add_argument('--gate-refresh', type=int, default=0, help='Forcer une inférence toutes les N frames sautées (0 = jamais)')
+
+
+def gate_from_args(args) -> Optional[MotionGate]:
+    # --roi a besoin du masque de mouvement: il active aussi le gate
+    if not (getattr(args, 'motion_gate', False) or getattr(args, 'roi', False)):
+        return None
+    return MotionGate(scale=args.gate_scale, threshold=args.gate_thresh, min_area=args.gate_min_area,
+                      cooldown=args.gate_cooldown, mode=args.gate_mode, alpha_shift=args.gate_alpha_shift,
+                      refresh=args.gate_refresh)
+
+
+def dump_golden(args):
+    # Vecteurs de référence pour le testbench C-sim de l'IP: une ligne par frame
+    import cv2
+    args.motion_gate = True
+    gate = gate_from_args(args)
+    cap = cv2.VideoCapture(args.source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Impossible d'ouvrir la source vidéo: {args.source}")
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write('frame,changed,motion,infer\n')
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            infer = gate.update(frame)
+            f.write(f"{gate.frames},{gate.changed},{int(gate.changed >= gate.min_area)},{int(infer)}\n")
+            if args.max_frames and gate.frames >= args.max_frames:
+                break
+    cap.release()
+    st = gate.stats()
+    print(f"[GATE] frames={st['frames']} inferred={st['inferred']} gated={st['gated']} ratio={st['gated_ratio']:.2%}")
+    print(f"[DONE] Vecteurs: {args.out}")
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='MotionGate: génération des vecteurs de référence (golden) pour l\'IP HLS')
+    ap.add_argument('--source', required=True, help='Chemin vidéo')
+    ap.add_argument('--out', default='runs/motion_gate/golden.csv', help='Fichier CSV de sortie')
+    ap.add_argument('--max-frames', type=int, default=0)
+    add_gate_args(ap)
+    dump_golden(ap.parse_args())
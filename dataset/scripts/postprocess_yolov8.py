@@ -1,9 +1,10 @@
 import math
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Sequence
 import numpy as np
 
 # Utilitaires de post-traitement pour YOLOv8 export ONNX sans NMS
-# Gère sorties (1, C, N) où C peut être 5 (xywh+conf unique) ou >=6 (xywh+obj(+classes))
+# Gère sorties (1, C, N), C = 4 + nc (xywh + un score par classe, pas d'objectness en YOLOv8) ;
+# décodeurs -> boîtes, scores et classes (argmax), seuil de confiance global ou par classe
 
 
 def xywh2xyxy(x: np.ndarray) -> np.ndarray:
@@ -15,19 +16,132 @@ def xywh2xyxy(x: np.ndarray) -> np.ndarray:
     return y
 
 
-def nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float) -> List[int]:
-    idxs = scores.argsort()[::-1]
+# Moteur NMS vectorisé
+# - N <= NMS_MATRIX_MAX: matrice IoU (N,N) calculée une fois, puis sélection gloutonne sur booléens
+# - N plus grand: traitement par tuiles de NMS_TILE boîtes triées (mémoire O(tuile * gardées))
+# Les deux chemins donnent exactement les mêmes indices que l'ancienne boucle pop/iou().
+NMS_MATRIX_MAX = 256
+NMS_TILE = 128
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    # boxes1: (N,4), boxes2: (M,4) en xyxy -> (N,M), même formule que iou()
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    inter_w = np.maximum(0.0, np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0]))
+    inter_h = np.maximum(0.0, np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1]))
+    inter = inter_w * inter_h
+    union = area1[:, None] + area2[None, :] - inter + 1e-6
+    return inter / union
+
+
+def _greedy_keep(over: np.ndarray, limit: int) -> List[int]:
+    # over[i, j] = True si i (mieux classée) supprime j ; les lignes sont dans l'ordre des scores
+    n = over.shape[0]
+    suppressed = np.zeros(n, dtype=bool)
     keep = []
-    while idxs.size > 0:
-        i = idxs[0]
+    for i in range(n):
+        if suppressed[i]:
+            continue
         keep.append(i)
-        if idxs.size == 1:
+        if len(keep) >= limit:
             break
-        ious = iou(boxes[i], boxes[idxs[1:]])
-        idxs = idxs[1:][ious <= iou_thres]
+        suppressed[i + 1:] |= over[i, i + 1:]
     return keep
 
 
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float,
+        max_det: Optional[int] = None, max_candidates: Optional[int] = None,
+        tile: Optional[int] = None) -> List[int]:
+    # max_candidates: pré-filtre top-k par score avant NMS (None = toutes les boîtes)
+    # max_det: nombre max de boîtes gardées (None = pas de limite)
+    # tile: forcer la taille de tuile (None = auto selon NMS_MATRIX_MAX)
+    idxs = scores.argsort()[::-1]
+    if max_candidates is not None:
+        idxs = idxs[:max_candidates]
+    n = idxs.size
+    if n == 0:
+        return []
+    limit = n if max_det is None else max_det
+    if limit <= 0:
+        return []
+    b = boxes[idxs]
+    if tile is None:
+        tile = n if n <= NMS_MATRIX_MAX else NMS_TILE
+    # "~(iou <= seuil)" et non "iou > seuil": les NaN suppriment, comme l'ancienne boucle
+    if tile >= n:
+        keep = _greedy_keep(~(box_iou(b, b) <= iou_thres), limit)
+        return idxs[keep].tolist()
+
+    keep = np.empty(0, dtype=np.int64)
+    for start in range(0, n, tile):
+        blk = b[start:start + tile]
+        alive = np.arange(blk.shape[0])
+        if keep.size:
+            alive = alive[(box_iou(blk, b[keep]) <= iou_thres).all(axis=1)]
+            if alive.size == 0:
+                continue
+        sub = blk[alive]
+        k = _greedy_keep(~(box_iou(sub, sub) <= iou_thres), limit - keep.size)
+        keep = np.concatenate([keep, start + alive[k]])
+        if keep.size >= limit:
+            break
+    return idxs[keep].tolist()
+
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float,
+                classes: Optional[np.ndarray] = None, batch_idx: Optional[np.ndarray] = None,
+                max_det: Optional[int] = None, max_candidates: Optional[int] = None) -> List[int]:
+    # NMS indépendant par groupe (classe et/ou image du batch) en un seul appel:
+    # chaque groupe est décalé sur un intervalle de coordonnées disjoint des autres.
+    n = boxes.shape[0]
+    if n == 0:
+        return []
+    keys = np.zeros(n, dtype=np.int64)
+    if batch_idx is not None and classes is not None:
+        classes = np.asarray(classes, dtype=np.int64)
+        keys = np.asarray(batch_idx, dtype=np.int64) * (int(classes.max()) + 1) + classes
+    elif batch_idx is not None:
+        keys = np.asarray(batch_idx)
+    elif classes is not None:
+        keys = np.asarray(classes)
+    keys = keys.reshape(-1).astype(np.int64)
+    if keys.min() == keys.max():
+        return nms(boxes, scores, iou_thres, max_det=max_det, max_candidates=max_candidates)
+    b = boxes[:, :4].astype(np.float64)
+    span = b.max() - b.min() + 1.0
+    shifted = b + (keys * span)[:, None]
+    return nms(shifted, scores, iou_thres, max_det=max_det, max_candidates=max_candidates)
+
+
+def soft_nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float = 0.3, sigma: float = 0.5,
+             score_thres: float = 0.001, method: str = "gaussian") -> Tuple[List[int], np.ndarray]:
+    # Soft-NMS (Bodla et al.): atténue le score des voisins au lieu de les supprimer
+    # method: "gaussian" (exp(-iou^2/sigma)), "linear" (1 - iou au-delà du seuil) ou "hard"
+    if method not in ("gaussian", "linear", "hard"):
+        raise ValueError(f"Méthode soft-NMS inconnue: {method}")
+    scores = scores.astype(np.float32, copy=True)
+    idxs = np.arange(boxes.shape[0])
+    keep = []
+    while idxs.size > 0:
+        j = int(scores[idxs].argmax())
+        i = idxs[j]
+        keep.append(int(i))
+        idxs = np.delete(idxs, j)
+        if idxs.size == 0:
+            break
+        ious = iou(boxes[i], boxes[idxs])
+        if method == "gaussian":
+            decay = np.exp(-(ious * ious) / sigma)
+        elif method == "linear":
+            decay = np.where(ious > iou_thres, 1.0 - ious, 1.0)
+        else:
+            decay = (ious <= iou_thres).astype(np.float32)
+        scores[idxs] *= decay
+        idxs = idxs[scores[idxs] >= score_thres]
+    return keep, scores[keep]
+
+
 def iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
     # box: (4,), boxes: (N,4) in xyxy
     inter_x1 = np.maximum(box[0], boxes[:, 0])
@@ -43,45 +157,266 @@ def iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
     return inter / union
 
 
-def scale_coords(img_shape: Tuple[int, int], boxes: np.ndarray, orig_shape: Tuple[int, int]) -> np.ndarray:
+def _per_box(v, dtype):
+    # scalaire -> float Python (calcul dans le dtype des boîtes), tableau (N,) -> colonne (N,1)
+    if np.ndim(v) == 0:
+        return float(v)
+    return np.asarray(v, dtype=dtype).reshape(-1, 1)
+
+
+def scale_coords(img_shape: Tuple[int, int], boxes: np.ndarray, orig_shape: Tuple[int, int],
+                 offset=None, gain=None, pad=None, clip_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
     # img_shape: (h, w) of network input (e.g., 640x640)
-    # orig_shape: (h0, w0) original image size
-    gain = min(img_shape[0] / orig_shape[0], img_shape[1] / orig_shape[1])
-    pad_w = (img_shape[1] - orig_shape[1] * gain) / 2
-    pad_h = (img_shape[0] - orig_shape[0] * gain) / 2
+    # orig_shape: (h0, w0) original image size (ou taille de la tuile en mode ROI)
+    # gain / pad: letterbox explicite (scalaires ou (N,) par boîte), sinon déduit des shapes
+    # offset: (x0, y0) ou (N,2) -> position de la tuile dans l'image complète
+    # clip_shape: (h, w) de l'image complète pour le clip (défaut: orig_shape)
+    if gain is None:
+        gain = min(img_shape[0] / orig_shape[0], img_shape[1] / orig_shape[1])
+    if pad is None:
+        pad = ((img_shape[1] - orig_shape[1] * gain) / 2, (img_shape[0] - orig_shape[0] * gain) / 2)
+    pad_w = _per_box(pad[0], boxes.dtype)
+    pad_h = _per_box(pad[1], boxes.dtype)
 
     boxes[:, [0, 2]] -= pad_w
     boxes[:, [1, 3]] -= pad_h
-    boxes[:, :4] /= gain
+    boxes[:, :4] /= _per_box(gain, boxes.dtype)
+    if offset is not None:
+        offset = np.asarray(offset, dtype=boxes.dtype).reshape(-1, 2)
+        boxes[:, [0, 2]] += offset[:, :1]
+        boxes[:, [1, 3]] += offset[:, 1:]
 
-    boxes[:, 0] = boxes[:, 0].clip(0, orig_shape[1] - 1)
-    boxes[:, 1] = boxes[:, 1].clip(0, orig_shape[0] - 1)
-    boxes[:, 2] = boxes[:, 2].clip(0, orig_shape[1] - 1)
-    boxes[:, 3] = boxes[:, 3].clip(0, orig_shape[0] - 1)
+    h, w = clip_shape if clip_shape is not None else orig_shape
+    boxes[:, 0] = boxes[:, 0].clip(0, w - 1)
+    boxes[:, 1] = boxes[:, 1].clip(0, h - 1)
+    boxes[:, 2] = boxes[:, 2].clip(0, w - 1)
+    boxes[:, 3] = boxes[:, 3].clip(0, h - 1)
     return boxes
 
 
-def decode_yolov8_output(out: np.ndarray, conf_thres: float = 0.25) -> Tuple[np.ndarray, np.ndarray]:
-    # out: (1, C, N)
+def class_conf(conf_thres, nc: int) -> Tuple[float, Optional[np.ndarray]]:
+    # seuil scalaire ou par classe (nc,) -> (seuil min. pour le pré-filtre, tableau (nc,) ou None)
+    if np.ndim(conf_thres) == 0:
+        return float(conf_thres), None
+    thr = np.asarray(conf_thres, dtype=np.float32).reshape(-1)
+    if thr.size != nc:
+        raise ValueError(f"{thr.size} seuils de confiance pour {nc} classes")
+    return float(thr.min()), thr
+
+
+def class_table(selected: Sequence[int]) -> np.ndarray:
+    # ids de classes -> table booléenne indexée par classe ; dernière case False (classes hors table, -1)
+    sel = np.asarray(selected, dtype=np.int64).reshape(-1)
+    lut = np.zeros(int(sel.max()) + 2 if sel.size else 1, dtype=bool)
+    lut[sel] = True
+    return lut
+
+
+def class_mask(classes: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    # (K,) classes -> (K,) bool, une indexation au lieu de np.isin (partage personnes / objets par frame)
+    return lut[np.clip(np.asarray(classes, dtype=np.int64), -1, lut.size - 1)]
+
+
+def _empty(batch: bool = False):
+    res = (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+    return res + (np.zeros(0, np.int64),) if batch else res
+
+
+def decode_yolov8_output(out: np.ndarray, conf_thres=0.25) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # out: (1, C, N) ou (C, N), C = 4 + nc: [x, y, w, h, score classe 0, ..., score classe nc-1]
+    # conf_thres: scalaire ou tableau (nc,) de seuils par classe -> boxes (K,4) xyxy, scores, classes (argmax)
     if out.ndim == 3:
         out = out[0]
     C, N = out.shape
-    # Cases:
-    # - C == 5: [x,y,w,h,conf] single-class
-    # - C >= 6: [x,y,w,h,obj,(cls...)]
+    floor, thr = class_conf(conf_thres, C - 4)
     if C == 5:
-        xywh = out[:4].T  # (N,4)
         conf = out[4]
-        cls_id = np.zeros_like(conf, dtype=np.int32)
-        conf_mask = conf >= conf_thres
-        boxes = xywh2xyxy(xywh)
-        return boxes[conf_mask], conf[conf_mask]
+        idx = np.flatnonzero(conf >= floor)
+        classes = np.zeros(idx.size, dtype=np.int32)
     else:
-        xywh = out[:4].T
-        obj = out[4]
-        cls = out[5:]
-        cls_scores = cls.max(axis=0)
-        conf = obj * cls_scores
-        conf_mask = conf >= conf_thres
-        boxes = xywh2xyxy(xywh)
-        return boxes[conf_mask], conf[conf_mask]
+        conf = out[4:].max(axis=0)
+        idx = np.flatnonzero(conf >= floor)
+        # argmax seulement sur les ancres retenues
+        classes = out[4:, idx].argmax(axis=0).astype(np.int32)
+    scores = conf[idx]
+    boxes = xywh2xyxy(out[:4, idx].T)
+    if thr is not None:
+        m = scores >= thr[classes]
+        return boxes[m], scores[m], classes[m]
+    return boxes, scores, classes
+
+
+def decode_yolov8_batch(out: np.ndarray, conf_thres=0.25) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # out: (B, C, N) -> boîtes (K,4) xyxy, scores (K,), classes (K,), indice d'image (K,) pour tout le batch
+    # Mêmes cas que decode_yolov8_output ; ordre conservé (image puis ancre) -> batched_nms(batch_idx=...)
+    if out.ndim == 2:
+        out = out[None]
+    C = out.shape[1]
+    floor, thr = class_conf(conf_thres, C - 4)
+    conf = out[:, 4] if C == 5 else out[:, 4:].max(axis=1)
+    bi, ni = np.nonzero(conf >= floor)
+    classes = np.zeros(bi.size, np.int32) if C == 5 else out[bi, 4:, ni].argmax(axis=1).astype(np.int32)
+    boxes, scores = xywh2xyxy(out[bi, :4, ni]), conf[bi, ni]
+    if thr is not None:
+        m = scores >= thr[classes]
+        return boxes[m], scores[m], classes[m], bi[m]
+    return boxes, scores, classes, bi
+
+
+class QuantizedDecoder:
+    # Décodage direct sur une sortie int8 / uint8 (TFLite / ONNX quantifiés), sans déquantifier
+    # tout le tenseur (C, N):
+    # - table de 256 valeurs déquantifiées indexée par l'octet brut ((q - zero) * scale en float32,
+    #   la même formule que ModelInfo.output -> résultats identiques au chemin float)
+    # - conf_thres converti une fois en niveau quantifié (mis en cache par seuil) ; le seuillage
+    #   (max des scores de classe) se fait en entiers sur les octets bruts
+    # - seules les ancres retenues sont déquantifiées (boîte + scores de classe -> argmax)
+    def __init__(self, scale: float, zero: float, dtype):
+        self.dtype = np.dtype(dtype)
+        self.levels = np.arange(256, dtype=np.uint8).view(self.dtype)
+        self.lut = (self.levels.astype(np.float32) - np.float32(zero)) * np.float32(scale)
+        self._thr = {}
+
+    def threshold(self, conf_thres: float) -> Optional[int]:
+        # plus petit niveau brut dont la valeur déquantifiée est >= conf_thres, None si aucun
+        q = self._thr.get(conf_thres, -1)
+        if q == -1:
+            ok = self.levels[self.lut >= conf_thres]
+            q = self._thr[conf_thres] = int(ok.min()) if ok.size else None
+        return q
+
+    def deq(self, q: np.ndarray) -> np.ndarray:
+        return self.lut[q.view(np.uint8)]
+
+    @staticmethod
+    def _xyxy(v: np.ndarray) -> np.ndarray:
+        # lignes x, y, w, h (4+, K) -> (K,4) xyxy, mêmes opérations float32 que xywh2xyxy
+        x, y, hw, hh = v[0], v[1], v[2] / 2, v[3] / 2
+        return np.stack([x - hw, y - hh, x + hw, y + hh], axis=1)
+
+    @staticmethod
+    def _classes(v: np.ndarray, thr: Optional[np.ndarray]):
+        # v: (C, K) déquantifié -> boxes, scores, classes, masque des seuils par classe (None sans)
+        if v.shape[0] == 5:
+            scores, classes = v[4], np.zeros(v.shape[1], np.int32)
+        else:
+            classes = v[4:].argmax(axis=0).astype(np.int32)
+            scores = v[4:].max(axis=0)
+        return QuantizedDecoder._xyxy(v), scores, classes, (None if thr is None else scores >= thr[classes])
+
+    def __call__(self, out: np.ndarray, conf_thres=0.25) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # out: (1, C, N) ou (C, N) brut -> boxes (K,4) xyxy, scores (K,), classes (K,) comme decode_yolov8_output
+        if out.ndim == 3:
+            out = out[0]
+        floor, thr = class_conf(conf_thres, out.shape[0] - 4)
+        q = self.threshold(floor)
+        if q is None:
+            return _empty()
+        best = out[4] if out.shape[0] == 5 else out[4:].max(axis=0)
+        idx = np.flatnonzero(best >= q)
+        boxes, scores, classes, m = self._classes(self.deq(out[:, idx]), thr)  # une seule indexation
+        if m is not None:
+            return boxes[m], scores[m], classes[m]
+        return boxes, scores, classes
+
+    def batch(self, out: np.ndarray, conf_thres=0.25) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # out: (B, C, N) brut -> comme decode_yolov8_batch
+        if out.ndim == 2:
+            out = out[None]
+        floor, thr = class_conf(conf_thres, out.shape[1] - 4)
+        q = self.threshold(floor)
+        if q is None:
+            return _empty(batch=True)
+        best = out[:, 4] if out.shape[1] == 5 else out[:, 4:].max(axis=1)
+        bi, ni = np.nonzero(best >= q)
+        boxes, scores, classes, m = self._classes(self.deq(out[bi, :, ni]).T, thr)
+        if m is not None:
+            return boxes[m], scores[m], classes[m], bi[m]
+        return boxes, scores, classes, bi
+
+
+# Tête brute YOLOv8 (modèle coupé avant DFL / décodage, voir export_raw_head.py)
+# Sortie (B, 4*reg_max + nc, N): 4 côtés x reg_max logits de distribution (DFL), puis logits de classe.
+# Grille d'ancres (centres de cellules) et strides pré-calculés une fois par (imgsz, strides).
+REG_MAX = 16
+STRIDES = (8, 16, 32)
+_ANCHORS = {}
+
+
+def n_anchors(imgsz: int, strides: Tuple[int, ...] = STRIDES) -> int:
+    # nombre d'ancres de la sortie YOLOv8 pour une entrée carrée imgsz (8400 en 640, 2100 en 320)
+    return sum((int(imgsz) // s) ** 2 for s in strides)
+
+
+def make_anchors(imgsz: int, strides: Tuple[int, ...] = STRIDES) -> Tuple[np.ndarray, np.ndarray]:
+    # -> centres (N,2) float32 en unités de cellule (x + 0.5, y + 0.5), stride (N,) float32 ;
+    # ordre des ancres de la tête: échelle par échelle, lignes puis colonnes
+    key = (int(imgsz), tuple(strides))
+    if key not in _ANCHORS:
+        pts, st = [], []
+        for s in strides:
+            n = int(imgsz) // s
+            sy, sx = np.meshgrid(np.arange(n, dtype=np.float32) + 0.5, np.arange(n, dtype=np.float32) + 0.5, indexing='ij')
+            pts.append(np.stack([sx.ravel(), sy.ravel()], axis=1))
+            st.append(np.full(n * n, s, dtype=np.float32))
+        _ANCHORS[key] = (np.concatenate(pts), np.concatenate(st))
+    return _ANCHORS[key]
+
+
+class DFLDecoder:
+    # Décodage NumPy de la tête brute: pré-seuil sur les logits de classe (logit(conf), aucune
+    # sigmoïde sur les N ancres), puis softmax DFL + distances -> boîtes uniquement pour les
+    # ancres retenues. Sortie quantifiée: pré-seuil sur les octets bruts (QuantizedDecoder).
+    def __init__(self, imgsz: int, nc: int, reg_max: int = REG_MAX, strides: Tuple[int, ...] = STRIDES,
+                 qdecoder: Optional['QuantizedDecoder'] = None):
+        self.nc = nc
+        self.reg_max = reg_max
+        self.anchors, self.stride = make_anchors(imgsz, strides)
+        self.qdecoder = qdecoder
+        self.bins = np.arange(reg_max, dtype=np.float32)
+
+    def check(self, n_anchors: int):
+        if self.nc < 1 or n_anchors != self.anchors.shape[0]:
+            raise ValueError(f"Tête brute inattendue: {n_anchors} ancres / {self.nc} classes "
+                             f"(attendu {self.anchors.shape[0]} ancres, {4 * self.reg_max}+nc canaux)")
+
+    def batch(self, out: np.ndarray, conf_thres=0.25) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # out: (B, C, N) brut (entier quantifié ou float) -> boxes (K,4) xyxy (pixels réseau), scores, classes, indice d'image
+        # conf_thres: scalaire ou tableau (nc,) de seuils par classe
+        if out.ndim == 2:
+            out = out[None]
+        nb = 4 * self.reg_max
+        floor, thr = class_conf(conf_thres, self.nc)
+        cls_max = out[:, nb:, :].max(axis=1) if self.nc > 1 else out[:, nb, :]
+        # marge: la vérification exacte sigmoid >= seuil est refaite sur les ancres retenues
+        t = math.log(floor / (1.0 - floor)) - 1e-3 if 0.0 < floor < 1.0 else (-math.inf if floor <= 0 else math.inf)
+        q = self.qdecoder
+        if q is not None:
+            level = q.threshold(t) if t > -math.inf else int(q.levels.min())
+            if level is None:
+                return _empty(batch=True)
+            bi, ni = np.nonzero(cls_max >= level)
+            v = q.deq(out[bi, :, ni])
+        else:
+            bi, ni = np.nonzero(cls_max >= t)
+            v = out[bi, :, ni].astype(np.float32)
+        if self.nc > 1:
+            classes = v[:, nb:].argmax(axis=1).astype(np.int32)
+            logit = v[:, nb:].max(axis=1)
+        else:
+            classes, logit = np.zeros(bi.size, np.int32), v[:, nb]
+        scores = 1.0 / (1.0 + np.exp(-logit))
+        m = scores >= (floor if thr is None else thr[classes])
+        bi, ni, scores, classes, dist = bi[m], ni[m], scores[m], classes[m], v[m, :nb]
+        # DFL: softmax sur reg_max intervalles par côté -> distance attendue (gauche, haut, droite, bas)
+        d = dist.reshape(-1, 4, self.reg_max)
+        d = np.exp(d - d.max(axis=2, keepdims=True))
+        d = (d @ self.bins) / d.sum(axis=2)
+        a = self.anchors[ni]
+        s = self.stride[ni, None]
+        boxes = np.concatenate([a - d[:, :2], a + d[:, 2:]], axis=1) * s
+        return boxes.astype(np.float32), scores.astype(np.float32), classes, bi
+
+    def __call__(self, out: np.ndarray, conf_thres=0.25) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        boxes, scores, classes, _ = self.batch(out[None] if out.ndim == 2 else out[:1], conf_thres)
+        return boxes, scores, classes
@@ -0,0 +1,125 @@
+import weakref
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+# Pré-traitement sans allocation par frame pour l'inférence vidéo YOLOv8
+# - canevas / tenseur d'entrée préalloués, barres de padding repeintes uniquement
+#   quand la résolution source change
+# - resize + normalisation (/255) + quantification fusionnés: une table de 256 valeurs
+#   (LUT) calculée une fois depuis les paramètres `quantization` de l'entrée donne
+#   directement la valeur finale (uint8 / int8 / float32) de chaque pixel
+# Résultat identique, valeur par valeur, à letterbox() + prepare_input() des scripts vidéo.
+
+# Dernier Preprocessor ayant écrit dans chaque interpreter: si un autre (ex. tuiles ROI) a
+# écrit entre-temps, le padding doit être repeint.
+_LAST_WRITER = weakref.WeakKeyDictionary()
+
+
+def invalidate(interpreter):
+    # À appeler après resize_tensor_input + allocate_tensors: buffers réalloués, padding à repeindre
+    _LAST_WRITER.pop(interpreter, None)
+
+
+def build_input_lut(in_dtype, quantization=None) -> np.ndarray:
+    # Même suite d'opérations que prepare_input(), appliquée aux 256 niveaux possibles
+    arr = np.arange(256, dtype=np.uint8).astype(np.float32) / 255.0
+    if in_dtype in (np.uint8, np.int8):
+        scale, zero = quantization if quantization is not None else (0.0, 0)
+        if scale == 0:
+            scale = 1.0
+        q = arr / scale + zero
+        if in_dtype == np.uint8:
+            return np.clip(np.round(q), 0, 255).astype(np.uint8)
+        return np.clip(np.round(q), -128, 127).astype(np.int8)
+    return arr.astype(in_dtype)
+
+
+class Preprocessor:
+    def __init__(self, imgsz: int, inp_detail: dict, color=(114, 114, 114)):
+        in_shape = tuple(int(v) for v in inp_detail['shape'])
+        if len(in_shape) != 4:
+            raise ValueError(f"Unsupported input rank: {in_shape}")
+        self.imgsz = imgsz
+        self.index = inp_detail.get('index')
+        self.nchw = in_shape[1] == 3 and in_shape[2] == imgsz
+        self.dtype = np.dtype(inp_detail['dtype'])
+        self.lut = build_input_lut(inp_detail['dtype'], inp_detail.get('quantization'))
+        self.pad_value = self.lut[np.asarray(color, dtype=np.uint8)]  # (3,) valeur quantifiée des bandes
+        shape = (1, 3, imgsz, imgsz) if self.nchw else (1, imgsz, imgsz, 3)
+        self.tensor = np.empty(shape, dtype=self.dtype)
+        self.src_shape = None
+        self.r, self.left, self.top = 1.0, 0, 0
+        self._resized = None
+        self._mapped = None
+        self._painted = set()  # cibles ('own', 'interp') dont le padding est à jour
+
+    def _set_geometry(self, h: int, w: int):
+        r = min(self.imgsz / w, self.imgsz / h)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        self.src_shape = (h, w)
+        self.r = r
+        self.nw, self.nh = nw, nh
+        self.left = (self.imgsz - nw) // 2
+        self.top = (self.imgsz - nh) // 2
+        self._resized = np.empty((nh, nw, 3), dtype=np.uint8) if (nw, nh) != (w, h) else None
+        self._mapped = np.empty((nh, nw, 3), dtype=self.dtype)
+        self._painted.clear()
+
+    def _region(self, dst: np.ndarray) -> np.ndarray:
+        t, l = self.top, self.left
+        if self.nchw:
+            return dst[0, :, t:t + self.nh, l:l + self.nw]
+        return dst[0, t:t + self.nh, l:l + self.nw]
+
+    def resize(self, frame_bgr: np.ndarray) -> np.ndarray:
+        # Étape 1: géométrie letterbox + resize (uint8) -> zone utile nh x nw
+        if frame_bgr.dtype != np.uint8 or frame_bgr.ndim != 3:
+            raise ValueError(f"Frame uint8 HxWx3 attendue, reçu {frame_bgr.dtype} {frame_bgr.shape}")
+        h, w = frame_bgr.shape[:2]
+        if (h, w) != self.src_shape:
+            self._set_geometry(h, w)
+        if self._resized is None:
+            return frame_bgr
+        return cv2.resize(frame_bgr, (self.nw, self.nh), dst=self._resized, interpolation=cv2.INTER_LINEAR)
+
+    def _fill(self, dst: np.ndarray, src: np.ndarray, target: str):
+        # Étape 2: padding (si besoin) + LUT normalisation/quantification vers dst
+        if target not in self._painted:
+            if self.nchw:
+                dst[0] = self.pad_value[:, None, None]
+            else:
+                dst[0] = self.pad_value
+            self._painted.add(target)
+        region = self._region(dst)
+        if not self.nchw and region.flags.c_contiguous:
+            # Image plus large que haute: la zone utile est contiguë, LUT écrite sur place
+            cv2.LUT(src, self.lut, dst=region)
+        else:
+            cv2.LUT(src, self.lut, dst=self._mapped)
+            region[...] = self._mapped.transpose(2, 0, 1) if self.nchw else self._mapped
+
+    def fill(self, resized: np.ndarray) -> np.ndarray:
+        # resized: sortie de resize() -> tenseur préalloué
+        self._fill(self.tensor, resized, 'own')
+        return self.tensor
+
+    def fill_into(self, interpreter, resized: np.ndarray, index: Optional[int] = None):
+        # Écrit directement dans le buffer d'entrée TFLite (pas de set_tensor / copie).
+        # Les entrées du graphe ne sont jamais réutilisées par l'arène TFLite, le padding
+        # peint une fois reste donc valide entre deux invoke().
+        if _LAST_WRITER.get(interpreter) is not self:
+            self._painted.discard('interp')
+            _LAST_WRITER[interpreter] = self
+        buf = interpreter.tensor(self.index if index is None else index)()
+        self._fill(buf, resized, 'interp')
+        del buf  # aucune référence ne doit survivre jusqu'à invoke()
+
+    def __call__(self, frame_bgr: np.ndarray) -> Tuple[np.ndarray, float, int, int]:
+        # Remplit le tenseur préalloué (à passer à set_tensor / sess.run)
+        self.fill(self.resize(frame_bgr))
+        return self.tensor, self.r, self.left, self.top
+
+    def into(self, interpreter, frame_bgr: np.ndarray, index: Optional[int] = None) -> Tuple[float, int, int]:
+        self.fill_into(interpreter, self.resize(frame_bgr), index)
+        return self.r, self.left, self.top
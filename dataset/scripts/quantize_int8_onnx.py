@@ -1,7 +1,5 @@
 import os
-import glob
-import random
-from typing import List
+from typing import List, Optional, Sequence
 
 import onnx
 from onnxruntime.quantization import (
@@ -11,55 +9,87 @@ from onnxruntime.quantization import (
     QuantType,
     quantize_static,
 )
-from PIL import Image
-import numpy as np
 
-# Minimal preproc matching YOLOv8 default: resize+letterbox to 640, BGR->RGB if needed
+from calib_cache import CalibCache, list_calib_images
+
+# Quantification statique INT8 (QDQ) d'un export ONNX YOLOv8
+# Calibration depuis le cache disque des tenseurs (calib_cache.py): images décodées + letterboxées
+# une seule fois en parallèle, puis servies par memmap ; rewind() ne fait que revenir au début.
+# Re-quantifier avec une autre méthode (CALIB_METHOD=MinMax / Entropy / Percentile / Distribution)
+# ne coûte plus que le temps du quantizer.
+# CALIB_DIR: dossier d'images ou liste .txt (make_calib_list.py) ; tirage déterministe (CALIB_SEED)
+# NODES_EXCLUDE: nœuds laissés en float (précision mixte), liste séparée par des virgules ou
+# fichier .txt un nom par ligne (exclude.txt de tools/quant_sensitivity.py)
 IMG_SIZE = int(os.getenv("IMG_SIZE", "640"))
 CALIB_MAX = int(os.getenv("CALIB_MAX", "200"))
+CALIB_SEED = int(os.getenv("CALIB_SEED", "0"))
+CALIB_CACHE = os.getenv("CALIB_CACHE", r"runs/calib_cache")
+CALIB_WORKERS = int(os.getenv("CALIB_WORKERS", "0"))
+CALIB_BATCH = int(os.getenv("CALIB_BATCH", "1"))  # > 1: modèle exporté en batch dynamique
+CALIB_METHOD = os.getenv("CALIB_METHOD", "Percentile")
+NODES_EXCLUDE = os.getenv("NODES_EXCLUDE", "")
+
 
 class YoloImageFolder(CalibrationDataReader):
-    def __init__(self, folder: str, input_name: str = "images"):
+    def __init__(self, folder: str, input_name: str = "images", batch: int = CALIB_BATCH,
+                 cache: Optional[CalibCache] = None, limit: int = 0, verbose: bool = True):
+        # cache: CalibCache déjà ouvert (balayages, quant_sweep.py) ; sinon construit depuis folder
+        # limit: seulement les `limit` premières images du cache (0 = toutes)
         self.folder = folder
         self.input_name = input_name
-        exts = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
-        files = []
-        for e in exts:
-            files.extend(glob.glob(os.path.join(folder, e)))
-        random.shuffle(files)
-        self.files = files[:CALIB_MAX]
-        self.iter = iter(self.files)
+        self.batch = max(1, batch)
+        self.limit = limit
+        if cache is None:
+            files = list_calib_images(folder, CALIB_MAX, CALIB_SEED)
+            if not files:
+                raise SystemExit(f"[ERREUR] Aucune image de calibration: {folder}")
+            cache = CalibCache(files, IMG_SIZE, CALIB_CACHE, workers=CALIB_WORKERS)
+        self.cache = cache
+        self.files = cache.paths
+        if verbose:
+            print(f"Calib cache: {self.cache.path} ({len(self.cache)} images, "
+                  f"{'construit' if self.cache.built else 'réutilisé'})")
+        self.iter = self.cache.batches(self.batch, limit=limit)
 
     def get_next(self):
-        try:
-            path = next(self.iter)
-        except StopIteration:
-            return None
-        img = Image.open(path).convert("RGB")
-        img = letterbox(img, new_shape=IMG_SIZE)
-        arr = np.asarray(img, dtype=np.float32)
-        arr = arr / 255.0
-        arr = np.transpose(arr, (2, 0, 1))  # HWC -> CHW
-        arr = np.expand_dims(arr, 0)  # NCHW
-        return {self.input_name: arr}
+        arr = next(self.iter, None)  # (B, 3, S, S) float32 [0, 1], lot suivant déjà préparé
+        return None if arr is None else {self.input_name: arr}
+
+    def __len__(self):
+        n = min(len(self.cache), self.limit) if self.limit else len(self.cache)
+        return (n + self.batch - 1) // self.batch
 
     def rewind(self):
-        self.iter = iter(self.files)
+        self.iter = self.cache.batches(self.batch, limit=self.limit)
 
 
-def letterbox(img: Image.Image, new_shape=640, color=(114, 114, 114)) -> Image.Image:
-    w, h = img.size
-    if isinstance(new_shape, int):
-        new_w = new_h = new_shape
-    else:
-        new_w, new_h = new_shape
-    r = min(new_w / w, new_h / h)
-    nw, nh = int(round(w * r)), int(round(h * r))
+def quantize_onnx(model_in: str, model_out: str, reader: CalibrationDataReader, method: str = CALIB_METHOD,
+                  per_channel: bool = True, op_types: Sequence[str] = ("Conv",),
+                  nodes_to_quantize: Optional[Sequence[str]] = None, nodes_to_exclude: Optional[Sequence[str]] = None):
+    # nodes_to_quantize: seulement ces nœuds (analyse de sensibilité) ; nodes_to_exclude: restent en float
+    quantize_static(
+        model_input=model_in,
+        model_output=model_out,
+        calibration_data_reader=reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod[method],
+        op_types_to_quantize=list(op_types),
+        nodes_to_quantize=list(nodes_to_quantize) if nodes_to_quantize else None,
+        nodes_to_exclude=list(nodes_to_exclude) if nodes_to_exclude else None,
+    )
+
 
-    img_resized = img.resize((nw, nh))
-    new_img = Image.new("RGB", (new_w, new_h), color)
-    new_img.paste(img_resized, ((new_w - nw) // 2, (new_h - nh) // 2))
-    return new_img
+def parse_nodes(spec: str) -> List[str]:
+    # 'a,b' ou fichier .txt (une ligne par nœud, # = commentaire)
+    if not spec:
+        return []
+    if os.path.isfile(spec):
+        with open(spec, 'r', encoding='utf-8') as f:
+            return [ln.split('#')[0].strip() for ln in f if ln.split('#')[0].strip()]
+    return [n.strip() for n in spec.split(',') if n.strip()]
 
 
 def main():
@@ -70,21 +100,14 @@ def main():
     onnx_model = onnx.load(model_in)
     sess_input = onnx_model.graph.input[0].name if onnx_model.graph.input else "images"
 
-    print(f"Model: {model_in}\nInput: {sess_input}\nCalib dir: {calib_dir}\nOutput: {model_out}")
+    exclude = parse_nodes(NODES_EXCLUDE)
+    print(f"Model: {model_in}\nInput: {sess_input}\nCalib dir: {calib_dir}\nMethod: {CALIB_METHOD}\nOutput: {model_out}")
+    if exclude:
+        print(f"Float (exclus): {len(exclude)} nœuds")
 
     dr = YoloImageFolder(calib_dir, input_name=sess_input)
 
-    quantize_static(
-        model_input=model_in,
-        model_output=model_out,
-        calibration_data_reader=dr,
-        quant_format=QuantFormat.QDQ,
-        per_channel=True,
-        activation_type=QuantType.QUInt8,
-        weight_type=QuantType.QInt8,
-        calibrate_method=CalibrationMethod.Percentile,
-        op_types_to_quantize=["Conv"],
-    )
+    quantize_onnx(model_in, model_out, dr, nodes_to_exclude=exclude)
     print(f"Saved INT8 model to: {model_out}")
 
 
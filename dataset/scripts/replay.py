@@ -0,0 +1,141 @@
+import os
+import time
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from detlog import DetLogReader, DetLogWriter
+from postprocess_yolov8 import batched_nms
+from tracking import ByteTracker
+from abandon import AbandonEngine
+
+# Rejeu hors ligne: seuils conf / IoU, tracking et logique "abandon" sur des détections enregistrées
+# (aucune inférence) pour régler les faux positifs / négatifs en quelques minutes.
+# Enregistrement pendant run_video / reanalyze (--record), journal <vidéo>_dets.bin (format detlog):
+#   nms  détections après NMS (conf / iou de l'inférence): conf rejouable >= conf enregistrée,
+#        iou rejouable <= iou enregistrée (NMS supplémentaire)
+#   raw  candidats avant NMS (score >= --record-conf): conf >= record_conf et iou quelconques
+# Les journaux _det.bin sans tracking (kind 'nms') sont aussi acceptés ; ceux avec pistes
+# (kind 'tracks') non: ce sont déjà des sorties du tracker.
+# Boîtes int16 et scores float16 dans le journal: à réglages identiques, le rejeu reproduit le
+# passage en ligne aux arrondis près.
+
+RECORD_KINDS = ('off', 'nms', 'raw')
+
+DEFAULTS = {
+    'conf': 0.25,
+    'iou': 0.45,
+    'track_thresh': 0.5,
+    'track_low': 0.1,
+    'track_buffer': 30,
+    'stationary_s': 10.0,
+    'unattended_s': 5.0,
+    'person_radius': 150.0,
+    'drift_px': 10.0,
+    'person_classes': (),
+    'agnostic': False,
+}
+
+
+def add_record_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--record', choices=RECORD_KINDS, default='off',
+                    help='Enregistrer les détections pour le rejeu (nms: après NMS ; raw: candidats avant NMS)')
+    ap.add_argument('--record-conf', type=float, default=0.05, help='--record raw: score min. des candidats enregistrés')
+
+
+def record_kind(args) -> str:
+    kind = getattr(args, 'record', 'off')
+    if kind == 'raw' and getattr(args, 'roi', False):
+        # tuiles ROI: pas de candidats image entière, repli sur les détections fusionnées
+        print("[WARN] --record raw incompatible avec --roi, enregistrement après NMS")
+        return 'nms'
+    return kind
+
+
+def open_record(args, outdir: str, base: str, fps: float, source: str = '') -> Optional[DetLogWriter]:
+    kind = record_kind(args)
+    if kind == 'off':
+        return None
+    raw = kind == 'raw'
+    return DetLogWriter(os.path.join(outdir, base + '_dets.bin'), fps, kind=kind, source=source,
+                        model=os.path.basename(args.model or ''),
+                        conf=min(args.record_conf, args.conf) if raw else args.conf, iou=None if raw else args.iou)
+
+
+def check_params(meta: dict, params: dict) -> List[str]:
+    # -> avertissements pour des réglages non reproductibles à partir de ce journal
+    warn = []
+    kind = meta.get('kind', 'nms')
+    if kind not in ('nms', 'raw'):
+        raise ValueError(f"Journal '{kind}' non rejouable (sorties du tracker): enregistrer avec --record")
+    if params['conf'] < meta.get('conf', 0.0) - 1e-6:
+        warn.append(f"conf {params['conf']} < conf enregistrée {meta.get('conf')}: détections manquantes")
+    return warn
+
+
+class Replayer:
+    def __init__(self, params: Optional[dict] = None):
+        p = dict(DEFAULTS)
+        p.update(params or {})
+        self.params = p
+        self.tracker = ByteTracker(track_thresh=p['track_thresh'], low_thresh=p['track_low'], track_buffer=p['track_buffer'])
+        self.abandon = AbandonEngine(stationary_s=p['stationary_s'], unattended_s=p['unattended_s'],
+                                     person_radius=p['person_radius'], drift_px=p['drift_px'],
+                                     person_classes=p['person_classes'])
+
+    def run(self, log: DetLogReader, t0: Optional[float] = None, t1: Optional[float] = None) -> dict:
+        # -> {'events', 'frames', 'detections', 'wall_s', 'fps', 'warnings'}
+        p = self.params
+        warnings = check_params(log.meta, p)
+        kind = log.meta.get('kind', 'nms')
+        rec_iou = log.meta.get('iou')
+        renms = kind == 'raw' or (rec_iou is not None and p['iou'] < rec_iou)
+        self.tracker.reset()
+        self.abandon.reset()
+        events = []
+        n_frames = n_det = 0
+        last = 0
+        t_start = time.perf_counter()
+        for frame, t, recs in log.iter_frames(t0, t1):
+            recs = recs[recs['score'] >= p['conf']]
+            boxes = recs['box'].astype(np.float32)
+            scores = recs['score'].astype(np.float32)
+            classes = recs['cls'].astype(np.int32)
+            if renms and scores.size > 1:
+                # même NMS que Detector.infer (par classe, sauf agnostic)
+                keep = batched_nms(boxes, scores, p['iou'], classes=None if p['agnostic'] else classes)
+                boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+            dt = frame - last if last else 1
+            last = frame
+            tracks = self.tracker.update(boxes, scores, classes, dt=float(max(dt, 1)))
+            events.extend(self.abandon.update(tracks, t))
+            n_frames += 1
+            n_det += scores.size
+        wall = time.perf_counter() - t_start
+        return {
+            'events': events,
+            'frames': n_frames,
+            'detections': n_det,
+            'wall_s': wall,
+            'fps': n_frames / wall if wall > 0 else 0.0,
+            'warnings': warnings,
+        }
+
+
+def match_alerts(events: Sequence[dict], gt_times: Sequence[float], tol: float) -> Dict[str, int]:
+    # appariement glouton 1-1 des alertes 'abandoned' aux instants vérité terrain (|dt| <= tol)
+    alerts = sorted(ev['t'] for ev in events if ev['type'] == 'abandoned')
+    gt = sorted(gt_times)
+    used = np.zeros(len(alerts), dtype=bool)
+    tp = 0
+    for g in gt:
+        best, best_d = -1, tol
+        for i, a in enumerate(alerts):
+            d = abs(a - g)
+            if not used[i] and d <= best_d:
+                best, best_d = i, d
+        if best >= 0:
+            used[best] = True
+            tp += 1
+    return {'tp': tp, 'fp': len(alerts) - tp, 'fn': len(gt) - tp}
@@ -0,0 +1,118 @@
+import argparse
+from typing import Callable, List, Optional, Tuple
+import cv2
+import numpy as np
+
+from postprocess_yolov8 import batched_nms, scale_coords
+
+# Inférence par régions d'intérêt (ROI) à partir du masque MotionGate
+# - les blocs en mouvement sont regroupés (composantes connexes) en régions, en pixels image
+# - les régions sont empaquetées dans des fenêtres de la taille d'entrée du modèle, découpées
+#   à résolution native (pas de réduction -> meilleur rappel sur les petits sacs)
+# - les détections de chaque tuile reviennent en coordonnées image via scale_coords(offset=...)
+# - hors des tuiles, la scène est statique: les détections précédentes y sont conservées
+# Chaque tuile coûte un invoke() complet: au-delà de max_tiles fenêtres (ou si les fenêtres
+# couvrent presque toute l'image) on repasse sur l'image entière letterboxée.
+
+
+def motion_regions(mask: np.ndarray, scale: int, frame_shape: Tuple[int, int],
+                   margin: int = 16, min_blocks: int = 1) -> np.ndarray:
+    # mask: (H/S, W/S) bool -> (K,4) int32 xyxy en pixels, triées par surface décroissante
+    if mask is None or not mask.any():
+        return np.zeros((0, 4), dtype=np.int32)
+    m = cv2.dilate(mask.astype(np.uint8), np.ones((3, 3), np.uint8))
+    n, _, stats, _ = cv2.connectedComponentsWithStats(m, connectivity=8)
+    stats = stats[1:]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= min_blocks]
+    if stats.shape[0] == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+    h, w = frame_shape
+    x1 = stats[:, cv2.CC_STAT_LEFT] * scale - margin
+    y1 = stats[:, cv2.CC_STAT_TOP] * scale - margin
+    x2 = (stats[:, cv2.CC_STAT_LEFT] + stats[:, cv2.CC_STAT_WIDTH]) * scale + margin
+    y2 = (stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT]) * scale + margin
+    regions = np.stack([x1.clip(0, w), y1.clip(0, h), x2.clip(0, w), y2.clip(0, h)], axis=1).astype(np.int32)
+    area = (regions[:, 2] - regions[:, 0]) * (regions[:, 3] - regions[:, 1])
+    return regions[np.argsort(-area, kind='stable')]
+
+
+def _window(box: np.ndarray, frame_shape: Tuple[int, int], tile: int) -> Tuple[int, int, int, int]:
+    # Fenêtre carrée >= tile centrée sur la boîte, recalée dans l'image
+    h, w = frame_shape
+    side = max(tile, int(box[2] - box[0]), int(box[3] - box[1]))
+    ww, wh = min(side, w), min(side, h)
+    cx, cy = (box[0] + box[2]) // 2, (box[1] + box[3]) // 2
+    x0 = int(np.clip(cx - ww // 2, 0, w - ww))
+    y0 = int(np.clip(cy - wh // 2, 0, h - wh))
+    return x0, y0, x0 + ww, y0 + wh
+
+
+def pack_tiles(regions: np.ndarray, frame_shape: Tuple[int, int], tile: int) -> List[Tuple[int, int, int, int]]:
+    # Glouton: une région rejoint la première tuile dont l'englobant reste <= tile x tile
+    groups = []
+    for r in regions:
+        for g in groups:
+            u = (min(g[0], r[0]), min(g[1], r[1]), max(g[2], r[2]), max(g[3], r[3]))
+            if u[2] - u[0] <= tile and u[3] - u[1] <= tile:
+                g[:] = u
+                break
+        else:
+            groups.append(list(r))
+    return [_window(np.asarray(g), frame_shape, tile) for g in groups]
+
+
+def roi_detect(frame: np.ndarray, mask: np.ndarray, scale: int, imgsz: int,
+               detect_tile: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray, np.ndarray]],
+               prev_boxes: np.ndarray, prev_scores: np.ndarray, prev_classes: np.ndarray, iou_thres: float,
+               max_tiles: int = 2, max_cover: float = 0.6, margin: int = 16,
+               min_blocks: int = 1, agnostic: bool = False) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, list]]:
+    # detect_tile(crop) -> (boxes xyxy dans l'espace réseau imgsz, scores, classes) après NMS
+    # Retourne (boxes image, scores, classes, fenêtres) ou None -> l'appelant traite l'image entière
+    # (aucune région: frame déclenchée par le gate sans mouvement, refresh / cooldown -> image entière,
+    # les détections reportées sont revérifiées)
+    h, w = frame.shape[:2]
+    regions = motion_regions(mask, scale, (h, w), margin=margin, min_blocks=min_blocks)
+    if regions.shape[0] == 0:
+        return None
+    windows = pack_tiles(regions, (h, w), imgsz)
+    cover = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in windows) / float(h * w)
+    if len(windows) > max_tiles or cover >= max_cover:
+        return None
+    all_boxes, all_scores, all_classes = [], [], []
+    carried = False
+    if prev_boxes is not None and len(prev_boxes):
+        # détections précédentes gardées si leur centre est hors de toutes les tuiles
+        cx = (prev_boxes[:, 0] + prev_boxes[:, 2]) / 2
+        cy = (prev_boxes[:, 1] + prev_boxes[:, 3]) / 2
+        win = np.asarray(windows, dtype=np.float32)
+        inside = ((cx[:, None] >= win[:, 0]) & (cx[:, None] < win[:, 2]) &
+                  (cy[:, None] >= win[:, 1]) & (cy[:, None] < win[:, 3])).any(axis=1)
+        all_boxes.append(prev_boxes[~inside])
+        all_scores.append(prev_scores[~inside])
+        all_classes.append(prev_classes[~inside])
+        carried = bool((~inside).any())
+    for x0, y0, x1, y1 in windows:
+        boxes, scores, classes = detect_tile(frame[y0:y1, x0:x1])
+        if boxes.size:
+            boxes = scale_coords((imgsz, imgsz), boxes.copy(), (y1 - y0, x1 - x0), offset=(x0, y0), clip_shape=(h, w))
+            all_boxes.append(boxes)
+            all_scores.append(scores)
+            all_classes.append(classes)
+    if not all_boxes:
+        return np.zeros((0, 4), np.float32), np.zeros((0,), np.float32), np.zeros((0,), np.int32), windows
+    boxes = np.concatenate(all_boxes)
+    scores = np.concatenate(all_scores)
+    classes = np.concatenate(all_classes)
+    if (len(windows) > 1 or carried) and boxes.shape[0]:
+        # doublons sur les recouvrements de tuiles, et entre détections reportées et nouvelles
+        # (objet à cheval sur le bord d'une tuile) ; même NMS que le détecteur
+        keep = batched_nms(boxes, scores, iou_thres, classes=None if agnostic else classes)
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+    return boxes, scores, classes, windows
+
+
+def add_roi_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--roi', action='store_true', help='Inférence sur les zones en mouvement uniquement (active --motion-gate)')
+    ap.add_argument('--roi-max-tiles', type=int, default=2, help='Nb max de tuiles par frame avant repli sur l\'image entière')
+    ap.add_argument('--roi-max-cover', type=float, default=0.6, help='Fraction de l\'image couverte par les tuiles au-delà de laquelle on repasse en image entière')
+    ap.add_argument('--roi-margin', type=int, default=16, help='Marge (pixels) autour des régions en mouvement')
@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Ordonnanceur multi-flux: N caméras, W workers d'inférence (un interpreter par worker)
+# - une file courte par flux (depth frames), alimentée par le thread lecteur du flux ;
+#   source live: la frame la plus ancienne est jetée quand la file est pleine
+# - un flux n'est servi que par un worker à la fois: l'ordre des frames et l'état par flux
+#   (fond MotionGate, pistes) restent cohérents sans verrou supplémentaire
+# - politique 'round_robin': flux prêts servis à tour de rôle
+#   politique 'motion': score = priorité du flux (activité au dernier passage, fournie par le
+#   worker via release()) + âge de sa frame la plus ancienne / budget -> un flux calme n'est
+#   jamais affamé, il remonte avec l'attente
+# - budget de latence (ms, âge depuis la capture): à la prise, les frames trop vieilles sont
+#   jetées au profit de la plus récente ; si même la plus récente dépasse, elle est traitée et
+#   comptée en retard ('late')
+
+POLICIES = ('round_robin', 'motion')
+
+
+class _Stream:
+    def __init__(self, name: str, depth: int, drop_oldest: bool):
+        self.name = name
+        self.q = deque()
+        self.depth = max(1, depth)
+        self.drop_oldest = drop_oldest
+        self.eof = False
+        self.busy = False
+        self.priority = 0.0
+        self.read = 0
+        self.processed = 0
+        self.dropped_queue = 0
+        self.dropped_late = 0
+        self.late = 0
+        self.latency_ms = []
+        self.t_first = None
+        self.t_last = None
+
+
+class StreamScheduler:
+    def __init__(self, policy: str = 'round_robin', budget_ms: float = 0.0, depth: int = 2,
+                 drop_oldest: bool = True, poll_s: float = 0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue: {policy}")
+        self.policy = policy
+        self.budget_ms = budget_ms
+        self.depth = depth
+        self.drop_oldest = drop_oldest
+        self.poll_s = poll_s
+        self.streams = []
+        self._cv = threading.Condition()
+        self._rr = 0
+        self.stop = threading.Event()
+        self.t_start = time.perf_counter()
+
+    def add_stream(self, name: str, drop_oldest: Optional[bool] = None) -> int:
+        with self._cv:
+            self.streams.append(_Stream(name, self.depth, self.drop_oldest if drop_oldest is None else drop_oldest))
+            return len(self.streams) - 1
+
+    def push(self, sid: int, idx: int, frame, t_capture: Optional[float] = None) -> bool:
+        # Thread lecteur. False si l'arrêt a été demandé (la frame n'est pas déposée)
+        s = self.streams[sid]
+        t_capture = time.perf_counter() if t_capture is None else t_capture
+        with self._cv:
+            while len(s.q) >= s.depth:
+                if s.drop_oldest:
+                    s.q.popleft()
+                    s.dropped_queue += 1
+                    break
+                if self.stop.is_set():
+                    return False
+                self._cv.wait(self.poll_s)
+            if self.stop.is_set():
+                return False
+            s.q.append((idx, frame, t_capture))
+            s.read += 1
+            self._cv.notify_all()
+        return True
+
+    def close(self, sid: int):
+        with self._cv:
+            self.streams[sid].eof = True
+            self._cv.notify_all()
+
+    def _done(self) -> bool:
+        return all(s.eof and not s.q and not s.busy for s in self.streams)
+
+    def _pick(self, now: float) -> Optional[int]:
+        ready = [i for i, s in enumerate(self.streams) if s.q and not s.busy]
+        if not ready:
+            return None
+        if self.policy == 'round_robin':
+            n = len(self.streams)
+            return min(ready, key=lambda i: (i - self._rr) % n)
+        scale = self.budget_ms if self.budget_ms > 0 else 100.0
+        return max(ready, key=lambda i: self.streams[i].priority + (now - self.streams[i].q[0][2]) * 1000 / scale)
+
+    def acquire(self) -> Optional[Tuple[int, int, object, float]]:
+        # Worker: -> (sid, idx, frame, t_capture), None quand tous les flux sont terminés
+        with self._cv:
+            while True:
+                if self.stop.is_set() or self._done():
+                    return None
+                now = time.perf_counter()
+                sid = self._pick(now)
+                if sid is not None:
+                    break
+                self._cv.wait(self.poll_s)
+            s = self.streams[sid]
+            self._rr = (sid + 1) % len(self.streams)
+            if self.budget_ms > 0:
+                while len(s.q) > 1 and (now - s.q[0][2]) * 1000 > self.budget_ms:
+                    s.q.popleft()
+                    s.dropped_late += 1
+            idx, frame, t_capture = s.q.popleft()
+            s.busy = True
+            self._cv.notify_all()  # place libérée pour un lecteur bloquant
+            return sid, idx, frame, t_capture
+
+    def release(self, sid: int, t_capture: float, priority: Optional[float] = None):
+        # Worker: fin du traitement de la frame prise par acquire()
+        now = time.perf_counter()
+        with self._cv:
+            s = self.streams[sid]
+            s.busy = False
+            s.processed += 1
+            lat = (now - t_capture) * 1000
+            s.latency_ms.append(lat)
+            if self.budget_ms > 0 and lat > self.budget_ms:
+                s.late += 1
+            if s.t_first is None:
+                s.t_first = now
+            s.t_last = now
+            if priority is not None:
+                s.priority = priority
+            self._cv.notify_all()
+
+    def shutdown(self):
+        self.stop.set()
+        with self._cv:
+            self._cv.notify_all()
+
+    def stats(self) -> dict:
+        wall = time.perf_counter() - self.t_start
+        per = []
+        for s in self.streams:
+            lat = np.asarray(s.latency_ms) if s.latency_ms else None
+            span = (s.t_last - s.t_first) if s.t_first is not None and s.t_last > s.t_first else 0.0
+            per.append({
+                'name': s.name,
+                'read': s.read,
+                'processed': s.processed,
+                'dropped_queue': s.dropped_queue,
+                'dropped_late': s.dropped_late,
+                'late': s.late,
+                'fps': (s.processed - 1) / span if span > 0 else 0.0,
+                'latency_p50_ms': float(np.percentile(lat, 50)) if lat is not None else 0.0,
+                'latency_p99_ms': float(np.percentile(lat, 99)) if lat is not None else 0.0,
+            })
+        processed = sum(p['processed'] for p in per)
+        return {
+            'policy': self.policy,
+            'budget_ms': self.budget_ms,
+            'streams': per,
+            'processed': processed,
+            'dropped': sum(p['dropped_queue'] + p['dropped_late'] for p in per),
+            'wall_s': wall,
+            'fps': processed / wall if wall > 0 else 0.0,
+        }
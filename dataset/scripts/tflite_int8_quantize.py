@@ -1,58 +1,67 @@
-import os, glob
-import numpy as np
+import os
 import tensorflow as tf
 
+from calib_cache import CalibCache, list_calib_images
+
 # Quantification INT8 post-training TFLite depuis un SavedModel TF
 # - Input: SavedModel export TF (sans NMS)
-# - Représentative dataset: images dans CALIB_DIR (200 par défaut)
+# - Représentative dataset: images dans CALIB_DIR (dossier ou liste .txt, 200 par défaut)
+# - Tenseurs de calibration lus dans le cache partagé avec quantize_int8_onnx.py (calib_cache.py):
+#   décodage + letterbox une seule fois (threads), ordre déterministe (CALIB_SEED), empreinte de la
+#   liste + imgsz ; les conversions suivantes réutilisent le cache, lots préparés à l'avance
+# - OPS=int8: opérateurs INT8 seulement (échec si un opérateur n'a pas de version entière) ;
+#   int8_float: repli float autorisé pour ces opérateurs
 
 SAVED = os.getenv("SAVED", r"runs/detect/train3/weights/best_saved_model")
 OUT = os.getenv("OUT", r"runs/detect/train3/weights/yolov8n_int8.tflite")
 CALIB_DIR = os.getenv("CALIB_DIR", r"valid/images")
 IMGSZ = int(os.getenv("IMGSZ", "640"))
 MAXN = int(os.getenv("MAXN", "200"))
+CALIB_SEED = int(os.getenv("CALIB_SEED", "0"))
+CALIB_CACHE = os.getenv("CALIB_CACHE", r"runs/calib_cache")
+CALIB_WORKERS = int(os.getenv("CALIB_WORKERS", "0"))
+OPS = os.getenv("OPS", "int8")
+
+OP_SETS = {
+    'int8': [tf.lite.OpsSet.TFLITE_BUILTINS_INT8],
+    'int8_float': [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS],
+}
+
+
+def convert(saved: str, out: str, cache: CalibCache, ops: str = OPS):
+    def rep_ds():
+        # (1, S, S, 3) float32 [0, 1], RGB, padding 114/255
+        for x in cache.batches(1, layout='nhwc'):
+            yield [x]
+
+    conv = tf.lite.TFLiteConverter.from_saved_model(saved)
+    conv.optimizations = [tf.lite.Optimize.DEFAULT]
+    conv.representative_dataset = rep_ds
+    conv.target_spec.supported_ops = OP_SETS[ops]
+    # Si le graphe supporte l'entier pur:
+    conv.inference_input_type = tf.uint8
+    conv.inference_output_type = tf.uint8
+
+    # Option: forcer un nombre minimal d'opérateurs quantifiés
+    # conv._experimental_calibrate_only = False
+
+    tfl = conv.convert()
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "wb") as f:
+        f.write(tfl)
+
+
+def main():
+    files = list_calib_images(CALIB_DIR, MAXN, CALIB_SEED)
+    if not files:
+        raise SystemExit(f"[ERREUR] Aucune image de calibration: {CALIB_DIR}")
+    cache = CalibCache(files, IMGSZ, CALIB_CACHE, workers=CALIB_WORKERS)
+    print(f"SavedModel: {SAVED}\nOut: {OUT}\nCalib: {CALIB_DIR} ({len(cache)})\nOps: {OPS}")
+    print(f"Calib cache: {cache.path} ({'construit' if cache.built else 'réutilisé'})")
+    print("Conversion...")
+    convert(SAVED, OUT, cache)
+    print("OK ->", OUT)
 
 
-def letterbox_np(img: np.ndarray, new_shape=640):
-    h, w = img.shape[:2]
-    r = min(new_shape / w, new_shape / h)
-    nw, nh = int(round(w*r)), int(round(h*r))
-    im_r = tf.image.resize(img, (nh, nw)).numpy()
-    canvas = np.full((new_shape, new_shape, 3), 114, dtype=img.dtype)
-    pad_w = (new_shape - nw) // 2
-    pad_h = (new_shape - nh) // 2
-    canvas[pad_h:pad_h+nh, pad_w:pad_w+nw] = im_r
-    return canvas
-
-
-def rep_ds():
-    exts = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
-    files = []
-    for e in exts:
-        files.extend(glob.glob(os.path.join(CALIB_DIR, e)))
-    files = files[:MAXN]
-    for p in files:
-        im = tf.io.read_file(p)
-        im = tf.image.decode_image(im, channels=3)
-        im = tf.cast(im, tf.float32) / 255.0
-        im = letterbox_np(im.numpy(), IMGSZ).astype(np.float32)
-        yield [np.expand_dims(im, 0)]
-
-
-print(f"SavedModel: {SAVED}\nOut: {OUT}\nCalib: {CALIB_DIR} ({MAXN})")
-conv = tf.lite.TFLiteConverter.from_saved_model(SAVED)
-conv.optimizations = [tf.lite.Optimize.DEFAULT]
-conv.representative_dataset = rep_ds
-conv.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
-# Si le graphe supporte l'entier pur:
-conv.inference_input_type = tf.uint8
-conv.inference_output_type = tf.uint8
-
-# Option: forcer un nombre minimal d'opérateurs quantifiés
-# conv._experimental_calibrate_only = False
-
-print("Conversion...")
-tfl = conv.convert()
-os.makedirs(os.path.dirname(OUT), exist_ok=True)
-open(OUT, "wb").write(tfl)
-print("OK ->", OUT)
+if __name__ == "__main__":
+    main()
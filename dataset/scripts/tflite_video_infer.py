@@ -1,69 +1,18 @@
 import os
 import cv2
-import time
 import argparse
 import numpy as np
-import tensorflow as tf
-from postprocess_yolov8 import decode_yolov8_output, nms, scale_coords
+from detector import add_detector_args, create_detector
+from motion_gate import add_gate_args, gate_from_args
+from roi import add_roi_args, roi_detect
 
-# Script: TFLite video inference (single-class YOLOv8 output format (1,5,8400) or (1,8400,5))
-
-def letterbox(im, new_shape=640, color=(114,114,114)):
-    h, w = im.shape[:2]
-    r = min(new_shape / w, new_shape / h)
-    nw, nh = int(round(w*r)), int(round(h*r))
-    im_r = cv2.resize(im, (nw, nh), interpolation=cv2.INTER_LINEAR)
-    canvas = np.full((new_shape, new_shape, 3), color, dtype=im.dtype)
-    top = (new_shape - nh) // 2
-    left = (new_shape - nw) // 2
-    canvas[top:top+nh, left:left+nw] = im_r
-    return canvas, r, left, top
-
-def load_interpreter(model_path: str):
-    interpreter = tf.lite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
-    inp = interpreter.get_input_details()[0]
-    out = interpreter.get_output_details()[0]
-    print(f"[INFO] Model={model_path}\n       Input shape={inp['shape']} dtype={inp['dtype']} quant={inp.get('quantization')}\n       Output shape={out['shape']} dtype={out['dtype']} quant={out.get('quantization')}")
-    return interpreter, inp, out
-
-def prepare_input(frame_bgr, imgsz, inp_detail):
-    img, r, pad_w, pad_h = letterbox(frame_bgr, imgsz)
-    arr = img.astype(np.float32) / 255.0  # (H,W,3)
-    in_shape = inp_detail['shape']
-    in_dtype = inp_detail['dtype']
-    if len(in_shape) != 4:
-        raise ValueError(f"Unsupported input rank: {in_shape}")
-    # Assume NHWC unless channel dim is second
-    if in_shape[1] == 3 and in_shape[2] == imgsz:
-        # NCHW expected
-        arr = np.transpose(arr, (2,0,1))[None, ...]
-    else:
-        arr = arr[None, ...]
-    if in_dtype in (np.uint8, np.int8):
-        scale, zero = inp_detail['quantization']
-        if scale == 0:
-            scale = 1.0
-        q = arr / scale + zero
-        if in_dtype == np.uint8:
-            arr = np.clip(np.round(q), 0, 255).astype(np.uint8)
-        else:
-            arr = np.clip(np.round(q), -128, 127).astype(np.int8)
-    return arr, r, pad_w, pad_h
-
-def process_output(raw_out, out_detail):
-    out = raw_out
-    if out_detail['dtype'] in (np.uint8, np.int8):
-        s, z = out_detail['quantization']
-        if s == 0:
-            s = 1.0
-        out = (out.astype(np.float32) - z) * s
-    if out.ndim == 3 and out.shape[1] == 8400 and out.shape[2] == 5:
-        out = np.transpose(out, (0,2,1))
-    return out
+# Script: TFLite video inference (YOLOv8 sans NMS, sortie (1,4+nc,N) ou (1,N,4+nc) ; N et la disposition
+# sont déduits de imgsz au chargement par ModelInfo: modèles 320 / 416 / 640 sans modification)
 
 def run_video(args):
-    interpreter, inp, out = load_interpreter(args.model)
+    detector = create_detector(args)
+    print(f"[INFO] Model={args.model}")
+    print(detector.describe())
     cap = cv2.VideoCapture(args.source)
     if not cap.isOpened():
         raise RuntimeError(f"Impossible d'ouvrir la source vidéo: {args.source}")
@@ -72,34 +21,47 @@ def run_video(args):
     out_path = os.path.join(args.outdir, os.path.splitext(os.path.basename(args.source))[0] + '_pred.mp4')
     fps_in = cap.get(cv2.CAP_PROP_FPS) or 25.0
     writer = cv2.VideoWriter(out_path, fourcc, fps_in, (int(cap.get(3)), int(cap.get(4))))
+    gate = gate_from_args(args)
     frame_id = 0
     times = []
+    infer_t = 0.0
+    boxes, scores = np.zeros((0, 4), np.float32), np.zeros((0,), np.float32)
+    classes = np.zeros((0,), np.int32)
     while True:
         ret, frame = cap.read()
         if not ret:
             break
         frame_id += 1
-        arr, r, pad_w, pad_h = prepare_input(frame, args.imgsz, inp)
-        interpreter.set_tensor(inp['index'], arr)
-        t0 = time.time()
-        interpreter.invoke()
-        infer_t = (time.time() - t0)*1000
-        times.append(infer_t)
-        raw = interpreter.get_tensor(out['index'])
-        out_tensor = process_output(raw, out)
-        boxes, scores = decode_yolov8_output(out_tensor, args.conf)
-        if boxes.size:
-            keep = nms(boxes, scores, args.iou)
-            boxes = boxes[keep]
-            scores = scores[keep]
-            # inverse letterbox scaling
-            gain = min(args.imgsz / frame.shape[1], args.imgsz / frame.shape[0])
-            # Actually scale_coords needs shapes (h,w)
-            boxes = scale_coords((args.imgsz, args.imgsz), boxes.copy(), (frame.shape[0], frame.shape[1]))
-            for b, s in zip(boxes, scores):
-                x1,y1,x2,y2 = map(int, b.tolist())
-                cv2.rectangle(frame, (x1,y1), (x2,y2), (0,140,255), 2)
-                cv2.putText(frame, f"obj {s:.2f}", (x1, max(0,y1-5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,140,255), 1, cv2.LINE_AA)
+        # MotionGate: frame statique -> on garde les détections précédentes sans invoke()
+        if gate is None or gate.update(frame):
+            res = None
+            if args.roi and frame_id > 1:
+                # --roi: tuiles sur les zones en mouvement (voir roi.py), repli image entière si None
+                tile_t = []
+
+                def detect_tile(crop):
+                    out = detector.infer(crop, slot='tile')
+                    tile_t.append(detector.timing['infer_ms'])
+                    return out
+
+                res = roi_detect(frame, gate.mask, gate.scale, detector.imgsz, detect_tile, boxes, scores, classes,
+                                 args.iou, max_tiles=args.roi_max_tiles, max_cover=args.roi_max_cover,
+                                 margin=args.roi_margin, agnostic=detector.agnostic)
+            if res is not None:
+                boxes, scores, classes = res[:3]
+                if tile_t:
+                    infer_t = sum(tile_t)
+                    times.append(infer_t)
+            else:
+                # letterbox + quantification + invoke + décodage/NMS, boîtes en coordonnées image
+                d = detector.detect(frame)
+                infer_t = d.infer_ms
+                times.append(infer_t)
+                boxes, scores, classes = d.boxes, d.scores, d.classes
+        for b, s in zip(boxes, scores):
+            x1,y1,x2,y2 = map(int, b.tolist())
+            cv2.rectangle(frame, (x1,y1), (x2,y2), (0,140,255), 2)
+            cv2.putText(frame, f"obj {s:.2f}", (x1, max(0,y1-5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,140,255), 1, cv2.LINE_AA)
         writer.write(frame)
         if args.max_frames and frame_id >= args.max_frames:
             break
@@ -109,6 +71,9 @@ def run_video(args):
     writer.release()
     if times:
         print(f"[STATS] Frames={len(times)} mean={np.mean(times):.2f} ms min={np.min(times):.2f} ms max={np.max(times):.2f} ms")
+    if gate is not None:
+        st = gate.stats()
+        print(f"[GATE] Frames={st['frames']} inferred={st['inferred']} gated={st['gated']} ratio={st['gated_ratio']:.2%}")
     print(f"[DONE] Output vidéo: {out_path}")
 
 
@@ -121,6 +86,9 @@ def parse_args():
     ap.add_argument('--conf', type=float, default=0.25, help='Seuil confiance')
     ap.add_argument('--iou', type=float, default=0.45, help='Seuil IOU NMS')
     ap.add_argument('--max-frames', type=int, default=0, help='Limiter nombre de frames (0 = toutes)')
+    add_detector_args(ap)
+    add_gate_args(ap)
+    add_roi_args(ap)
     return ap.parse_args()
 
 if __name__ == '__main__':
@@ -0,0 +1,297 @@
+import argparse
+from typing import Optional, Tuple
+import numpy as np
+
+from postprocess_yolov8 import box_iou
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_lsa
+except ImportError:  # SciPy optionnel: repli sur l'algorithme hongrois NumPy ci-dessous
+    _scipy_lsa = None
+
+# Suivi multi-objets façon ByteTrack (Zhang et al. 2022) pour la logique "abandon"
+# - filtre de Kalman vectorisé sur toutes les pistes à la fois (état xyah + vitesses, comme SORT/ByteTrack)
+# - association IoU + affectation linéaire (SciPy si dispo, sinon hongrois NumPy)
+# - deux passes: détections haut score puis bas score sur les pistes restantes
+# - pistes stockées en tableaux (structure of arrays), aucune instance Python par piste
+# Sortie de update(): (K,7) float32 [x1, y1, x2, y2, track_id, score, cls] des pistes actives.
+
+TENTATIVE, TRACKED, LOST = 0, 1, 2
+
+
+def xyxy2xyah(b: np.ndarray) -> np.ndarray:
+    w = b[:, 2] - b[:, 0]
+    h = b[:, 3] - b[:, 1]
+    return np.stack([b[:, 0] + w / 2, b[:, 1] + h / 2, w / np.maximum(h, 1e-6), h], axis=1)
+
+
+def xyah2xyxy(m: np.ndarray) -> np.ndarray:
+    w = m[:, 2] * m[:, 3]
+    h = m[:, 3]
+    return np.stack([m[:, 0] - w / 2, m[:, 1] - h / 2, m[:, 0] + w / 2, m[:, 1] + h / 2], axis=1)
+
+
+class BatchKalman:
+    # Kalman à vitesse constante, mêmes bruits que ByteTrack, appliqué à (N,8) / (N,8,8) d'un coup
+    std_pos = 1.0 / 20
+    std_vel = 1.0 / 160
+
+    def _std(self, h: np.ndarray, scale_h, const) -> np.ndarray:
+        # écarts-types proportionnels à la hauteur h, sauf termes constants (aspect ratio)
+        return h[:, None] * np.asarray(scale_h) + np.asarray(const)
+
+    def initiate(self, xyah: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = xyah.shape[0]
+        mean = np.zeros((n, 8))
+        mean[:, :4] = xyah
+        p, v = 2 * self.std_pos, 10 * self.std_vel
+        std = self._std(xyah[:, 3], [p, p, 0, p, v, v, 0, v], [0, 0, 1e-2, 0, 0, 0, 1e-5, 0])
+        cov = np.zeros((n, 8, 8))
+        idx = np.arange(8)
+        cov[:, idx, idx] = std * std
+        return mean, cov
+
+    def predict(self, mean: np.ndarray, cov: np.ndarray, dt: float = 1.0):
+        # F = [[I, dt*I], [0, I]] -> produits par blocs plutôt que matmul 8x8
+        h = mean[:, 3]
+        mean[:, :4] += dt * mean[:, 4:]
+        p11, p12, p21, p22 = cov[:, :4, :4], cov[:, :4, 4:], cov[:, 4:, :4], cov[:, 4:, 4:]
+        new = np.empty_like(cov)
+        new[:, :4, :4] = p11 + dt * (p12 + p21) + dt * dt * p22
+        new[:, :4, 4:] = p12 + dt * p22
+        new[:, 4:, :4] = p21 + dt * p22
+        new[:, 4:, 4:] = p22
+        p, v = self.std_pos, self.std_vel
+        q = self._std(h, [p, p, 0, p, v, v, 0, v], [0, 0, 1e-2, 0, 0, 0, 1e-5, 0])
+        idx = np.arange(8)
+        new[:, idx, idx] += dt * q * q
+        cov[...] = new
+
+    def update(self, mean: np.ndarray, cov: np.ndarray, z: np.ndarray):
+        # H sélectionne les 4 premières composantes: H P H^T = P[:4,:4], P H^T = P[:, :4]
+        p = self.std_pos
+        r = self._std(mean[:, 3], [p, p, 0, p], [0, 0, 1e-1, 0])
+        s = cov[:, :4, :4].copy()
+        idx = np.arange(4)
+        s[:, idx, idx] += r * r
+        ph = cov[:, :4, :].copy()  # H P
+        gain_t = np.linalg.inv(s) @ ph  # (N,4,8) = K^T, S symétrique ; inv 4x4 batch < solve ici
+        innov = z - mean[:, :4]
+        k = gain_t.transpose(0, 2, 1)
+        mean += (k @ innov[:, :, None])[:, :, 0]
+        cov -= k @ ph  # K S K^T = K H P
+
+
+def _hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Algorithme hongrois O(n^2 m) (potentiels u/v), boucle interne vectorisée sur les colonnes
+    transposed = cost.shape[0] > cost.shape[1]
+    c = cost.T if transposed else cost
+    n, m = c.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # p[j] = ligne (1..n) affectée à la colonne j, 0 = libre
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = c[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            cand = np.where(free, minv[1:], np.inf)
+            j1 = int(cand.argmin()) + 1
+            delta = cand[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def linear_assignment(cost: np.ndarray, thresh: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # -> matches (K,2) [ligne, colonne], lignes libres, colonnes libres ; coût > thresh = pas d'appariement
+    n, m = cost.shape
+    if n == 0 or m == 0:
+        return np.zeros((0, 2), dtype=np.int64), np.arange(n), np.arange(m)
+    # Coûts au-delà du seuil plafonnés: l'optimum se décompose alors par composante connexe
+    # du graphe des paires admissibles. Les paires isolées (seule option de part et d'autre,
+    # cas courant pour des objets bien séparés) sont appariées directement, le solveur ne
+    # traite que le reste.
+    ok = cost <= thresh
+    row_n = ok.sum(axis=1)
+    col_n = ok.sum(axis=0)
+    single = ok & (row_n == 1)[:, None] & (col_n == 1)[None, :]
+    r0, c0 = np.nonzero(single)
+    rest_r = np.flatnonzero((row_n > 0) & ~single.any(axis=1))
+    rest_c = np.flatnonzero((col_n > 0) & ~single.any(axis=0))
+    rows, cols = [r0], [c0]
+    if rest_r.size and rest_c.size:
+        c = np.minimum(cost[np.ix_(rest_r, rest_c)], thresh + 1e-4)
+        rr, cc = _scipy_lsa(c) if _scipy_lsa is not None else _hungarian(c)
+        good = c[rr, cc] <= thresh
+        rows.append(rest_r[rr[good]])
+        cols.append(rest_c[cc[good]])
+    matches = np.stack([np.concatenate(rows), np.concatenate(cols)], axis=1).astype(np.int64)
+    free_r = np.ones(n, dtype=bool)
+    free_c = np.ones(m, dtype=bool)
+    free_r[matches[:, 0]] = False
+    free_c[matches[:, 1]] = False
+    return matches, np.flatnonzero(free_r), np.flatnonzero(free_c)
+
+
+class ByteTracker:
+    def __init__(self, track_thresh: float = 0.5, low_thresh: float = 0.1, new_track_thresh: Optional[float] = None,
+                 match_thresh: float = 0.8, low_match_thresh: float = 0.5, unconfirmed_match_thresh: float = 0.7,
+                 track_buffer: int = 30):
+        # *_match_thresh: coût max (1 - IoU) accepté à chaque passe ; track_buffer: frames avant oubli d'une piste perdue
+        self.track_thresh = track_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = track_thresh + 0.1 if new_track_thresh is None else new_track_thresh
+        self.match_thresh = match_thresh
+        self.low_match_thresh = low_match_thresh
+        self.unconfirmed_match_thresh = unconfirmed_match_thresh
+        self.track_buffer = track_buffer
+        self.kf = BatchKalman()
+        self.reset()
+
+    def reset(self):
+        self.frame_id = 0
+        self.next_id = 1
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 8, 8))
+        self.state = np.zeros(0, dtype=np.int8)
+        self.score = np.zeros(0, dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.last_frame = np.zeros(0, dtype=np.int64)
+        self.start_frame = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    def boxes(self) -> np.ndarray:
+        return xyah2xyxy(self.mean[:, :4])
+
+    def _match(self, trk: np.ndarray, dets: np.ndarray, thresh: float):
+        # trk: indices de pistes, dets: boîtes xyxy -> matches en indices (piste, ligne de dets)
+        if trk.size == 0 or dets.shape[0] == 0:
+            return np.zeros((0, 2), dtype=np.int64), trk, np.arange(dets.shape[0])
+        cost = 1.0 - box_iou(self._pred_boxes[trk], dets)
+        m, un_t, un_d = linear_assignment(cost, thresh)
+        return np.stack([trk[m[:, 0]], m[:, 1]], axis=1), trk[un_t], un_d
+
+    def _apply(self, matches: np.ndarray, boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray):
+        if matches.shape[0] == 0:
+            return
+        t, d = matches[:, 0], matches[:, 1]
+        mean, cov = self.mean[t], self.cov[t]
+        self.kf.update(mean, cov, xyxy2xyah(boxes[d]))
+        self.mean[t], self.cov[t] = mean, cov
+        self.state[t] = TRACKED
+        self.score[t] = scores[d]
+        self.cls[t] = classes[d]
+        self.hits[t] += 1
+        self.last_frame[t] = self.frame_id
+
+    def _keep(self, mask: np.ndarray):
+        for name in ('ids', 'mean', 'cov', 'state', 'score', 'cls', 'hits', 'last_frame', 'start_frame'):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def update(self, boxes: np.ndarray, scores: np.ndarray, classes: Optional[np.ndarray] = None,
+               dt: float = 1.0) -> np.ndarray:
+        # boxes: (N,4) xyxy en pixels image ; dt: frames écoulées depuis l'appel précédent (frames sautées)
+        self.frame_id += 1
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        classes = np.zeros(scores.shape, np.int32) if classes is None else np.asarray(classes, dtype=np.int32).reshape(-1)
+
+        if len(self):
+            # pistes non suivies à la frame précédente: pas de croissance de la hauteur
+            self.mean[self.state != TRACKED, 7] = 0.0
+            self.kf.predict(self.mean, self.cov, dt)
+        self._pred_boxes = xyah2xyxy(self.mean[:, :4])
+
+        high = scores >= self.track_thresh
+        low = (scores > self.low_thresh) & ~high
+        hi_idx, lo_idx = np.flatnonzero(high), np.flatnonzero(low)
+        confirmed = np.flatnonzero(self.state != TENTATIVE)
+        unconfirmed = np.flatnonzero(self.state == TENTATIVE)
+
+        # 1) détections haut score <-> pistes confirmées (suivies + perdues)
+        m1, rest_t, rest_hi = self._match(confirmed, boxes[hi_idx], self.match_thresh)
+        m1[:, 1] = hi_idx[m1[:, 1]]
+        rest_hi = hi_idx[rest_hi]
+        # 2) détections bas score <-> pistes encore suivies non appariées
+        still = rest_t[self.state[rest_t] == TRACKED]
+        m2, rest_t2, _ = self._match(still, boxes[lo_idx], self.low_match_thresh)
+        m2[:, 1] = lo_idx[m2[:, 1]]
+        # 3) détections haut score restantes <-> pistes tentatives
+        m3, dead_t, rest_hi2 = self._match(unconfirmed, boxes[rest_hi], self.unconfirmed_match_thresh)
+        m3[:, 1] = rest_hi[m3[:, 1]]
+        rest_hi = rest_hi[rest_hi2]
+
+        self._apply(np.concatenate([m1, m2, m3]), boxes, scores, classes)
+        self.state[rest_t2] = LOST
+
+        # tentatives non confirmées et pistes perdues trop longtemps: supprimées
+        alive = np.ones(len(self), dtype=bool)
+        alive[dead_t] = False
+        alive &= ~((self.state == LOST) & (self.frame_id - self.last_frame > self.track_buffer))
+        if not alive.all():
+            self._keep(alive)
+
+        new = rest_hi[scores[rest_hi] >= self.new_track_thresh]
+        if new.size:
+            mean, cov = self.kf.initiate(xyxy2xyah(boxes[new]))
+            n = new.size
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+            self.next_id += n
+            self.mean = np.concatenate([self.mean, mean])
+            self.cov = np.concatenate([self.cov, cov])
+            # première frame: pistes actives directement (comme ByteTrack)
+            st = TRACKED if self.frame_id == 1 else TENTATIVE
+            self.state = np.concatenate([self.state, np.full(n, st, dtype=np.int8)])
+            self.score = np.concatenate([self.score, scores[new]])
+            self.cls = np.concatenate([self.cls, classes[new]])
+            self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int32)])
+            self.last_frame = np.concatenate([self.last_frame, np.full(n, self.frame_id, dtype=np.int64)])
+            self.start_frame = np.concatenate([self.start_frame, np.full(n, self.frame_id, dtype=np.int64)])
+
+        act = np.flatnonzero(self.state == TRACKED)
+        out = np.empty((act.size, 7), dtype=np.float32)
+        out[:, :4] = xyah2xyxy(self.mean[act, :4])
+        out[:, 4] = self.ids[act]
+        out[:, 5] = self.score[act]
+        out[:, 6] = self.cls[act]
+        return out
+
+
+def add_track_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--track', action='store_true', help='Suivi multi-objets (ByteTrack) des détections')
+    ap.add_argument('--track-thresh', type=float, default=0.5, help='Score min. des détections "haut score" (1re passe)')
+    ap.add_argument('--track-low', type=float, default=0.1, help='Score min. des détections "bas score" (2e passe)')
+    ap.add_argument('--track-buffer', type=int, default=30, help='Frames avant suppression d\'une piste perdue')
+
+
+def tracker_from_args(args) -> Optional[ByteTracker]:
+    if not getattr(args, 'track', False):
+        return None
+    return ByteTracker(track_thresh=args.track_thresh, low_thresh=args.track_low, track_buffer=args.track_buffer)
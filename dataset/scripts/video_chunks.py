@@ -0,0 +1,94 @@
+import shutil
+import subprocess
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Découpage d'une vidéo longue en segments traités indépendamment (ré-analyse d'archives)
+# - images-clés lues par ffprobe (paquets seulement, pas de décodage) si disponible ;
+#   les bornes de segment sont recalées sur l'image-clé la plus proche -> seek sans
+#   décoder le GOP précédent
+# - sans ffprobe: segments de taille fixe, le seek OpenCV décode depuis l'image-clé
+#   précédente (plus lent, même résultat)
+# - segments en positions 0-based [start, end), end=None pour le dernier (lecture jusqu'à EOF:
+#   CAP_PROP_FRAME_COUNT est une estimation sur certains conteneurs)
+
+
+def video_info(path: str) -> Tuple[int, float]:
+    # -> (nb de frames estimé, fps)
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return 0, 0.0
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS) or 25.0
+    finally:
+        cap.release()
+
+
+def probe_keyframes(path: str, fps: float) -> Optional[np.ndarray]:
+    # -> indices (0-based, triés) des images-clés, None si ffprobe absent ou en échec
+    exe = shutil.which('ffprobe')
+    if exe is None or fps <= 0:
+        return None
+    cmd = [exe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+           '-of', 'csv=p=0', path]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    pts, key = [], []
+    for line in out.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or parts[0] in ('', 'N/A'):
+            continue
+        pts.append(float(parts[0]))
+        key.append('K' in parts[1])
+    if not pts:
+        return None
+    pts = np.asarray(pts)
+    # pts relatifs au premier paquet affiché (les B-frames rendent l'ordre des paquets non monotone)
+    idx = np.round((pts[np.asarray(key)] - pts.min()) * fps).astype(np.int64)
+    return np.unique(idx)
+
+
+def plan_chunks(n_frames: int, chunk_frames: int, keyframes: Optional[np.ndarray] = None) -> List[Tuple[int, Optional[int]]]:
+    # -> [(start, end)] ; bornes recalées sur les images-clés quand elles sont connues
+    chunk_frames = max(1, int(chunk_frames))
+    if n_frames <= chunk_frames:
+        return [(0, None)]
+    bounds = np.arange(chunk_frames, n_frames, chunk_frames)
+    if keyframes is not None and keyframes.size:
+        kf = keyframes[(keyframes > 0) & (keyframes < n_frames)]
+        if kf.size:
+            pos = np.clip(np.searchsorted(kf, bounds), 1, kf.size) - 1
+            nxt = np.minimum(pos + 1, kf.size - 1)
+            bounds = np.where(np.abs(kf[nxt] - bounds) < np.abs(kf[pos] - bounds), kf[nxt], kf[pos])
+    # segments trop courts (moins d'un quart de la cible) fusionnés avec le précédent
+    bounds = np.unique(bounds)
+    starts = [0]
+    for b in bounds.tolist():
+        if b - starts[-1] >= chunk_frames // 4 and n_frames - b >= chunk_frames // 4:
+            starts.append(b)
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+def open_at(path: str, start: int, seek: str = 'auto') -> cv2.VideoCapture:
+    # Capture positionnée sur la frame start (0-based)
+    # seek='auto': CAP_PROP_POS_FRAMES puis vérification, repli sur grab() si la position lue diffère
+    # seek='grab': décodage séquentiel depuis le début (toujours exact, coût proportionnel à start)
+    cap = cv2.VideoCapture(path)
+    if start <= 0 or not cap.isOpened():
+        return cap
+    if seek == 'auto':
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))) == start:
+            return cap
+        print(f"[WARN] Seek imprécis sur {path} (frame {start}), repli sur lecture séquentielle")
+        cap.release()
+        cap = cv2.VideoCapture(path)
+    for _ in range(start):
+        if not cap.grab():
+            break
+    return cap
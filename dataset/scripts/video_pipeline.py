@@ -0,0 +1,158 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Tuple
+
+import numpy as np
+
+# Pipeline vidéo multi-thread: décodage -> inférence -> annotation + encodage
+# - un thread décodeur (cap.read), l'inférence dans le thread appelant, un thread encodeur
+# - files bornées entre étages: débit ~ max(décodage, inférence, encodage) au lieu de la somme
+# - une seule file FIFO par étage et un seul étage d'inférence: l'ordre des frames est conservé
+# - drop_oldest: pour les sources live, le décodeur jette la frame la plus ancienne plutôt
+#   que d'attendre (latence bornée, frames sautées comptées dans les stats)
+# cv2.VideoCapture.read / VideoWriter.write et Interpreter.invoke relâchent le GIL.
+
+EOS = object()  # fin de flux
+
+
+class FrameQueue:
+    def __init__(self, maxsize: int, drop_oldest: bool = False, poll_s: float = 0.05):
+        self._q = queue.Queue(maxsize=max(1, maxsize))
+        self.drop_oldest = drop_oldest
+        self.poll_s = poll_s
+        self.dropped = 0
+
+    def put(self, item, stop: threading.Event) -> bool:
+        # False si l'arrêt a été demandé avant que l'élément ait pu être déposé
+        if self.drop_oldest and item is not EOS:
+            while True:
+                try:
+                    self._q.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        self._q.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        while not stop.is_set():
+            try:
+                self._q.put(item, timeout=self.poll_s)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, stop: threading.Event):
+        while True:
+            try:
+                return self._q.get(timeout=self.poll_s)
+            except queue.Empty:
+                if stop.is_set():
+                    return EOS
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+
+class ThreadedPipeline:
+    def __init__(self,
+                 read_fn: Callable[[], Tuple[bool, Any]],
+                 infer_fn: Callable[[int, Any], Any],
+                 sink_fn: Callable[[int, Any, Any], None],
+                 decode_depth: int = 4,
+                 encode_depth: int = 4,
+                 drop_oldest: bool = False,
+                 max_frames: int = 0):
+        # read_fn() -> (ok, frame) ; infer_fn(idx, frame) -> résultat ; sink_fn(idx, frame, résultat)
+        # idx: numéro de frame source (1..N), conservé même si des frames sont jetées
+        self.read_fn = read_fn
+        self.infer_fn = infer_fn
+        self.sink_fn = sink_fn
+        self.q_in = FrameQueue(decode_depth, drop_oldest=drop_oldest)
+        self.q_out = FrameQueue(encode_depth)
+        self.max_frames = max_frames
+        self.stop = threading.Event()
+        self._errors = []
+        self.frames_read = 0
+        self.frames_inferred = 0
+        self.frames_written = 0
+        self.stage_ms = {'decode': [], 'infer': [], 'encode': []}
+
+    def _decode_loop(self):
+        try:
+            while not self.stop.is_set():
+                t0 = time.perf_counter()
+                ret, frame = self.read_fn()
+                if not ret:
+                    break
+                self.stage_ms['decode'].append((time.perf_counter() - t0) * 1000)
+                self.frames_read += 1
+                if not self.q_in.put((self.frames_read, frame), self.stop):
+                    break
+        except Exception as e:
+            self._errors.append(e)
+            self.stop.set()
+        finally:
+            self.q_in.put(EOS, self.stop)
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self.q_out.get(self.stop)
+                if item is EOS:
+                    break
+                idx, frame, result = item
+                t0 = time.perf_counter()
+                self.sink_fn(idx, frame, result)
+                self.stage_ms['encode'].append((time.perf_counter() - t0) * 1000)
+                self.frames_written += 1
+        except Exception as e:
+            self._errors.append(e)
+            self.stop.set()
+
+    def run(self) -> dict:
+        t_start = time.perf_counter()
+        decoder = threading.Thread(target=self._decode_loop, name='decode', daemon=True)
+        encoder = threading.Thread(target=self._encode_loop, name='encode', daemon=True)
+        decoder.start()
+        encoder.start()
+        try:
+            while True:
+                item = self.q_in.get(self.stop)
+                if item is EOS:
+                    break
+                idx, frame = item
+                t0 = time.perf_counter()
+                result = self.infer_fn(idx, frame)
+                self.stage_ms['infer'].append((time.perf_counter() - t0) * 1000)
+                self.frames_inferred += 1
+                if not self.q_out.put((idx, frame, result), self.stop):
+                    break
+                if self.max_frames and self.frames_inferred >= self.max_frames:
+                    break
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            # l'encodeur vide sa file avant de recevoir EOS ; le décodeur sort sur stop
+            self.q_out.put(EOS, self.stop)
+            encoder.join()
+            self.stop.set()
+            decoder.join()
+        if self._errors:
+            raise self._errors[0]
+        return self.stats(time.perf_counter() - t_start)
+
+    def stats(self, wall_s: float) -> dict:
+        out = {
+            'frames_read': self.frames_read,
+            'frames_inferred': self.frames_inferred,
+            'frames_written': self.frames_written,
+            'dropped': self.q_in.dropped,
+            'wall_s': wall_s,
+            'fps': self.frames_written / wall_s if wall_s > 0 else 0.0,
+        }
+        for k, v in self.stage_ms.items():
+            out[f'{k}_mean_ms'] = float(np.mean(v)) if v else 0.0
+        return out
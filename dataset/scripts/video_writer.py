@@ -0,0 +1,239 @@
+import os
+import time
+import argparse
+import threading
+from collections import deque
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from video_pipeline import EOS, FrameQueue
+
+# Sortie vidéo annotée, hors du thread d'inférence
+# Modes (--video-out):
+#   full     toutes les frames annotées, pleine résolution (comportement historique)
+#   preview  aperçu réduit (--preview-scale) et/ou à cadence réduite (--preview-fps): les frames
+#            non retenues sont écartées avant la file, sans annotation ni encodage
+#   clips    seulement des extraits autour des alertes 'abandoned': tampon circulaire (FrameRing) des
+#            --clip-pre-s dernières secondes, extrait prolongé de --clip-post-s après la dernière alerte
+#   none     métadonnées seulement (journaux _det.bin / jsonl), aucune vidéo écrite
+# Annotation + encodage dans un thread dédié derrière une file bornée (attente si pleine: aucune
+# frame perdue). Codec: premier de --codec accepté par OpenCV, avec accélération matérielle si
+# disponible (VIDEO_ACCELERATION_ANY), sinon encodeur logiciel ; choix mémorisé par extension.
+
+VIDEO_OUTS = ('full', 'preview', 'clips', 'none')
+CODECS = ('avc1', 'mp4v')
+_CODEC = {}
+
+
+def open_writer(path: str, fps: float, size: Tuple[int, int], codecs: Sequence[str] = CODECS) -> Tuple[cv2.VideoWriter, str]:
+    # -> (writer ouvert, fourcc retenu) ; RuntimeError si aucun codec ne fonctionne
+    ext = os.path.splitext(path)[1].lower()
+    known = _CODEC.get(ext)
+    order = ([known] if known in codecs else []) + [c for c in codecs if c != known]
+    hw = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    for c in order:
+        w = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*c), fps, size, hw)
+        if not w.isOpened():
+            w = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*c), fps, size)
+        if w.isOpened():
+            _CODEC[ext] = c
+            return w, c
+        w.release()
+    raise RuntimeError(f"Aucun codec utilisable pour {path} parmi {list(codecs)}")
+
+
+class FrameRing:
+    # Pré-roll des extraits d'alerte: dernières `seconds` secondes de frames, compressées en JPEG
+    # (store='jpeg') ou brutes (store='raw'), éventuellement réduites (scale) ; mémoire bornée par
+    # budget_mb quelle que soit la durée du flux (éviction par l'âge, puis par le budget).
+    # Les métadonnées (résultat de détection) restent à côté: l'annotation est faite à la vidange.
+    def __init__(self, seconds: float, budget_mb: float = 64.0, store: str = 'jpeg', quality: int = 80,
+                 scale: float = 1.0):
+        if store not in ('jpeg', 'raw'):
+            raise ValueError(f"Stockage de tampon inconnu: {store}")
+        self.seconds = seconds
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.store = store
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        self.scale = scale
+        self.items = deque()  # (t, données, taille (w, h) d'origine, méta)
+        self.nbytes = 0
+        self.peak_bytes = 0
+        self.evicted_budget = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def push(self, t: float, frame: np.ndarray, meta=None):
+        size = (frame.shape[1], frame.shape[0])
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, (max(1, int(size[0] * self.scale)), max(1, int(size[1] * self.scale))),
+                               interpolation=cv2.INTER_AREA)
+        if self.store == 'jpeg':
+            ok, data = cv2.imencode('.jpg', frame, self.params)
+            if not ok:
+                raise RuntimeError("Encodage JPEG du tampon impossible")
+        else:
+            data = frame
+        self.items.append((t, data, size, meta))
+        self.nbytes += data.nbytes
+        while self.items and self.items[0][0] < t - self.seconds:
+            self.nbytes -= self.items.popleft()[1].nbytes
+        while self.nbytes > self.budget and len(self.items) > 1:
+            self.nbytes -= self.items.popleft()[1].nbytes
+            self.evicted_budget += 1
+        self.peak_bytes = max(self.peak_bytes, self.nbytes)
+
+    def drain(self):
+        # -> (t, frame BGR à la taille d'origine, méta) du plus ancien au plus récent ; tampon vidé
+        while self.items:
+            t, data, size, meta = self.items.popleft()
+            self.nbytes -= data.nbytes
+            frame = cv2.imdecode(data, cv2.IMREAD_COLOR) if self.store == 'jpeg' else data
+            if (frame.shape[1], frame.shape[0]) != size:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+            yield t, frame, meta
+
+
+class VideoOutput:
+    def __init__(self, outdir: str, base: str, fps: float, size: Tuple[int, int], mode: str = 'full',
+                 draw: Optional[Callable] = None, preview_scale: float = 1.0, preview_fps: float = 0.0,
+                 clip_pre_s: float = 5.0, clip_post_s: float = 5.0, codecs: Sequence[str] = CODECS,
+                 queue_depth: int = 8, threaded: bool = True, ring: Optional[FrameRing] = None):
+        # draw(frame, result): annotation en place ; size: (w, h) source
+        # ring: tampon de pré-roll du mode clips (défaut: FrameRing JPEG de clip_pre_s secondes)
+        # threaded=False: appelé depuis un thread déjà dédié à l'encodage (ThreadedPipeline)
+        if mode not in VIDEO_OUTS:
+            raise ValueError(f"Mode de sortie vidéo inconnu: {mode}")
+        self.outdir = outdir
+        self.base = base
+        self.fps = fps
+        self.size = size
+        self.mode = mode
+        self.draw = draw
+        self.codecs = codecs
+        self.scale = preview_scale if mode == 'preview' else 1.0
+        self.stride = max(1, int(round(fps / preview_fps))) if mode == 'preview' and preview_fps > 0 else 1
+        self.pre = (ring if ring is not None else FrameRing(clip_pre_s)) if mode == 'clips' and clip_pre_s > 0 else None
+        self.post_frames = int(round(clip_post_s * fps))
+        self.writer = None
+        self.codec = None
+        self.path = None
+        self.clips: List[str] = []
+        self._clip_end = 0
+        self.frames_written = 0
+        self.encode_ms = 0.0
+        self._errors = []
+        self._q = self._thread = None
+        if mode == 'full' or mode == 'preview':
+            out_size = tuple(size)
+            if self.scale != 1.0:
+                out_size = (max(2, int(size[0] * self.scale)) // 2 * 2, max(2, int(size[1] * self.scale)) // 2 * 2)
+            suffix = '_pred.mp4' if mode == 'full' else '_preview.mp4'
+            self.path = os.path.join(outdir, base + suffix)
+            self.writer, self.codec = open_writer(self.path, fps / self.stride, out_size, codecs)
+            self.out_size = out_size
+        if threaded and mode != 'none':
+            self._stop = threading.Event()
+            self._q = FrameQueue(queue_depth)
+            self._thread = threading.Thread(target=self._loop, name=f'write-{base}', daemon=True)
+            self._thread.start()
+
+    def write(self, idx: int, frame, result, events: Sequence[dict] = ()):
+        # events: événements émis sur cette frame (alertes 'abandoned' -> extraits en mode clips)
+        if self.mode == 'none' or (self.stride > 1 and (idx - 1) % self.stride):
+            return
+        if self._q is None:
+            self._process(idx, frame, result, events)
+        elif not self._q.put((idx, frame, result, events), self._stop):
+            raise self._errors[0] if self._errors else RuntimeError("Écriture vidéo interrompue")
+
+    def _loop(self):
+        try:
+            while True:
+                item = self._q.get(self._stop)
+                if item is EOS:
+                    break
+                self._process(*item)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _process(self, idx, frame, result, events):
+        t0 = time.perf_counter()
+        if self.mode == 'clips':
+            self._clip(idx, frame, result, events)
+        else:
+            self._encode(self.writer, frame, result)
+        self.encode_ms += (time.perf_counter() - t0) * 1000
+
+    def _encode(self, writer, frame, result):
+        if self.draw is not None:
+            self.draw(frame, result)
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, self.out_size, interpolation=cv2.INTER_AREA)
+        writer.write(frame)
+        self.frames_written += 1
+
+    def _clip(self, idx, frame, result, events):
+        alerts = [ev for ev in events if ev['type'] == 'abandoned']
+        if alerts:
+            if self.writer is None:
+                ev = alerts[0]
+                self.path = os.path.join(self.outdir, f"{self.base}_alert_f{idx}_id{ev['track_id']}.mp4")
+                self.writer, self.codec = open_writer(self.path, self.fps, self.size, self.codecs)
+                self.clips.append(self.path)
+                # pré-roll: décompressé puis annoté seulement quand un extrait l'utilise
+                if self.pre is not None:
+                    for _, f, r in self.pre.drain():
+                        self._encode(self.writer, f, r)
+            self._clip_end = idx + self.post_frames
+        if self.writer is not None:
+            self._encode(self.writer, frame, result)
+            if idx >= self._clip_end:
+                self.writer.release()
+                self.writer = None
+        elif self.pre is not None:
+            self.pre.push(idx / self.fps, frame, result)
+
+    def close(self) -> dict:
+        if self._thread is not None:
+            self._q.put(EOS, self._stop)
+            self._thread.join()
+            self._thread = None
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self._errors:
+            raise self._errors[0]
+        st = {'mode': self.mode, 'codec': self.codec, 'frames_written': self.frames_written, 'clips': self.clips,
+              'encode_mean_ms': self.encode_ms / self.frames_written if self.frames_written else 0.0}
+        if self.pre is not None:
+            st.update({'ring_peak_mb': self.pre.peak_bytes / 1048576, 'ring_evicted_budget': self.pre.evicted_budget})
+        return st
+
+
+def add_output_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--video-out', choices=VIDEO_OUTS, default='full',
+                    help='full: vidéo annotée complète ; preview: aperçu réduit ; clips: extraits autour des alertes ; none: métadonnées seules')
+    ap.add_argument('--preview-scale', type=float, default=0.5, help='--video-out preview: facteur de réduction')
+    ap.add_argument('--preview-fps', type=float, default=0.0, help='--video-out preview: cadence de l\'aperçu (0 = source)')
+    ap.add_argument('--clip-pre-s', type=float, default=5.0, help='--video-out clips: secondes avant l\'alerte')
+    ap.add_argument('--clip-post-s', type=float, default=5.0, help='--video-out clips: secondes après la dernière alerte')
+    ap.add_argument('--clip-buffer-mb', type=float, default=64.0, help='--video-out clips: mémoire max. du pré-roll (Mo)')
+    ap.add_argument('--clip-store', choices=['jpeg', 'raw'], default='jpeg', help='--video-out clips: frames du pré-roll compressées ou brutes')
+    ap.add_argument('--clip-quality', type=int, default=80, help='--clip-store jpeg: qualité JPEG')
+    ap.add_argument('--clip-scale', type=float, default=1.0, help='--video-out clips: réduction des frames du pré-roll')
+    ap.add_argument('--codec', nargs='+', default=list(CODECS), help='Fourcc par ordre de préférence (le premier accepté est retenu)')
+    ap.add_argument('--write-queue-depth', type=int, default=8, help='Taille file vers le thread d\'annotation / encodage')
+
+
+def output_from_args(args, outdir: str, base: str, fps: float, size: Tuple[int, int],
+                     draw: Optional[Callable] = None, threaded: bool = True) -> VideoOutput:
+    return VideoOutput(outdir, base, fps, size, mode=args.video_out, draw=draw,
+                       preview_scale=args.preview_scale, preview_fps=args.preview_fps,
+                       clip_pre_s=args.clip_pre_s, clip_post_s=args.clip_post_s, codecs=args.codec,
+                       queue_depth=args.write_queue_depth, threaded=threaded,
+                       ring=FrameRing(args.clip_pre_s, args.clip_buffer_mb, args.clip_store, args.clip_quality, args.clip_scale))
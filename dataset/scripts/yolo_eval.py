@@ -0,0 +1,367 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+# Évaluation des sorties de nos modèles (TFLite / ONNX, float ou INT8) sur des labels YOLO txt,
+# mêmes métriques que les courbes d'entraînement Ultralytics (docs/BoxPR_curve.png, BoxF1_curve.png,
+# matrices de confusion)
+# - toutes les vérités terrain dans un seul jeu de tableaux (LabelStore): classes, boîtes xyxy
+#   normalisées, index d'image, bornes par image ; les prédictions dans le même format (Predictions)
+# - appariement vectorisé sur tout le jeu de données: paires (prédiction, vérité) de la même image
+#   construites par np.repeat, IoU de toutes les paires d'un coup, puis pour chaque seuil IoU tri
+#   par IoU décroissante et np.unique (une vérité par prédiction et inversement), comme Ultralytics
+# - AP par classe aux 10 seuils IoU 0.5:0.95: précision enveloppe, interpolation 101 points
+# - courbes P / R / F1 en fonction de la confiance et courbe PR (IoU 0.5) sur 1000 points
+# - matrice de confusion (nc + 1) x (nc + 1), dernière ligne / colonne = fond, mêmes règles
+#   qu'Ultralytics (conf 0.25, IoU 0.45, toutes classes appariées)
+# - figures (PR_curve.png, F1_curve.png, P_curve.png, R_curve.png, confusion_matrix*.png) tracées
+#   avec OpenCV, sans matplotlib
+# Boîtes en coordonnées normalisées (0-1): l'IoU est invariante par mise à l'échelle des axes,
+# inutile de connaître la taille des images côté labels.
+
+IMG_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+IOUV = np.linspace(0.5, 0.95, 10)
+_trapz = getattr(np, 'trapezoid', None) or np.trapz  # NumPy 2: trapz déprécié
+
+
+def img2label_path(path: str) -> str:
+    # .../images/x.jpg -> .../labels/x.txt (arborescence YOLO / Roboflow)
+    d, f = os.path.split(path)
+    parts = d.split(os.sep)
+    for i in range(len(parts) - 1, -1, -1):
+        if parts[i] == 'images':
+            parts[i] = 'labels'
+            break
+    return os.path.join(os.sep.join(parts), os.path.splitext(f)[0] + '.txt')
+
+
+def list_images(source: str, max_images: int = 0) -> List[str]:
+    # dossier (récursif) ou liste .txt ; ordre déterministe
+    if os.path.isfile(source):
+        with open(source, 'r', encoding='utf-8') as f:
+            paths = [ln.strip() for ln in f if ln.strip()]
+    else:
+        paths = sorted(os.path.join(root, f) for root, _, files in os.walk(source) for f in files
+                       if os.path.splitext(f)[1].lower() in IMG_EXTS)
+    return paths[:max_images] if max_images else paths
+
+
+def xywh2xyxy(b: np.ndarray) -> np.ndarray:
+    out = np.empty_like(b)
+    out[:, :2] = b[:, :2] - b[:, 2:] / 2
+    out[:, 2:] = b[:, :2] + b[:, 2:] / 2
+    return out
+
+
+def read_txt(path: str, cols: int = 5) -> np.ndarray:
+    # -> (M, cols) cls cx cy w h [conf] ; lignes polygone (segmentation) ramenées à leur boîte
+    # englobante ; fichier absent = aucune boîte
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = [ln.split() for ln in f if ln.strip()]
+    except OSError:
+        return np.zeros((0, cols), np.float32)
+    if all(len(ln) == cols for ln in lines):
+        return np.asarray(lines, dtype=np.float32).reshape(-1, cols)
+    rows = []
+    for ln in lines:
+        v = np.asarray(ln, dtype=np.float32)
+        if v.size == cols:
+            rows.append(v)
+        elif cols == 5 and v.size >= 7:
+            xy = v[1:].reshape(-1, 2)
+            lo, hi = xy.min(0), xy.max(0)
+            rows.append(np.array([v[0], *(lo + hi) / 2, *(hi - lo)], np.float32))
+    return np.asarray(rows, np.float32).reshape(-1, cols)
+
+
+def _read_all(files: Sequence[str], cols: int, workers: int):
+    # lecture des fichiers txt dans un pool de threads (milliers de petits fichiers: attente E/S)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rows = list(pool.map(lambda p: read_txt(p, cols), files, chunksize=64))
+    n = np.array([len(r) for r in rows], np.int64)
+    data = np.concatenate(rows) if rows else np.zeros((0, cols), np.float32)
+    return np.repeat(np.arange(len(files)), n), data
+
+
+class Boxes:
+    # Boîtes d'un jeu d'images: tableaux plats triés par image + bornes (offsets) par image
+    def __init__(self, img: np.ndarray, boxes: np.ndarray, cls: np.ndarray, n_images: int,
+                 conf: Optional[np.ndarray] = None):
+        order = np.argsort(img, kind='stable')
+        self.img = np.asarray(img, np.int64)[order]
+        self.boxes = np.asarray(boxes, np.float32).reshape(-1, 4)[order]
+        self.cls = np.asarray(cls, np.int64)[order]
+        self.conf = None if conf is None else np.asarray(conf, np.float32)[order]
+        self.n_images = n_images
+        self.offsets = np.searchsorted(self.img, np.arange(n_images + 1))
+
+    def __len__(self) -> int:
+        return int(self.cls.size)
+
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+
+class LabelStore(Boxes):
+    @classmethod
+    def from_images(cls, paths: Sequence[str], workers: int = 8) -> 'LabelStore':
+        # labels YOLO txt des images (fichier absent = image sans objet)
+        img, lab = _read_all([img2label_path(p) for p in paths], 5, workers)
+        store = cls(img, xywh2xyxy(lab[:, 1:5]), lab[:, 0].astype(np.int64), len(paths))
+        store.paths = list(paths)
+        return store
+
+
+class Predictions(Boxes):
+    def __init__(self, img, boxes, cls, conf, n_images: int):
+        super().__init__(img, boxes, cls, n_images, conf)
+
+    @classmethod
+    def from_txt(cls, pred_dir: str, paths: Sequence[str], workers: int = 8, root: str = '') -> 'Predictions':
+        # <pred_dir>/<image>.txt: cls cx cy w h conf normalisés (batch_infer.py, SAVE_TXT=1)
+        # root: dossier des images -> <pred_dir>/<sous-dossier>/<image>.txt (sorties de batch_infer.py)
+        if root and os.path.isdir(root):
+            files = [os.path.join(pred_dir, os.path.splitext(os.path.relpath(p, root))[0] + '.txt') for p in paths]
+        else:
+            files = [os.path.join(pred_dir, os.path.splitext(os.path.basename(p))[0] + '.txt') for p in paths]
+        img, p = _read_all(files, 6, workers)
+        return cls(img, xywh2xyxy(p[:, 1:5]), p[:, 0].astype(np.int64), p[:, 5], len(paths))
+
+
+def pair_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # IoU élément par élément de deux séries de boîtes xyxy (K, 4)
+    lt = np.maximum(a[:, :2], b[:, :2])
+    rb = np.minimum(a[:, 2:], b[:, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=1)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a + area_b - inter + 1e-9)
+
+
+def image_pairs(pred: Boxes, gt: Boxes):
+    # -> (indice prédiction, indice vérité) de toutes les paires d'une même image
+    cnt = gt.counts()[pred.img]
+    pi = np.repeat(np.arange(len(pred)), cnt)
+    first = np.repeat(np.cumsum(cnt) - cnt, cnt)
+    gi = np.repeat(gt.offsets[:-1][pred.img], cnt) + np.arange(pi.size) - first
+    return pi, gi
+
+
+def _one_to_one(a: np.ndarray, b: np.ndarray):
+    # paires triées par IoU décroissante -> au plus une paire par élément de a, puis de b
+    _, first = np.unique(a, return_index=True)
+    a, b = a[first], b[first]
+    _, first = np.unique(b, return_index=True)
+    return a[first], b[first]
+
+
+def match_predictions(pred: Predictions, gt: LabelStore, iouv: Sequence[float] = IOUV) -> np.ndarray:
+    # -> tp (N, T) bool: prédiction appariée à une vérité de même classe à IoU >= iouv[t]
+    tp = np.zeros((len(pred), len(iouv)), dtype=bool)
+    pi, gi = image_pairs(pred, gt)
+    same = pred.cls[pi] == gt.cls[gi]
+    pi, gi = pi[same], gi[same]
+    if not pi.size:
+        return tp
+    iou = pair_iou(pred.boxes[pi], gt.boxes[gi])
+    order = np.argsort(-iou, kind='stable')
+    pi, gi, iou = pi[order], gi[order], iou[order]
+    for t, thr in enumerate(iouv):
+        m = iou >= thr
+        p, _ = _one_to_one(pi[m], gi[m])
+        tp[p, t] = True
+    return tp
+
+
+def compute_ap(recall: np.ndarray, precision: np.ndarray):
+    # -> (AP, précision enveloppe, rappel) ; interpolation 101 points
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return float(_trapz(np.interp(x, mrec, mpre), x)), mpre, mrec
+
+
+def ap_per_class(tp: np.ndarray, conf: np.ndarray, pred_cls: np.ndarray, target_cls: np.ndarray,
+                 n_points: int = 1000) -> dict:
+    # -> {'classes' (C,), 'n_gt', 'ap' (C, T), 'px' (n_points,), 'p' / 'r' / 'f1' (C, n_points) en
+    #     fonction de la confiance, 'pr' (C, n_points) précision en fonction du rappel à IoU iouv[0]}
+    # prédictions triées par confiance décroissante ; une itération par classe, rien par boîte
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+    classes, n_gt = np.unique(target_cls, return_counts=True)
+    px = np.linspace(0, 1, n_points)
+    ap = np.zeros((classes.size, tp.shape[1]))
+    p, r, pr = (np.zeros((classes.size, n_points)) for _ in range(3))
+    for ci, (c, n_l) in enumerate(zip(classes, n_gt)):
+        m = pred_cls == c
+        if not m.any():
+            continue
+        tpc = np.cumsum(tp[m], axis=0)
+        fpc = np.arange(1, tpc.shape[0] + 1)[:, None] - tpc
+        recall = tpc / n_l
+        precision = tpc / (tpc + fpc)
+        # confiance décroissante: np.interp veut des abscisses croissantes -> -conf
+        r[ci] = np.interp(-px, -conf[m], recall[:, 0], left=0)
+        p[ci] = np.interp(-px, -conf[m], precision[:, 0], left=1)
+        for t in range(tp.shape[1]):
+            ap[ci, t], mpre, mrec = compute_ap(recall[:, t], precision[:, t])
+            if t == 0:
+                pr[ci] = np.interp(px, mrec, mpre)
+    f1 = 2 * p * r / (p + r + 1e-16)
+    return {'classes': classes, 'n_gt': n_gt, 'ap': ap, 'px': px, 'p': p, 'r': r, 'f1': f1, 'pr': pr}
+
+
+def confusion_matrix(pred: Predictions, gt: LabelStore, nc: int, conf: float = 0.25, iou: float = 0.45) -> np.ndarray:
+    # -> (nc + 1, nc + 1) [classe prédite, classe vraie] ; indice nc = fond (FP en colonne, FN en ligne)
+    m = pred.conf >= conf
+    sub = Boxes(pred.img[m], pred.boxes[m], pred.cls[m], pred.n_images)
+    cm = np.zeros((nc + 1, nc + 1), np.int64)
+    pi, gi = image_pairs(sub, gt)
+    ious = pair_iou(sub.boxes[pi], gt.boxes[gi])
+    v = ious > iou
+    pi, gi, ious = pi[v], gi[v], ious[v]
+    order = np.argsort(-ious, kind='stable')
+    pm, gm = _one_to_one(pi[order], gi[order])
+    np.add.at(cm, (sub.cls[pm], gt.cls[gm]), 1)
+    g_free = np.ones(len(gt), bool)
+    g_free[gm] = False
+    np.add.at(cm, (nc, gt.cls[g_free]), 1)
+    p_free = np.ones(len(sub), bool)
+    p_free[pm] = False
+    np.add.at(cm, (sub.cls[p_free], nc), 1)
+    return cm
+
+
+def smooth(y: np.ndarray, f: float = 0.1) -> np.ndarray:
+    # moyenne glissante (fraction f de la longueur), bords prolongés
+    nf = round(len(y) * f * 2) // 2 + 1
+    p = np.ones(nf // 2)
+    yp = np.concatenate((p * y[0], y, p * y[-1]), 0)
+    return np.convolve(yp, np.ones(nf) / nf, mode='valid')
+
+
+def evaluate(pred: Predictions, gt: LabelStore, iouv: Sequence[float] = IOUV, nc: Optional[int] = None,
+             conf: float = 0.25, iou: float = 0.45) -> dict:
+    # -> métriques scalaires (JSON) + 'curves' (tableaux ap_per_class) + 'confusion'
+    # precision / recall / f1: au seuil de confiance qui maximise la F1 moyenne (lissée) sur les classes
+    iouv = np.asarray(iouv, dtype=np.float64)
+    tp = match_predictions(pred, gt, iouv)
+    res = ap_per_class(tp, pred.conf, pred.cls, gt.cls)
+    ap = res['ap']
+    seen = int(max(gt.cls.max(initial=-1), pred.cls.max(initial=-1))) + 1
+    nc = seen if nc is None else max(nc, seen)
+    best = int(smooth(res['f1'].mean(0)).argmax()) if ap.size else 0
+    at = lambda k: res[k][:, best] if ap.size else np.zeros(0)
+    i75 = np.flatnonzero(np.isclose(iouv, 0.75))
+    out = {
+        'images': gt.n_images,
+        'labels': len(gt),
+        'predictions': len(pred),
+        'iouv': iouv.tolist(),
+        'map50': float(ap[:, 0].mean()) if ap.size else 0.0,
+        'map75': float(ap[:, i75[0]].mean()) if ap.size and i75.size else None,
+        'map': float(ap.mean()) if ap.size else 0.0,
+        'best_conf': float(res['px'][best]),
+        'precision': float(at('p').mean()) if ap.size else 0.0,
+        'recall': float(at('r').mean()) if ap.size else 0.0,
+        'f1': float(at('f1').mean()) if ap.size else 0.0,
+        'per_class': {int(c): {'labels': int(n), 'ap50': float(a[0]), 'ap': float(a.mean()), 'precision': float(p),
+                               'recall': float(r), 'f1': float(f)}
+                      for c, n, a, p, r, f in zip(res['classes'], res['n_gt'], ap, at('p'), at('r'), at('f1'))},
+        'curves': res,
+        'confusion': confusion_matrix(pred, gt, nc, conf, iou),
+    }
+    return out
+
+
+def summary(res: dict) -> Dict:
+    # partie JSON de evaluate() (sans tableaux de courbes)
+    out = {k: v for k, v in res.items() if k not in ('curves', 'confusion')}
+    out['confusion'] = res['confusion'].tolist()
+    return out
+
+
+_PALETTE = [(180, 119, 31), (14, 127, 255), (44, 160, 44), (40, 39, 214), (189, 103, 148),
+            (75, 86, 140), (194, 119, 227), (127, 127, 127), (34, 189, 188), (207, 190, 23)]  # BGR
+
+
+def plot_curve(path: str, x: np.ndarray, ys: np.ndarray, names: Sequence[str], xlabel: str, ylabel: str,
+               mean_label: str = 'all classes', size=(960, 640)):
+    # une courbe par classe (fines) + moyenne (épaisse) ; axes [0, 1] x [0, 1]
+    w, h = size
+    l, r, t, b = 70, 280, 30, 60
+    img = np.full((h, w, 3), 255, np.uint8)
+    pw, ph = w - l - r, h - t - b
+    to_px = lambda xv, yv: np.stack([l + np.clip(xv, 0, 1) * pw, t + (1 - np.clip(yv, 0, 1)) * ph], 1).astype(np.int32)
+    for k in range(11):
+        gx, gy = l + k * pw // 10, t + k * ph // 10
+        cv2.line(img, (gx, t), (gx, t + ph), (230, 230, 230), 1)
+        cv2.line(img, (l, gy), (l + pw, gy), (230, 230, 230), 1)
+        cv2.putText(img, f"{k / 10:.1f}", (gx - 12, t + ph + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+        cv2.putText(img, f"{1 - k / 10:.1f}", (l - 35, gy + 4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.rectangle(img, (l, t), (l + pw, t + ph), (0, 0, 0), 1)
+    cv2.putText(img, xlabel, (l + pw // 2 - 40, h - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.putText(img, ylabel, (5, t - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 1, cv2.LINE_AA)
+    ly = t + 10
+    for i, (y, name) in enumerate(zip(ys, names)):
+        c = _PALETTE[i % len(_PALETTE)]
+        cv2.polylines(img, [to_px(x, y)], False, c, 1, cv2.LINE_AA)
+        if i < 20:
+            cv2.line(img, (l + pw + 10, ly), (l + pw + 30, ly), c, 2)
+            cv2.putText(img, str(name)[:30], (l + pw + 35, ly + 4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+            ly += 18
+    if len(ys):
+        cv2.polylines(img, [to_px(x, ys.mean(0))], False, (40, 40, 40), 3, cv2.LINE_AA)
+        cv2.line(img, (l + pw + 10, ly), (l + pw + 30, ly), (40, 40, 40), 3)
+        cv2.putText(img, mean_label[:34], (l + pw + 35, ly + 4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.imwrite(path, img)
+
+
+def plot_confusion(path: str, cm: np.ndarray, names: Sequence[str], normalize: bool = True, cell: int = 80):
+    # colonnes = classe vraie ; normalize: fraction par colonne (comme Ultralytics)
+    labels = list(names) + ['background']
+    n = cm.shape[0]
+    m = cm / np.maximum(cm.sum(0, keepdims=True), 1) if normalize else cm.astype(np.float64)
+    vmax = max(float(m.max()), 1e-9)
+    l, t = 130, 40
+    img = np.full((t + n * cell + 110, l + n * cell + 20, 3), 255, np.uint8)
+    for i in range(n):
+        for j in range(n):
+            v = m[i, j] / vmax
+            col = tuple(int(255 - v * (255 - c)) for c in (160, 80, 20))
+            x0, y0 = l + j * cell, t + i * cell
+            cv2.rectangle(img, (x0, y0), (x0 + cell, y0 + cell), col, -1)
+            txt = f"{m[i, j]:.2f}" if normalize else str(int(cm[i, j]))
+            cv2.putText(img, txt, (x0 + 8, y0 + cell // 2 + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.45,
+                        (255, 255, 255) if v > 0.5 else (0, 0, 0), 1, cv2.LINE_AA)
+        cv2.putText(img, labels[i][:14], (5, t + i * cell + cell // 2 + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1, cv2.LINE_AA)
+        cv2.putText(img, labels[i][:10], (l + i * cell + 4, t + n * cell + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.putText(img, 'True', (l + n * cell // 2 - 15, t + n * cell + 50), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.putText(img, 'Predicted', (5, t - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.imwrite(path, img)
+
+
+def save_plots(res: dict, outdir: str, names: Optional[Sequence[str]] = None):
+    # figures au format des sorties d'entraînement Ultralytics
+    os.makedirs(outdir, exist_ok=True)
+    cur = res['curves']
+    nc = res['confusion'].shape[0] - 1
+    names = list(names or [])
+    names += [str(c) for c in range(len(names), nc)]
+    cls_names = [names[c] for c in cur['classes']]
+    ap50 = cur['ap'][:, 0] if cur['ap'].size else np.zeros(0)
+    pr_names = [f"{n} {a:.3f}" for n, a in zip(cls_names, ap50)]
+    plot_curve(os.path.join(outdir, 'PR_curve.png'), cur['px'], cur['pr'], pr_names, 'Recall', 'Precision',
+               f"all classes {res['map50']:.3f} mAP@0.5")
+    best = int(np.argmin(np.abs(cur['px'] - res['best_conf'])))
+    for key, label, fname in (('f1', 'F1', 'F1_curve.png'), ('p', 'Precision', 'P_curve.png'), ('r', 'Recall', 'R_curve.png')):
+        y = cur[key]
+        mean = f"all classes {y.mean(0)[best]:.2f} at {cur['px'][best]:.3f}" if len(y) else 'all classes'
+        plot_curve(os.path.join(outdir, fname), cur['px'], y, cls_names, 'Confidence', label, mean)
+    plot_confusion(os.path.join(outdir, 'confusion_matrix.png'), res['confusion'], names[:nc], normalize=False)
+    plot_confusion(os.path.join(outdir, 'confusion_matrix_normalized.png'), res['confusion'], names[:nc], normalize=True)
@@ -0,0 +1,275 @@
+import os
+import cv2
+import sys
+import glob
+import json
+import shutil
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from postprocess_yolov8 import batched_nms, decode_yolov8_output, scale_coords
+from detector import OnnxDetector, TFLiteDetector, backend_for
+from video_infer import draw_detections
+
+# Bench reproductible de la chaîne d'inférence, étape par étape
+# Pour chaque (modèle, threads, imgsz) et chaque source (images docs/*.jpg, vidéo synthétique):
+#   decode -> letterbox -> quantize -> invoke -> dequant -> decode_yolov8_output -> nms -> scale -> draw
+# Sortie int8/uint8: 'dequant' est vide et 'decode_yolov8_output' seuille directement les octets
+# bruts (QuantizedDecoder) ; --float-decode mesure l'ancien chemin (déquantification complète).
+# Tête brute (--head raw, export_raw_head.py): 'decode_yolov8_output' = pré-seuil + DFL NumPy (DFLDecoder).
+# Chaque étape est chronométrée séparément (perf_counter) ; les `warmup` premières frames sont
+# rapportées à part (allocation, caches, JIT des délégués) de l'état stable.
+# Résultat JSON (clés triées, une entrée par run) à comparer entre deux commits avec --compare.
+#   python tools/bench.py --threads 1 2 4 --imgsz 320 640 --out runs/bench/$(git rev-parse --short HEAD).json
+
+STAGES = ('decode', 'letterbox', 'quantize', 'invoke', 'dequant', 'decode_yolov8_output', 'nms', 'scale', 'draw')
+DEFAULT_MODELS = ['training/yolov8n_bag_int8.tflite', 'training/best-int8.onnx']
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {'n': 0}
+    a = np.asarray(values, dtype=np.float64)
+    p50, p90, p99 = np.percentile(a, [50, 90, 99])
+    return {'n': int(a.size), 'mean': round(float(a.mean()), 4), 'p50': round(float(p50), 4),
+            'p90': round(float(p90), 4), 'p99': round(float(p99), 4), 'max': round(float(a.max()), 4)}
+
+
+def make_synthetic_video(path: str, frames: int = 300, size=(1280, 720), fps: float = 25.0, seed: int = 0):
+    # Fond texturé fixe + quelques rectangles en mouvement (contenu déterministe)
+    rng = np.random.default_rng(seed)
+    w, h = size
+    bg = cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+    objs = rng.uniform([0, 0, 40, 40, -6, -6], [w - 100, h - 100, 160, 160, 6, 6], (6, 6))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+    if not writer.isOpened():
+        raise RuntimeError(f"Impossible d'écrire la vidéo synthétique: {path}")
+    for _ in range(frames):
+        frame = bg.copy()
+        objs[:, 0] = (objs[:, 0] + objs[:, 4]) % (w - objs[:, 2])
+        objs[:, 1] = (objs[:, 1] + objs[:, 5]) % (h - objs[:, 3])
+        for x, y, bw, bh, _, _ in objs:
+            cv2.rectangle(frame, (int(x), int(y)), (int(x + bw), int(y + bh)), (240, 240, 240), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def image_source(paths, passes: int = 1):
+    def read():
+        for _ in range(passes):
+            for p in paths:
+                im = cv2.imread(p)
+                if im is not None:
+                    yield im
+    return read()
+
+
+def video_source(path: str, max_frames: int = 0):
+    def read():
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Impossible d'ouvrir la source vidéo: {path}")
+        n = 0
+        while not max_frames or n < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            n += 1
+            yield frame
+        cap.release()
+    return read()
+
+
+def bench_run(det, frames, conf: float, iou: float, warmup: int, float_decode: bool = False) -> dict:
+    # frames: itérateur de frames décodées à la demande (le décodage fait partie de la mesure)
+    times = {s: [] for s in STAGES}
+    total = []
+    pre = det.preprocessor()
+    n = 0
+    it = iter(frames)
+    while True:
+        t0 = time.perf_counter()
+        frame = next(it, None)
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+        resized = pre.resize(frame)
+        t2 = time.perf_counter()
+        det.fill(resized)
+        t3 = time.perf_counter()
+        raw = det.invoke()
+        t4 = time.perf_counter()
+        # tête brute: toujours ModelInfo.decode (DFL NumPy, 'dequant' vide)
+        direct = det.info.dfl is not None or (det.info.qdecoder is not None and not float_decode)
+        out = raw if direct else det.info.output(raw)
+        t5 = time.perf_counter()
+        boxes, scores, classes = det.info.decode(raw, conf) if direct else decode_yolov8_output(out, conf)
+        t6 = time.perf_counter()
+        if boxes.size:
+            keep = batched_nms(boxes, scores, iou, classes=classes)
+            boxes, scores = boxes[keep], scores[keep]
+        t7 = time.perf_counter()
+        if boxes.size:
+            boxes = scale_coords((det.imgsz, det.imgsz), boxes.copy(), (frame.shape[0], frame.shape[1]))
+        t8 = time.perf_counter()
+        draw_detections(frame, boxes, scores)
+        t9 = time.perf_counter()
+        marks = (t0, t1, t2, t3, t4, t5, t6, t7, t8, t9)
+        for s, a, b in zip(STAGES, marks[:-1], marks[1:]):
+            times[s].append((b - a) * 1000)
+        total.append((t9 - t0) * 1000)
+        n += 1
+    w = min(warmup, n)
+    res = {
+        'frames': n,
+        'warmup': {s: percentiles(v[:w]) for s, v in times.items()},
+        'steady': {s: percentiles(v[w:]) for s, v in times.items()},
+        'total_warmup': percentiles(total[:w]),
+        'total_steady': percentiles(total[w:]),
+    }
+    steady = total[w:]
+    res['fps_steady'] = round(1000.0 * len(steady) / sum(steady), 2) if steady else 0.0
+    return res
+
+
+def load_detector(model: str, threads: int, imgsz: int, providers, conf: float, iou: float):
+    backend = backend_for(model)
+    if backend == 'tflite':
+        return TFLiteDetector(model, conf=conf, iou=iou, threads=threads or None, providers=providers, imgsz=imgsz)
+    if backend == 'onnx':
+        return OnnxDetector(model, conf=conf, iou=iou, threads=threads or None, providers=providers, imgsz=imgsz)
+    raise ValueError(f"Backend non mesurable: {model}")
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    env = {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+           'machine': platform.machine(), 'cpus': os.cpu_count(), 'numpy': np.__version__, 'opencv': cv2.__version__}
+    for mod in ('tensorflow', 'tflite_runtime', 'onnxruntime'):
+        try:
+            env[mod] = __import__(mod).__version__
+        except Exception:
+            pass
+    return env
+
+
+def print_run(r: dict):
+    head = f"[BENCH] {os.path.basename(r['model'])} threads={r['threads'] or 'auto'} imgsz={r['imgsz']} {r['source']}"
+    if 'error' in r:
+        print(f"{head} ERREUR: {r['error']}")
+        return
+    st = r['steady']
+    print(f"{head} frames={r['frames']} fps={r['fps_steady']:.1f} total p50={r['total_steady'].get('p50', 0):.2f} ms"
+          f" p99={r['total_steady'].get('p99', 0):.2f} ms (warmup p50={r['total_warmup'].get('p50', 0):.2f} ms)")
+    for s in STAGES:
+        p = st[s]
+        if p['n']:
+            print(f"        {s:<22} p50={p['p50']:8.3f}  p90={p['p90']:8.3f}  p99={p['p99']:8.3f} ms")
+
+
+def run_key(r: dict) -> tuple:
+    return (os.path.basename(r['model']), r['threads'], r['imgsz'], r['source'])
+
+
+def compare(old_path: str, runs):
+    # Écart de p50 (état stable) par étape entre un JSON de référence et les runs courants
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = {run_key(r): r for r in json.load(f)['runs'] if 'error' not in r}
+    for r in runs:
+        o = old.get(run_key(r))
+        if o is None or 'error' in r:
+            continue
+        print(f"[DIFF] {' '.join(map(str, run_key(r)))}")
+        for s in STAGES + ('total',):
+            a = (o['total_steady'] if s == 'total' else o['steady'][s]).get('p50')
+            b = (r['total_steady'] if s == 'total' else r['steady'][s]).get('p50')
+            if a and b:
+                print(f"        {s:<22} {a:8.3f} -> {b:8.3f} ms ({(b - a) / a:+.1%})")
+
+
+def main(args):
+    models = args.model or [m for m in DEFAULT_MODELS if os.path.isfile(ROOT / m)]
+    images = sorted(glob.glob(args.images))[:args.max_images or None] if args.images else []
+    tmpdir = None
+    video = args.video
+    try:
+        if not video and args.synth_frames:
+            tmpdir = tempfile.mkdtemp(prefix='bench_')
+            video = os.path.join(tmpdir, 'synthetic.mp4')
+            make_synthetic_video(video, args.synth_frames, tuple(args.synth_size))
+        sources = []
+        if images:
+            sources.append(('images', lambda: image_source(images, args.image_passes)))
+        if video:
+            sources.append(('video', lambda: video_source(video, args.max_frames)))
+        runs = []
+        for model in models:
+            path = model if os.path.isfile(model) else str(ROOT / model)
+            for threads in args.threads:
+                for imgsz in args.imgsz:
+                    base = {'model': model, 'threads': threads, 'imgsz': imgsz}
+                    try:
+                        det = load_detector(path, threads, imgsz, args.providers, args.conf, args.iou)
+                        if det.imgsz != imgsz:
+                            raise ValueError(f"entrée fixe {det.imgsz}x{det.imgsz} (exporter une variante {imgsz})")
+                    except Exception as e:
+                        for name, _ in sources:
+                            r = dict(base, source=name, error=f"{type(e).__name__}: {e}")
+                            runs.append(r)
+                            print_run(r)
+                        continue
+                    for name, make in sources:
+                        r = dict(base, source=name, backend=det.backend, model_imgsz=det.imgsz, info=str(det.info))
+                        r.update(bench_run(det, make(), args.conf, args.iou, args.warmup, args.float_decode))
+                        runs.append(r)
+                        print_run(r)
+        result = {'env': environment(), 'config': {k: v for k, v in vars(args).items() if k != 'compare'}, 'runs': runs}
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"[DONE] Résultats: {args.out}")
+        if args.compare:
+            compare(args.compare, runs)
+    finally:
+        # vidéo synthétique supprimée même si un backend / un balayage échoue
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Bench inférence YOLOv8 par étape (p50/p90/p99, JSON)')
+    ap.add_argument('--model', nargs='*', default=[], help=f"Modèles .tflite / .onnx (défaut: {' '.join(DEFAULT_MODELS)})")
+    ap.add_argument('--images', default=str(ROOT / 'docs' / '*.jpg'), help='Glob des images (vide pour ignorer)')
+    ap.add_argument('--max-images', type=int, default=0, help='Limiter le nombre d\'images (0 = toutes)')
+    ap.add_argument('--image-passes', type=int, default=1, help='Nombre de passes sur les images')
+    ap.add_argument('--video', default='', help='Vidéo à mesurer (défaut: vidéo synthétique)')
+    ap.add_argument('--synth-frames', type=int, default=300, help='Frames de la vidéo synthétique (0 = pas de vidéo)')
+    ap.add_argument('--synth-size', type=int, nargs=2, default=[1280, 720], metavar=('W', 'H'))
+    ap.add_argument('--max-frames', type=int, default=0)
+    ap.add_argument('--threads', type=int, nargs='+', default=[0], help='Balayage du nombre de threads (0 = défaut backend)')
+    ap.add_argument('--imgsz', type=int, nargs='+', default=[640], help='Balayage de la taille d\'entrée (ex. 320 640)')
+    ap.add_argument('--providers', nargs='*', default=[], help='ONNX: execution providers ; TFLite: délégués')
+    ap.add_argument('--conf', type=float, default=0.25)
+    ap.add_argument('--iou', type=float, default=0.45)
+    ap.add_argument('--float-decode', action='store_true', help='Sortie quantifiée: déquantifier tout le tenseur avant décodage (ancien chemin)')
+    ap.add_argument('--warmup', type=int, default=10, help='Frames rapportées à part (warm-up)')
+    ap.add_argument('--out', default='runs/bench/bench.json')
+    ap.add_argument('--compare', default='', help='JSON de référence: affiche l\'écart de p50 par étape')
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
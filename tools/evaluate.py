@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from yolo_eval import LabelStore, Predictions, evaluate, list_images, save_plots, summary
+
+# Évaluation mAP / PR / F1 / matrice de confusion de nos modèles déployés sur des labels YOLO txt
+# Prédictions:
+#   --pred DIR   fichiers <image>.txt "cls cx cy w h conf" normalisés (tflite_infer.py /
+#                inference_onnx_no_nms.py avec SAVE_TXT=1, CONF bas, ex. 0.001)
+#   --model M    inférence directe (TFLite / ONNX, comme quant_sweep.py) au seuil --conf
+# Sorties dans --outdir: metrics.json, PR_curve.png, F1_curve.png, P_curve.png, R_curve.png,
+# confusion_matrix.png, confusion_matrix_normalized.png (même présentation qu'Ultralytics)
+#   python tools/evaluate.py --data valid/images --model training/yolov8n_bag_int8.tflite --imgsz 640
+
+def class_names(args):
+    if args.names:
+        return args.names
+    if args.data_yaml and os.path.isfile(args.data_yaml):
+        try:
+            import yaml
+        except ImportError:
+            return None
+        with open(args.data_yaml, 'r', encoding='utf-8') as f:
+            names = (yaml.safe_load(f) or {}).get('names')
+        if isinstance(names, dict):
+            return [str(names[k]) for k in sorted(names)]
+        return [str(n) for n in names] if names else None
+    return None
+
+
+def run_eval(args):
+    paths = list_images(args.data, args.max_images)
+    if not paths:
+        raise SystemExit(f"[ERREUR] Aucune image: {args.data}")
+    t0 = time.perf_counter()
+    gt = LabelStore.from_images(paths)
+    t_load = time.perf_counter() - t0
+    if args.pred:
+        pred = Predictions.from_txt(args.pred, paths, root=args.data)
+    else:
+        if not args.model:
+            raise SystemExit("[ERREUR] --pred ou --model requis")
+        from quant_sweep import eval_job
+        r = eval_job(args.model, args.imgsz, paths, args.conf, args.iou, args.max_det)
+        pred = Predictions(r['img'], r['boxes'], r['cls'], r['conf'], len(paths))
+        print(f"[INFER] {os.path.basename(args.model)} images={len(paths)} ({r['wall_s']:.1f} s)")
+    names = class_names(args)
+    t1 = time.perf_counter()
+    res = evaluate(pred, gt, nc=len(names) if names else None, conf=args.cm_conf, iou=args.cm_iou)
+    t_eval = time.perf_counter() - t1
+    print(f"[EVAL] images={res['images']} labels={res['labels']} predictions={res['predictions']} "
+          f"(labels {t_load:.2f} s, métriques {t_eval:.2f} s)")
+    print(f"{'classe':>14} {'labels':>7} {'P':>7} {'R':>7} {'F1':>7} {'mAP50':>7} {'mAP50-95':>9}")
+    print(f"{'all':>14} {res['labels']:>7} {res['precision']:>7.3f} {res['recall']:>7.3f} {res['f1']:>7.3f} "
+          f"{res['map50']:>7.3f} {res['map']:>9.3f}")
+    for c, v in res['per_class'].items():
+        name = names[c] if names and c < len(names) else str(c)
+        print(f"{name:>14} {v['labels']:>7} {v['precision']:>7.3f} {v['recall']:>7.3f} {v['f1']:>7.3f} "
+              f"{v['ap50']:>7.3f} {v['ap']:>9.3f}")
+    os.makedirs(args.outdir, exist_ok=True)
+    out = summary(res)
+    out.update({'data': args.data, 'pred': args.pred, 'model': args.model, 'names': names})
+    with open(os.path.join(args.outdir, 'metrics.json'), 'w', encoding='utf-8') as f:
+        json.dump(out, f, indent=2)
+    if not args.no_plots:
+        save_plots(res, args.outdir, names)
+    print(f"[DONE] Sorties: {args.outdir}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='mAP / courbes PR-F1 / matrice de confusion sur labels YOLO txt')
+    ap.add_argument('--data', default='valid/images', help='Images (dossier ou liste .txt) ; labels: .../labels/<image>.txt')
+    ap.add_argument('--pred', default='', help='Dossier des prédictions YOLO txt avec confiance')
+    ap.add_argument('--model', default='', help='Modèle à évaluer directement (sans --pred)')
+    ap.add_argument('--imgsz', type=int, default=640)
+    ap.add_argument('--conf', type=float, default=0.001, help='--model: seuil de confiance (bas pour le mAP)')
+    ap.add_argument('--iou', type=float, default=0.7, help='--model: IoU de la NMS')
+    ap.add_argument('--max-det', type=int, default=300)
+    ap.add_argument('--max-images', type=int, default=0)
+    ap.add_argument('--cm-conf', type=float, default=0.25, help='Matrice de confusion: confiance min.')
+    ap.add_argument('--cm-iou', type=float, default=0.45, help='Matrice de confusion: IoU min.')
+    ap.add_argument('--names', nargs='*', default=[], help='Noms des classes (sinon --data-yaml)')
+    ap.add_argument('--data-yaml', default='training/data.yaml')
+    ap.add_argument('--no-plots', action='store_true')
+    ap.add_argument('--outdir', default='runs/evaluate')
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    run_eval(parse_args())
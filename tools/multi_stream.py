@@ -0,0 +1,222 @@
+import os
+import cv2
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from detector import add_detector_args, create_detector
+from stream_scheduler import POLICIES, StreamScheduler
+from motion_gate import add_gate_args
+from roi import add_roi_args
+from tracking import add_track_args
+from abandon import add_abandon_args
+from video_infer import FrameProcessor
+
+# Plusieurs caméras / vidéos traitées simultanément sur une seule machine
+# - un thread lecteur par flux -> StreamScheduler (files courtes, budget de latence)
+# - W workers, chacun avec son propre détecteur (les interpreters TFLite ne sont pas thread-safe)
+# - l'état par flux (MotionGate, tuiles ROI, pistes, objets abandonnés) vit dans un
+#   FrameProcessor par flux ; le worker qui sert le flux lui prête son détecteur
+# Sorties: <outdir>/<flux>_det.jsonl (une ligne par frame traitée), <flux>_events.jsonl,
+# multi_stats.json (débit agrégé, latences, frames jetées par flux).
+#   python tools/multi_stream.py --source cam1.mp4 cam2.mp4 0 --workers 2 --policy motion --budget-ms 200 --realtime
+
+
+def list_sources(sources):
+    # -> [(nom, source cv2, live)] ; entier = caméra locale, URL = flux réseau, dossier = ses .mp4
+    out = []
+    for src in sources:
+        if src.isdigit():
+            out.append((f"cam{src}", int(src), True))
+        elif '://' in src:
+            out.append((src.rstrip('/').split('/')[-1] or 'stream', src, True))
+        elif os.path.isdir(src):
+            out.extend((p.stem, str(p), False) for p in sorted(Path(src).glob('*.mp4')))
+        else:
+            out.append((os.path.splitext(os.path.basename(src))[0], src, False))
+    seen = {}
+    named = []
+    for name, src, live in out:
+        k = seen[name] = seen.get(name, 0) + 1
+        named.append((name if k == 1 else f"{name}_{k}", src, live))
+    return named
+
+
+class StreamSink:
+    # Flux de détections / événements d'une caméra (JSON lines)
+    def __init__(self, outdir: str, name: str):
+        self.det = open(os.path.join(outdir, f"{name}_det.jsonl"), 'w', encoding='utf-8')
+        self.ev = open(os.path.join(outdir, f"{name}_events.jsonl"), 'w', encoding='utf-8')
+        self.events_written = 0
+
+    def write(self, idx, t, lat_ms, boxes, scores, ids, events, classes=None):
+        # lat_ms=None: traitement hors ligne, pas de latence capture -> résultat
+        # classes: écrites seulement pour un modèle multi-classes
+        rec = {'frame': idx, 't': round(t, 3)}
+        if lat_ms is not None:
+            rec['lat_ms'] = round(lat_ms, 2)
+        rec.update({'boxes': np.round(boxes, 1).tolist(), 'scores': np.round(scores, 3).tolist()})
+        if ids is not None:
+            rec['ids'] = ids.tolist()
+        if classes is not None:
+            rec['classes'] = classes.tolist()
+        self.det.write(json.dumps(rec) + '\n')
+        for ev in events[self.events_written:]:
+            self.ev.write(json.dumps(ev) + '\n')
+        self.events_written = len(events)
+
+    def close(self):
+        self.det.close()
+        self.ev.close()
+
+
+def read_loop(sched, sid, src, live, realtime, max_frames):
+    cap = cv2.VideoCapture(src)
+    try:
+        if not cap.isOpened():
+            print(f"[WARN] Impossible d'ouvrir: {src}")
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        t0 = time.perf_counter()
+        idx = 0
+        while not sched.stop.is_set():
+            if realtime and not live:
+                # fichier lu à sa cadence nominale: émule une caméra
+                wait = t0 + idx / fps - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            ok, frame = cap.read()
+            if not ok:
+                break
+            idx += 1
+            if not sched.push(sid, idx, frame):
+                break
+            if max_frames and idx >= max_frames:
+                break
+    finally:
+        cap.release()
+        sched.close(sid)
+
+
+def stream_priority(proc, boxes, alert) -> float:
+    # activité du flux au dernier passage: fraction de blocs en mouvement (ou présence de
+    # détections sans MotionGate), +1 si une alerte objet abandonné est active
+    if proc.gate is not None and proc.gate.mask is not None:
+        act = proc.gate.changed / float(proc.gate.mask.size)
+    else:
+        act = 1.0 if len(boxes) else 0.0
+    return act + (1.0 if alert is not None and alert.any() else 0.0)
+
+
+def work_loop(sched, det, procs, sinks, errors):
+    while True:
+        item = sched.acquire()
+        if item is None:
+            break
+        sid, idx, frame, t_cap = item
+        proc = procs[sid]
+        prio = None
+        try:
+            proc.det = det
+            boxes, scores, ids, alert, classes = proc(frame, idx)
+            sinks[sid].write(idx, idx / proc.fps, (time.perf_counter() - t_cap) * 1000, boxes, scores, ids, proc.events,
+                             classes if proc.multiclass else None)
+            prio = stream_priority(proc, boxes, alert)
+        except Exception as e:
+            errors.append(e)
+            sched.shutdown()
+        finally:
+            sched.release(sid, t_cap, prio)
+
+
+def run_multi(args):
+    sources = list_sources(args.source)
+    if not sources:
+        raise SystemExit("[ERREUR] Aucune source")
+    os.makedirs(args.outdir, exist_ok=True)
+    n_workers = args.workers or min(len(sources), os.cpu_count() or 1)
+    detectors = [create_detector(args) for _ in range(n_workers)]
+    print(f"[INFO] Model={args.model} streams={len(sources)} workers={n_workers} policy={args.policy} budget={args.budget_ms} ms")
+    print(detectors[0].describe())
+
+    sched = StreamScheduler(policy=args.policy, budget_ms=args.budget_ms, depth=args.queue_depth,
+                            drop_oldest=args.realtime)
+    procs, sinks, readers = [], [], []
+    for name, src, live in sources:
+        sid = sched.add_stream(name, drop_oldest=True if live else None)
+        proc = FrameProcessor(detectors[0], args, name=name, slot=f"s{sid}")
+        cap = cv2.VideoCapture(src)
+        proc.reset(cap.get(cv2.CAP_PROP_FPS) or 25.0)
+        cap.release()
+        procs.append(proc)
+        sinks.append(StreamSink(args.outdir, name))
+        readers.append(threading.Thread(target=read_loop, name=f"read-{name}", daemon=True,
+                                        args=(sched, sid, src, live, args.realtime, args.max_frames)))
+    errors = []
+    workers = [threading.Thread(target=work_loop, name=f"infer-{i}", daemon=True, args=(sched, det, procs, sinks, errors))
+               for i, det in enumerate(detectors)]
+    for t in readers + workers:
+        t.start()
+    try:
+        for t in workers:
+            while t.is_alive():
+                t.join(0.5)
+    except KeyboardInterrupt:
+        print("[INFO] Arrêt demandé")
+        sched.shutdown()
+    sched.shutdown()
+    for t in readers + workers:
+        t.join()
+    for s in sinks:
+        s.close()
+    if errors:
+        raise errors[0]
+
+    st = sched.stats()
+    st['workers'] = n_workers
+    for p, proc in zip(st['streams'], procs):
+        p['events'] = len(proc.events)
+        p['infer_mean_ms'] = float(np.mean(proc.times)) if proc.times else 0.0
+        if proc.gate is not None:
+            p['gated_ratio'] = proc.gate.stats()['gated_ratio']
+        print(f"[STREAM] {p['name']} read={p['read']} processed={p['processed']} dropped={p['dropped_queue']}+{p['dropped_late']} "
+              f"late={p['late']} fps={p['fps']:.2f} lat p50={p['latency_p50_ms']:.1f} ms p99={p['latency_p99_ms']:.1f} ms events={p['events']}")
+    print(f"[MULTI] streams={len(sources)} workers={n_workers} processed={st['processed']} dropped={st['dropped']} "
+          f"fps={st['fps']:.2f} ({st['fps'] / len(sources):.2f} par flux) wall={st['wall_s']:.1f} s")
+    with open(os.path.join(args.outdir, 'multi_stats.json'), 'w', encoding='utf-8') as f:
+        json.dump(st, f, indent=2)
+    print(f"[DONE] Sorties: {args.outdir}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Inférence YOLOv8 multi-flux (plusieurs caméras sur une machine)')
+    ap.add_argument('--model', default='runs/detect/train3/weights/yolov8n_bag_int8.tflite')
+    ap.add_argument('--source', nargs='+', required=True, help='Vidéos, dossiers, index caméra (0, 1...) ou URL rtsp://')
+    ap.add_argument('--outdir', default='runs/multi_stream')
+    ap.add_argument('--imgsz', type=int, default=640)
+    ap.add_argument('--conf', type=float, default=0.25)
+    ap.add_argument('--iou', type=float, default=0.45)
+    ap.add_argument('--max-frames', type=int, default=0, help='Frames lues par flux (0 = toutes)')
+    ap.add_argument('--workers', type=int, default=0, help='Workers d\'inférence, un détecteur chacun (0 = min(flux, CPU))')
+    ap.add_argument('--policy', choices=POLICIES, default='round_robin', help='Ordonnancement des flux')
+    ap.add_argument('--budget-ms', type=float, default=0.0, help='Latence max capture -> résultat ; frames plus vieilles jetées (0 = pas de budget)')
+    ap.add_argument('--queue-depth', type=int, default=2, help='Frames en attente par flux')
+    ap.add_argument('--realtime', action='store_true', help='Lire les fichiers à leur cadence et jeter les frames en retard (émulation caméras)')
+    add_detector_args(ap)
+    add_gate_args(ap)
+    add_roi_args(ap)
+    add_track_args(ap)
+    add_abandon_args(ap)
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    run_multi(parse_args())
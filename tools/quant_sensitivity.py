@@ -0,0 +1,232 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from calib_cache import CalibCache, add_calib_args, calib_from_args
+from detector import HEADS, resolve_head
+from postprocess_yolov8 import REG_MAX, n_anchors
+from quant_sweep import METHODS, onnx_imgsz
+
+# Analyse de sensibilité à la quantification, couche par couche, et modèle INT8 en précision mixte
+# - groupes de nœuds quantifiables (--op-types, Conv par défaut): --granularity block = un bloc
+#   YOLOv8 (/model.N/..., branches de la tête séparées), node = un nœud
+# - pour chaque groupe: quantification de ce groupe seul (nodes_to_quantize, quantize_onnx), le reste
+#   en float, calibré sur les --sens-images premières images du cache de calibration (calib_cache.py) ;
+#   une tâche par groupe sur un ProcessPoolExecutor, ONNX Runtime CPU, --threads par processus
+# - divergence de la sortie brute vs le modèle float sur les --eval-images premières images du cache:
+#   SQNR (dB, toute la sortie), erreur moyenne des scores de classe, erreur des boîtes des ancres
+#   où le float détecte (score >= --score-thr ; pixels en tête décodée, logits DFL en tête brute)
+# - classement par --metric (le pire en premier), puis modèle mixte: quantification complète (tout
+#   le cache, --method) avec nodes_to_exclude = nœuds des --exclude-top pires groupes et de ceux sous
+#   --exclude-below-db ; référence INT8 complète mesurée de la même façon
+# Sorties dans --outdir: sensitivity.json, exclude.txt (NODES_EXCLUDE de quantize_int8_onnx.py),
+# <modèle>_mixed_int8.onnx
+#   python tools/quant_sensitivity.py --model training/best.onnx --calib valid/images --exclude-top 3 --workers 4
+
+METRICS = ('sqnr', 'score_mae', 'box_mae')
+# bloc /model.N ; la tête Detect est découpée par branche (cv2.i boîtes, cv3.i classes, dfl)
+_BLOCK = re.compile(r'^/?(model\.\d+(?:/(?:cv[23]\.\d+|dfl)(?=/))?)(?:/|$)')
+
+
+def node_groups(model_path: str, op_types, granularity: str):
+    # -> [(groupe, [noms de nœuds])] dans l'ordre du graphe
+    import onnx
+    graph = onnx.load(model_path, load_external_data=False).graph
+    groups = {}
+    unnamed = 0
+    for node in graph.node:
+        if node.op_type not in op_types:
+            continue
+        if not node.name:
+            unnamed += 1
+            continue
+        m = _BLOCK.match(node.name) if granularity == 'block' else None
+        groups.setdefault(m.group(1) if m else node.name, []).append(node.name)
+    if unnamed:
+        print(f"[WARN] {unnamed} nœuds {'/'.join(op_types)} sans nom ignorés (non adressables par nodes_to_exclude)")
+    return list(groups.items())
+
+
+def model_inputs(model_path: str):
+    import onnx
+    m = onnx.load(model_path, load_external_data=False)
+    meta = {p.key: p.value for p in m.metadata_props}
+    return (m.graph.input[0].name if m.graph.input else 'images'), meta
+
+
+def run_model(path: str, x: np.ndarray, input_name: str, threads: int) -> np.ndarray:
+    # une image à la fois (exports batch 1) -> sorties empilées (E, ...)
+    import onnxruntime as ort
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = threads
+    so.inter_op_num_threads = 1
+    sess = ort.InferenceSession(path, sess_options=so, providers=['CPUExecutionProvider'])
+    out = sess.get_outputs()[0].name
+    return np.concatenate([sess.run([out], {input_name: x[i:i + 1]})[0] for i in range(x.shape[0])])
+
+
+def channels_first(out: np.ndarray, imgsz: int) -> np.ndarray:
+    # (E, C, N) quelle que soit la disposition de la sortie
+    n = n_anchors(imgsz)
+    return out if out.shape[-1] == n or out.shape[1] != n else out.transpose(0, 2, 1)
+
+
+def divergence(ref: np.ndarray, out: np.ndarray, box_ch: int, raw: bool, score_thr: float) -> dict:
+    ref = ref.astype(np.float64)
+    err = out.astype(np.float64) - ref
+    sqnr = 10 * np.log10(np.sum(ref ** 2) / max(float(np.sum(err ** 2)), 1e-20))
+    s_ref, s_out = ref[:, box_ch:], out[:, box_ch:].astype(np.float64)
+    if raw:
+        # tête brute: logits de classe -> probabilités
+        s_ref, s_out = 1 / (1 + np.exp(-s_ref)), 1 / (1 + np.exp(-s_out))
+    det = s_ref.max(1) >= score_thr  # (E, N) ancres où le float détecte
+    box_err = np.abs(err[:, :box_ch]).transpose(0, 2, 1)[det]
+    return {'sqnr_db': float(sqnr), 'score_mae': float(np.abs(s_out - s_ref).mean()),
+            'score_max': float(np.abs(s_out - s_ref).max()),
+            'box_mae': float(box_err.mean()) if box_err.size else 0.0, 'anchors': int(det.sum())}
+
+
+def sens_job(model: str, out_path: str, nodes, exclude, calib_paths, imgsz: int, cache_dir: str, calib_images: int,
+             method: str, per_channel: bool, op_types, ref_path: str, eval_images: int, input_name: str,
+             box_ch: int, raw: bool, score_thr: float, threads: int, keep: bool = False) -> dict:
+    # Processus worker: quantification (groupe seul, ou tout sauf `exclude`) + divergence vs float
+    from quantize_int8_onnx import YoloImageFolder, quantize_onnx
+    t0 = time.perf_counter()
+    cache = CalibCache(calib_paths, imgsz, cache_dir)
+    reader = YoloImageFolder('', input_name=input_name, cache=cache, limit=calib_images, verbose=False)
+    quantize_onnx(model, out_path, reader, method, per_channel, op_types, nodes_to_quantize=nodes, nodes_to_exclude=exclude)
+    t1 = time.perf_counter()
+    ref = np.load(ref_path, mmap_mode='r')
+    out = channels_first(run_model(out_path, cache.batch(0, eval_images), input_name, threads), imgsz)
+    res = divergence(np.asarray(ref), out, box_ch, raw, score_thr)
+    res.update({'quant_s': t1 - t0, 'eval_s': time.perf_counter() - t1})
+    if not keep:
+        os.remove(out_path)
+    return res
+
+
+def badness(row: dict, metric: str) -> float:
+    return -row['sqnr_db'] if metric == 'sqnr' else row[metric]
+
+
+def run_sensitivity(args):
+    model = args.model
+    stem = os.path.splitext(os.path.basename(model))[0]
+    os.makedirs(args.outdir, exist_ok=True)
+    tmp = os.path.join(args.outdir, 'tmp')
+    os.makedirs(tmp, exist_ok=True)
+    imgsz = onnx_imgsz(model, args.imgsz)
+    input_name, meta = model_inputs(model)
+    raw = resolve_head(model, args.head, meta) == 'raw'
+    groups = node_groups(model, args.op_types, args.granularity)
+    if not groups:
+        raise SystemExit(f"[ERREUR] Aucun nœud {'/'.join(args.op_types)} nommé dans {model}")
+    cache = calib_from_args(args, imgsz)
+    n_eval = min(args.eval_images, len(cache))
+    n_workers = args.workers or os.cpu_count() or 1
+    print(f"[INFO] {model} imgsz={imgsz} tête={'brute' if raw else 'décodée'} groupes={len(groups)} "
+          f"({sum(len(n) for _, n in groups)} nœuds) calib={min(args.sens_images, len(cache))}/{len(cache)} "
+          f"eval={n_eval} workers={n_workers}")
+
+    # sortie float de référence, partagée avec les workers par fichier (memmap)
+    ref = channels_first(run_model(model, cache.batch(0, n_eval), input_name, args.threads * n_workers), imgsz)
+    box_ch = 4 * REG_MAX if raw else 4
+    if ref.shape[1] <= box_ch:
+        raise SystemExit(f"[ERREUR] Sortie {ref.shape} incompatible avec une tête {'brute' if raw else 'décodée'} (--head)")
+    ref_path = os.path.join(tmp, 'ref.npy')
+    np.save(ref_path, ref)
+    common = dict(calib_paths=cache.paths, imgsz=imgsz, cache_dir=args.calib_cache, method=args.method,
+                  per_channel=args.per_channel, op_types=args.op_types, ref_path=ref_path, eval_images=n_eval,
+                  input_name=input_name, box_ch=box_ch, raw=raw, score_thr=args.score_thr, threads=args.threads)
+
+    t0 = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futs = [(g, nodes, pool.submit(sens_job, model, os.path.join(tmp, f'g{k}.onnx'), nodes, None,
+                                       calib_images=args.sens_images, **common))
+                for k, (g, nodes) in enumerate(groups)]
+        for g, nodes, f in futs:
+            try:
+                r = f.result()
+            except Exception as e:
+                print(f"[WARN] {g}: quantification impossible ({e})")
+                continue
+            r.update({'group': g, 'nodes': nodes})
+            rows.append(r)
+            print(f"[SENS] {g:<40} nœuds={len(nodes):>3} SQNR={r['sqnr_db']:6.1f} dB score_mae={r['score_mae']:.4f} "
+                  f"box_mae={r['box_mae']:.3f}")
+    print(f"[INFO] Analyse: {time.perf_counter() - t0:.1f} s")
+    rows.sort(key=lambda r: -badness(r, args.metric))
+
+    worst = rows[:args.exclude_top]
+    if args.exclude_below_db is not None:
+        worst += [r for r in rows[args.exclude_top:] if r['sqnr_db'] < args.exclude_below_db]
+    exclude = [n for r in worst for n in r['nodes']]
+    for rank, r in enumerate(rows, 1):
+        r['rank'] = rank
+        r['excluded'] = any(r is w for w in worst)
+
+    # INT8 complet vs précision mixte: même calibration (tout le cache), même mesure
+    mixed_path = os.path.join(args.outdir, f'{stem}_mixed_int8.onnx')
+    full_path = os.path.join(tmp, f'{stem}_full_int8.onnx')
+    with ProcessPoolExecutor(max_workers=min(2, n_workers)) as pool:
+        ff = pool.submit(sens_job, model, full_path, None, None, calib_images=0, **common)
+        fm = pool.submit(sens_job, model, mixed_path, None, exclude, calib_images=0, keep=True, **common)
+        full, mixed = ff.result(), fm.result()
+
+    with open(os.path.join(args.outdir, 'exclude.txt'), 'w', encoding='utf-8') as f:
+        f.write(f"# {model} ; --metric {args.metric} ; groupes exclus: {', '.join(r['group'] for r in worst)}\n")
+        f.writelines(n + '\n' for n in exclude)
+    n_nodes = sum(len(n) for _, n in groups)
+    print(f"{'rang':>4} {'groupe':<40} {'nœuds':>5} {'SQNR dB':>8} {'score_mae':>9} {'box_mae':>8}")
+    for r in rows[:args.top or None]:
+        print(f"{r['rank']:>4} {r['group']:<40} {len(r['nodes']):>5} {r['sqnr_db']:>8.1f} {r['score_mae']:>9.4f} "
+              f"{r['box_mae']:>8.3f}{'  float' if r['excluded'] else ''}")
+    print(f"[INT8] complet: SQNR={full['sqnr_db']:.1f} dB score_mae={full['score_mae']:.4f} box_mae={full['box_mae']:.3f}")
+    print(f"[MIXTE] {len(exclude)}/{n_nodes} nœuds float: SQNR={mixed['sqnr_db']:.1f} dB score_mae={mixed['score_mae']:.4f} "
+          f"box_mae={mixed['box_mae']:.3f} -> {mixed_path}")
+    with open(os.path.join(args.outdir, 'sensitivity.json'), 'w', encoding='utf-8') as f:
+        json.dump({'model': model, 'imgsz': imgsz, 'head': 'raw' if raw else 'decoded', 'granularity': args.granularity,
+                   'metric': args.metric, 'method': args.method, 'per_channel': args.per_channel,
+                   'op_types': args.op_types, 'sens_images': args.sens_images, 'eval_images': n_eval,
+                   'groups': rows, 'full_int8': full, 'mixed': dict(mixed, path=mixed_path, excluded_nodes=exclude)},
+                  f, indent=2)
+    os.remove(ref_path)
+    print(f"[DONE] Sorties: {args.outdir} (NODES_EXCLUDE={os.path.join(args.outdir, 'exclude.txt')} pour quantize_int8_onnx.py)")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Sensibilité à la quantification par couche / bloc et modèle INT8 en précision mixte')
+    ap.add_argument('--model', required=True, help='Export ONNX float')
+    ap.add_argument('--imgsz', type=int, default=640, help='Si l\'entrée du modèle est dynamique')
+    ap.add_argument('--head', choices=HEADS, default='auto')
+    ap.add_argument('--granularity', choices=['block', 'node'], default='block')
+    ap.add_argument('--op-types', nargs='+', default=['Conv'])
+    ap.add_argument('--method', choices=METHODS, default='MinMax', help='Calibration (analyse et modèle mixte)')
+    ap.add_argument('--per-channel', type=int, choices=[0, 1], default=1)
+    ap.add_argument('--sens-images', type=int, default=32, help='Images de calibration par groupe analysé')
+    ap.add_argument('--eval-images', type=int, default=16, help='Images de mesure de la divergence')
+    ap.add_argument('--score-thr', type=float, default=0.25, help='Ancres prises en compte pour box_mae')
+    ap.add_argument('--metric', choices=METRICS, default='sqnr', help='Critère de classement')
+    ap.add_argument('--exclude-top', type=int, default=3, help='Pires groupes laissés en float')
+    ap.add_argument('--exclude-below-db', type=float, default=None, help='Laisser aussi en float les groupes sous ce SQNR')
+    ap.add_argument('--threads', type=int, default=1, help='Threads ONNX Runtime par processus')
+    ap.add_argument('--workers', type=int, default=0, help='Processus (0 = nb de cœurs)')
+    ap.add_argument('--top', type=int, default=30, help='Lignes affichées (0 = toutes)')
+    ap.add_argument('--outdir', default='runs/quant_sensitivity')
+    add_calib_args(ap)
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    run_sensitivity(parse_args())
@@ -0,0 +1,246 @@
+import os
+import cv2
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from pathlib import Path
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from calib_cache import CalibCache, add_calib_args, list_calib_images
+from detector import create_detector
+from yolo_eval import LabelStore, Predictions, evaluate, list_images
+from bench import percentiles
+
+# Balayage de quantification: précision (mAP@0.5) et latence CPU de chaque modèle candidat
+# Candidats:
+#   --models        modèles existants évalués tels quels (float ou INT8, .onnx / .tflite)
+#   --float-onnx    exports ONNX float -> une variante par (--methods, --per-channel, --op-types),
+#                   quantifiée par quantize_int8_onnx.quantize_onnx
+#   --saved-model   SavedModel TF (suffixe @imgsz, ex. best_saved_model@320) -> une variante par
+#                   --tflite-ops, convertie par tflite_int8_quantize.convert
+#   imgsz 320 / 640: un export float par taille (l'imgsz ONNX est lu dans le graphe)
+# Calibration: cache partagé (calib_cache.py) construit une fois par imgsz avant les conversions.
+# Étapes, chacune sur un ProcessPoolExecutor (--workers): conversions, puis inférence de toutes les
+# images de validation par candidat (labels YOLO txt: .../images/x.jpg -> .../labels/x.txt, mAP
+# vectorisé, yolo_eval.py) ; la latence est mesurée ensuite candidat par candidat, seul sur la
+# machine (un processus, --threads), pour ne pas être faussée par les autres workers.
+# Tableau trié par latence, '*' = front de Pareto (aucun autre candidat à la fois plus précis et
+# plus rapide). Tout en local, CPU seul.
+#   python tools/quant_sweep.py --float-onnx training/best.onnx --methods MinMax Entropy Percentile \
+#       --per-channel 1 0 --models training/best-int8.onnx training/yolov8n_bag_int8.tflite \
+#       --data valid/images --calib valid/images --workers 4
+
+METHODS = ('MinMax', 'Entropy', 'Percentile', 'Distribution')
+TFLITE_OPS = ('int8', 'int8_float')
+
+
+def onnx_imgsz(path: str, default: int) -> int:
+    import onnx
+    dims = onnx.load(path, load_external_data=False).graph.input[0].type.tensor_type.shape.dim
+    return (dims[2].dim_value or default) if len(dims) == 4 else default
+
+
+def split_imgsz(spec: str, default: int):
+    # 'chemin@320' -> ('chemin', 320)
+    path, sep, sz = spec.rpartition('@')
+    return (path, int(sz)) if sep and sz.isdigit() else (spec, default)
+
+
+def plan_candidates(args):
+    # -> [{'name', 'model', 'imgsz', 'build' (None = modèle existant)}]
+    out = []
+    for m in args.models:
+        m, sz = split_imgsz(m, args.imgsz)
+        out.append({'name': os.path.basename(m), 'model': m, 'imgsz': sz, 'build': None})
+    mdir = os.path.join(args.outdir, 'models')
+    for src in args.float_onnx:
+        sz = onnx_imgsz(src, args.imgsz)
+        stem = os.path.splitext(os.path.basename(src))[0]
+        for method, pc, ops in itertools.product(args.methods, args.per_channel, args.op_types):
+            name = f"{stem}_{method.lower()}_{'pc' if pc else 'pt'}_{ops.replace(',', '-').lower()}_int8.onnx"
+            out.append({'name': name, 'model': os.path.join(mdir, name), 'imgsz': sz,
+                        'build': {'kind': 'onnx', 'src': src, 'method': method, 'per_channel': bool(pc),
+                                  'op_types': ops.split(',')}})
+    for spec in args.saved_model:
+        src, sz = split_imgsz(spec, args.imgsz)
+        stem = os.path.basename(os.path.normpath(src))
+        for ops in args.tflite_ops:
+            name = f"{stem}_{sz}_{ops}.tflite"
+            out.append({'name': name, 'model': os.path.join(mdir, name), 'imgsz': sz,
+                        'build': {'kind': 'tflite', 'src': src, 'ops': ops}})
+    return out
+
+
+def build_job(cand: dict, calib_paths, cache_dir: str) -> float:
+    # Processus worker: une conversion ; cache de calibration déjà construit (memmap)
+    t0 = time.perf_counter()
+    b = cand['build']
+    cache = CalibCache(calib_paths, cand['imgsz'], cache_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(cand['model'])), exist_ok=True)
+    if b['kind'] == 'onnx':
+        import onnx
+        from quantize_int8_onnx import YoloImageFolder, quantize_onnx
+        graph = onnx.load(b['src'], load_external_data=False).graph
+        reader = YoloImageFolder('', input_name=graph.input[0].name if graph.input else 'images', cache=cache)
+        quantize_onnx(b['src'], cand['model'], reader, b['method'], b['per_channel'], b['op_types'])
+    else:
+        from tflite_int8_quantize import convert
+        convert(b['src'], cand['model'], cache, b['ops'])
+    return time.perf_counter() - t0
+
+
+def _detector(model: str, imgsz: int, conf: float, iou: float, threads: int):
+    return create_detector(Namespace(model=model, backend='auto', conf=conf, iou=iou, threads=threads, providers=[],
+                                     head='auto', imgsz=imgsz, replay_latency_ms=0.0, class_conf=[], agnostic_nms=False))
+
+
+def eval_job(model: str, imgsz: int, paths, conf: float, iou: float, max_det: int) -> dict:
+    # Processus worker: prédictions (coordonnées normalisées) sur toutes les images de validation
+    cv2.setNumThreads(1)
+    t0 = time.perf_counter()
+    det = _detector(model, imgsz, conf, iou, 1)
+    img, boxes, cls, scores = [], [], [], []
+    for i, p in enumerate(paths):
+        im = cv2.imread(p)
+        if im is None:
+            continue
+        h, w = im.shape[:2]
+        d = det.detect(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))  # RGB: comme les scripts images
+        keep = np.argsort(-d.scores, kind='stable')[:max_det]
+        img.append(np.full(keep.size, i, np.int64))
+        boxes.append(np.asarray(d.boxes, np.float32).reshape(-1, 4)[keep] / np.array([w, h, w, h], np.float32))
+        cls.append(np.asarray(d.classes, np.int64)[keep])
+        scores.append(np.asarray(d.scores, np.float32)[keep])
+    cat = lambda a, shape, dt: np.concatenate(a) if a else np.zeros(shape, dt)
+    return {'img': cat(img, 0, np.int64), 'boxes': cat(boxes, (0, 4), np.float32), 'cls': cat(cls, 0, np.int64),
+            'conf': cat(scores, 0, np.float32), 'wall_s': time.perf_counter() - t0}
+
+
+def latency_job(model: str, imgsz: int, image: str, threads: int, warmup: int, runs: int) -> dict:
+    # Processus seul sur la machine: invoke et chaîne complète (pré + invoke + post) d'une image
+    det = _detector(model, imgsz, 0.25, 0.45, threads)
+    frame = cv2.cvtColor(cv2.imread(image), cv2.COLOR_BGR2RGB)
+    invoke, total = [], []
+    for k in range(warmup + runs):
+        det.infer(frame)
+        if k >= warmup:
+            invoke.append(det.timing['infer_ms'])
+            total.append(det.timing['pre_ms'] + det.timing['infer_ms'] + det.timing['post_ms'])
+    return {'invoke_ms': percentiles(invoke), 'total_ms': percentiles(total)}
+
+
+def pareto(rows, acc: str = 'map50', lat: str = 'latency_ms'):
+    # front de Pareto: précision max., latence min.
+    for r in rows:
+        r['pareto'] = not any(o is not r and o[acc] >= r[acc] and o[lat] <= r[lat] and
+                              (o[acc] > r[acc] or o[lat] < r[lat]) for o in rows)
+
+
+def run_sweep(args):
+    cands = plan_candidates(args)
+    if not cands:
+        raise SystemExit("[ERREUR] Aucun candidat: --models, --float-onnx ou --saved-model")
+    paths = list_images(args.data, args.max_images)
+    if not paths:
+        raise SystemExit(f"[ERREUR] Aucune image de validation: {args.data}")
+    gt = LabelStore.from_images(paths)
+    n_workers = args.workers or os.cpu_count() or 1
+    print(f"[INFO] candidats={len(cands)} images={len(paths)} labels={len(gt)} workers={n_workers}")
+    os.makedirs(args.outdir, exist_ok=True)
+
+    builds = [c for c in cands if c['build'] is not None and (args.rebuild or not os.path.exists(c['model']))]
+    failed = {}
+    if builds:
+        calib = list_calib_images(args.calib, args.calib_max, args.calib_seed)
+        if not calib:
+            raise SystemExit(f"[ERREUR] Aucune image de calibration: {args.calib}")
+        for sz in sorted({c['imgsz'] for c in builds}):
+            cache = CalibCache(calib, sz, args.calib_cache, workers=args.calib_workers)
+            print(f"[CALIB] imgsz={sz} {cache.path} ({len(cache)} images, {'construit' if cache.built else 'réutilisé'})")
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futs = [(c, pool.submit(build_job, c, calib, args.calib_cache)) for c in builds]
+            for c, f in futs:
+                try:
+                    print(f"[BUILD] {c['name']} ({f.result():.1f} s)")
+                except Exception as e:
+                    print(f"[WARN] Conversion impossible {c['name']}: {e}")
+                    failed[c['name']] = str(e)
+    cands = [c for c in cands if c['name'] not in failed]
+
+    t0 = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futs = [(c, pool.submit(eval_job, c['model'], c['imgsz'], paths, args.conf, args.iou, args.max_det)) for c in cands]
+        for c, f in futs:
+            try:
+                r = f.result()
+            except Exception as e:
+                print(f"[WARN] Évaluation impossible {c['name']}: {e}")
+                failed[c['name']] = str(e)
+                continue
+            m = evaluate(Predictions(r['img'], r['boxes'], r['cls'], r['conf'], len(paths)), gt)
+            rows.append({'name': c['name'], 'model': c['model'], 'imgsz': c['imgsz'], 'build': c['build'],
+                         'size_mb': os.path.getsize(c['model']) / 1048576 if os.path.isfile(c['model']) else 0.0,
+                         'map50': m['map50'], 'map': m['map'], 'f1': m['f1'],
+                         'ap50': {c: v['ap50'] for c, v in m['per_class'].items()}, 'predictions': m['predictions'],
+                         'eval_s': r['wall_s']})
+            print(f"[EVAL] {c['name']} mAP50={m['map50']:.4f} mAP50-95={m['map']:.4f} ({r['wall_s']:.1f} s)")
+    print(f"[INFO] Évaluation: {time.perf_counter() - t0:.1f} s")
+
+    # latence: un candidat à la fois, processus neuf
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        for r in rows:
+            lat = pool.submit(latency_job, r['model'], r['imgsz'], paths[0], args.threads, args.warmup, args.runs).result()
+            r.update(lat)
+            r['latency_ms'] = lat['total_ms']['p50']
+    pareto(rows)
+    rows.sort(key=lambda r: r['latency_ms'])
+
+    print(f"{'':1} {'name':<48} {'imgsz':>6} {'size_mb':>8} {'map50':>7} {'map':>7} {'p50_ms':>8} {'inv_p90':>8}")
+    for r in rows:
+        print(f"{'*' if r['pareto'] else ' ':1} {r['name']:<48} {r['imgsz']:>6} {r['size_mb']:>8.2f} {r['map50']:>7.4f} {r['map']:>7.4f} "
+              f"{r['latency_ms']:>8.2f} {r['invoke_ms']['p90']:>8.2f}")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'data': args.data, 'images': len(paths), 'labels': len(gt), 'threads': args.threads,
+                       'conf': args.conf, 'iou': args.iou, 'rows': rows, 'failed': failed}, f, indent=2)
+        print(f"[DONE] Résultats: {args.out}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Quantification: précision (mAP@0.5) vs latence CPU des modèles candidats')
+    ap.add_argument('--models', nargs='*', default=[], help='Modèles existants (.onnx / .tflite, suffixe @imgsz possible)')
+    ap.add_argument('--float-onnx', nargs='*', default=[], help='Exports ONNX float à quantifier')
+    ap.add_argument('--saved-model', nargs='*', default=[], help='SavedModel TF à convertir en TFLite INT8 (suffixe @imgsz)')
+    ap.add_argument('--methods', nargs='+', choices=METHODS, default=['MinMax', 'Entropy', 'Percentile'])
+    ap.add_argument('--per-channel', type=int, nargs='+', choices=[0, 1], default=[1])
+    ap.add_argument('--op-types', nargs='+', default=['Conv'], help='ONNX: opérateurs quantifiés, séparés par des virgules (ex. Conv Conv,Mul,Add)')
+    ap.add_argument('--tflite-ops', nargs='+', choices=TFLITE_OPS, default=['int8'])
+    ap.add_argument('--rebuild', action='store_true', help='Reconvertir même si le modèle candidat existe')
+    ap.add_argument('--data', default='valid/images', help='Images de validation (dossier ou liste .txt), labels YOLO associés')
+    ap.add_argument('--max-images', type=int, default=0)
+    ap.add_argument('--imgsz', type=int, default=640, help='imgsz par défaut (SavedModel, ONNX dynamique)')
+    ap.add_argument('--conf', type=float, default=0.001, help='Seuil bas pour le calcul du mAP')
+    ap.add_argument('--iou', type=float, default=0.7)
+    ap.add_argument('--max-det', type=int, default=300)
+    ap.add_argument('--threads', type=int, default=1, help='Threads d\'inférence pour la mesure de latence')
+    ap.add_argument('--warmup', type=int, default=10)
+    ap.add_argument('--runs', type=int, default=100)
+    ap.add_argument('--workers', type=int, default=0, help='Processus (0 = nb de cœurs)')
+    ap.add_argument('--outdir', default='runs/quant_sweep')
+    ap.add_argument('--out', default='runs/quant_sweep/sweep.json')
+    add_calib_args(ap)
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    run_sweep(parse_args())
@@ -0,0 +1,250 @@
+import os
+import cv2
+import sys
+import copy
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from detector import add_detector_args, create_detector
+from video_chunks import open_at, plan_chunks, probe_keyframes, video_info
+from motion_gate import add_gate_args
+from roi import add_roi_args
+from tracking import add_track_args
+from abandon import add_abandon_args
+from video_infer import FrameProcessor
+from multi_stream import StreamSink
+from detlog import DetLogWriter, add_detlog_args, detlog_path
+from replay import add_record_args, open_record
+
+# Ré-analyse hors ligne d'archives vidéo avec un nouveau modèle, sur tous les cœurs
+# - chaque vidéo est découpée en segments alignés sur les images-clés (video_chunks.py)
+# - les segments de toutes les vidéos sont répartis sur un ProcessPoolExecutor ; un détecteur
+#   par processus, 1 thread d'inférence par défaut (le parallélisme vient des processus)
+# - un segment ne fait que la détection (gate + ROI compris) ; avec --motion-gate, les
+#   --preroll frames précédentes amorcent le fond du gate sans inférence
+# - le processus principal recolle les segments dans l'ordre des frames et y rejoue tracking
+#   + objets abandonnés: l'état des pistes traverse les frontières de segment tel quel, les ids
+#   et événements sont ceux d'un passage séquentiel
+# Sorties: <outdir>/<vidéo>_det.jsonl, <vidéo>_events.jsonl (format multi_stream), <vidéo>_det.bin
+# (journal colonnaire, voir detlog.py), <vidéo>_dets.bin avec --record (rejeu, voir replay.py),
+# reanalyze_stats.json
+#   python tools/reanalyze.py --source archives/ --workers 8 --chunk-s 60 --abandon
+
+_WORKER = {}
+
+
+def _init_worker(args):
+    cv2.setNumThreads(1)
+    wargs = copy.copy(args)
+    wargs.track = wargs.abandon = False
+    if not wargs.threads:
+        wargs.threads = 1
+    _WORKER['proc'] = FrameProcessor(create_detector(wargs), wargs)
+
+
+def detect_chunk(path, start, end, seek, preroll):
+    # Processus worker: détections des frames [start, end) -> tableaux compacts (pickle rapide)
+    t0 = time.perf_counter()
+    proc = _WORKER['proc']
+    proc.reset()
+    warm = min(preroll, start) if proc.gate is not None else 0
+    cap = open_at(path, start - warm, seek)
+    idx, counts, boxes, scores, classes, infer_ms = [], [], [], [], [], []
+    raw_counts, raw_boxes, raw_scores, raw_classes = [], [], [], []
+    try:
+        for _ in range(warm):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            proc.gate.update(frame)
+        pos = start
+        while end is None or pos < end:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            pos += 1
+            b, s, c, t = proc.detect(frame, pos)
+            idx.append(pos)  # numéro de frame 1..N, comme run_video
+            counts.append(len(b))
+            boxes.append(np.asarray(b, dtype=np.float32).reshape(-1, 4))
+            scores.append(np.asarray(s, dtype=np.float32).reshape(-1))
+            classes.append(np.asarray(c, dtype=np.int32).reshape(-1))
+            infer_ms.append(np.nan if t is None else t)
+            if proc.record_raw:
+                rb, rs, rc = proc.recorded(b, s, c)
+                raw_counts.append(len(rs))
+                raw_boxes.append(np.asarray(rb, dtype=np.float32).reshape(-1, 4))
+                raw_scores.append(np.asarray(rs, dtype=np.float32).reshape(-1))
+                raw_classes.append(np.asarray(rc, dtype=np.int32).reshape(-1))
+    finally:
+        cap.release()
+    res = {
+        'start': start,
+        'idx': np.asarray(idx, dtype=np.int64),
+        'counts': np.asarray(counts, dtype=np.int64),
+        'boxes': np.concatenate(boxes) if boxes else np.zeros((0, 4), np.float32),
+        'scores': np.concatenate(scores) if scores else np.zeros(0, np.float32),
+        'classes': np.concatenate(classes) if classes else np.zeros(0, np.int32),
+        'nc': proc.det.nc,
+        'infer_ms': np.asarray(infer_ms, dtype=np.float64),
+        'wall_s': time.perf_counter() - t0,
+        'pid': os.getpid(),
+    }
+    if proc.record_raw:
+        res['raw'] = (np.asarray(raw_counts, dtype=np.int64),
+                      np.concatenate(raw_boxes) if raw_boxes else np.zeros((0, 4), np.float32),
+                      np.concatenate(raw_scores) if raw_scores else np.zeros(0, np.float32),
+                      np.concatenate(raw_classes) if raw_classes else np.zeros(0, np.int32))
+    return res
+
+
+def list_videos(source):
+    if os.path.isdir(source):
+        return sorted(str(p) for p in Path(source).rglob('*.mp4'))
+    return [source]
+
+
+def merge_video(futures, proc, sink, fps, log=None, record=None):
+    # Segments dans l'ordre -> tracking séquentiel ; renvoie les stats de la vidéo
+    n_frames = n_infer = 0
+    busy = 0.0
+    expect = None
+    for fut in futures:
+        r = fut.result()
+        busy += r['wall_s']
+        proc.multiclass = r['nc'] > 1
+        if expect is not None and r['idx'].size and r['idx'][0] != expect:
+            print(f"[WARN] Trou entre segments: frame {expect} attendue, {r['idx'][0]} reçue")
+        offs = np.concatenate([[0], np.cumsum(r['counts'])])
+        if 'raw' in r:
+            raw_offs = np.concatenate([[0], np.cumsum(r['raw'][0])])
+        for k, idx in enumerate(r['idx'].tolist()):
+            b = r['boxes'][offs[k]:offs[k + 1]]
+            s = r['scores'][offs[k]:offs[k + 1]]
+            c = r['classes'][offs[k]:offs[k + 1]]
+            if record is not None:
+                if 'raw' in r:
+                    a, z = raw_offs[k], raw_offs[k + 1]
+                    record.write(idx, idx / fps, r['raw'][1][a:z], r['raw'][2][a:z], classes=r['raw'][3][a:z])
+                else:
+                    record.write(idx, idx / fps, b, s, classes=c)
+            boxes, scores, ids, _, classes = proc.track(b, s, idx, c)
+            sink.write(idx, idx / fps, None, boxes, scores, ids, proc.events, classes if proc.multiclass else None)
+            if log is not None:
+                log.write(idx, idx / fps, boxes, scores, ids, classes)
+        if r['idx'].size:
+            expect = int(r['idx'][-1]) + 1
+        n_frames += r['idx'].size
+        n_infer += int(np.isfinite(r['infer_ms']).sum())
+        proc.times.extend(r['infer_ms'][np.isfinite(r['infer_ms'])].tolist())
+    return {'frames': n_frames, 'inferred': n_infer, 'busy_s': busy}
+
+
+def run_reanalyze(args):
+    videos = list_videos(args.source)
+    if not videos:
+        raise SystemExit("[ERREUR] Aucune vidéo")
+    os.makedirs(args.outdir, exist_ok=True)
+    n_workers = args.workers or os.cpu_count() or 1
+    plans = []
+    for vid in videos:
+        n, fps = video_info(vid)
+        if n <= 0:
+            print(f"[WARN] Impossible d'ouvrir: {vid}")
+            continue
+        if args.max_frames:
+            n = min(n, args.max_frames)
+        kf = probe_keyframes(vid, fps)
+        chunks = plan_chunks(n, int(args.chunk_s * fps), kf)
+        if args.max_frames:
+            chunks[-1] = (chunks[-1][0], n)
+        plans.append((vid, fps, chunks))
+        print(f"[PLAN] {os.path.basename(vid)} frames~{n} fps={fps:.2f} segments={len(chunks)} "
+              f"({'images-clés' if kf is not None else 'taille fixe'})")
+    print(f"[INFO] Model={args.model} videos={len(plans)} workers={n_workers}")
+
+    # tracking / abandon rejoués ici: pas de gate ni de détecteur dans ce processus
+    targs = copy.copy(args)
+    targs.motion_gate = targs.roi = False
+    t_start = time.perf_counter()
+    per = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(args,)) as pool:
+        # toutes les vidéos soumises d'emblée: les workers ne chôment pas entre deux fichiers
+        jobs = [[pool.submit(detect_chunk, vid, s, e, args.seek, args.preroll) for s, e in chunks]
+                for vid, _, chunks in plans]
+        for (vid, fps, chunks), futures in zip(plans, jobs):
+            base = os.path.splitext(os.path.basename(vid))[0]
+            t0 = time.perf_counter()
+            proc = FrameProcessor(None, targs, name=base)
+            proc.reset(fps)
+            sink = StreamSink(args.outdir, base)
+            log = None
+            if not args.no_det_log:
+                log = DetLogWriter(detlog_path(args.outdir, base), fps, source=os.path.basename(vid),
+                                   model=os.path.basename(args.model or ''), conf=args.conf,
+                                   kind='tracks' if proc.tracker is not None else 'nms')
+            record = open_record(args, args.outdir, base, fps, os.path.basename(vid))
+            try:
+                st = merge_video(futures, proc, sink, fps, log, record)
+            finally:
+                sink.close()
+                for w in (log, record):
+                    if w is not None:
+                        w.close()
+            st.update({'name': base, 'segments': len(chunks), 'events': len(proc.events),
+                       'infer_mean_ms': float(np.mean(proc.times)) if proc.times else 0.0})
+            per.append(st)
+            print(f"[VIDEO] {base} frames={st['frames']} inferred={st['inferred']} segments={len(chunks)} "
+                  f"infer={st['infer_mean_ms']:.1f} ms events={st['events']} ({time.perf_counter() - t0:.1f} s)")
+    wall = time.perf_counter() - t_start
+    frames = sum(p['frames'] for p in per)
+    busy = sum(p['busy_s'] for p in per)
+    st = {
+        'videos': per,
+        'workers': n_workers,
+        'frames': frames,
+        'wall_s': wall,
+        'fps': frames / wall if wall > 0 else 0.0,
+        # temps cumulé des segments / temps réel: proche de workers si le découpage équilibre bien
+        'parallel_efficiency': busy / wall / n_workers if wall > 0 else 0.0,
+    }
+    print(f"[REANALYZE] videos={len(per)} frames={frames} fps={st['fps']:.1f} workers={n_workers} "
+          f"efficacité={st['parallel_efficiency']:.0%} wall={wall:.1f} s")
+    with open(os.path.join(args.outdir, 'reanalyze_stats.json'), 'w', encoding='utf-8') as f:
+        json.dump(st, f, indent=2)
+    print(f"[DONE] Sorties: {args.outdir}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Ré-analyse hors ligne de vidéos archivées (segments en parallèle, un processus par cœur)')
+    ap.add_argument('--model', default='runs/detect/train3/weights/yolov8n_bag_int8.tflite')
+    ap.add_argument('--source', required=True, help='Vidéo ou dossier (récursif) de .mp4')
+    ap.add_argument('--outdir', default='runs/reanalyze')
+    ap.add_argument('--imgsz', type=int, default=640)
+    ap.add_argument('--conf', type=float, default=0.25)
+    ap.add_argument('--iou', type=float, default=0.45)
+    ap.add_argument('--max-frames', type=int, default=0, help='Frames par vidéo (0 = toutes)')
+    ap.add_argument('--workers', type=int, default=0, help='Processus (0 = nb de cœurs)')
+    ap.add_argument('--chunk-s', type=float, default=60.0, help='Durée cible d\'un segment (s), recalée sur les images-clés')
+    ap.add_argument('--seek', choices=['auto', 'grab'], default='auto', help='auto: seek OpenCV vérifié ; grab: décodage depuis le début (exact, lent)')
+    ap.add_argument('--preroll', type=int, default=25, help='Frames d\'amorçage du MotionGate avant chaque segment')
+    add_detector_args(ap)
+    add_gate_args(ap)
+    add_roi_args(ap)
+    add_track_args(ap)
+    add_abandon_args(ap)
+    add_detlog_args(ap)
+    add_record_args(ap)
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    run_reanalyze(parse_args())
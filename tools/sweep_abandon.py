@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parents[0].parents[0]
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts', ROOT / 'tools'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from detlog import DetLogReader
+from replay import DEFAULTS, Replayer, match_alerts
+
+# Balayage de réglages "objet abandonné" par rejeu des journaux enregistrés (--record), sans inférence
+# - grille (conf, iou, stationary_s, person_radius) ; autres paramètres fixes
+# - une tâche par (réglage, journal), réparties sur un ProcessPoolExecutor
+# - avec --gt (JSON {"<vidéo>": [t_alerte_s, ...]}): TP / FP / FN des alertes 'abandoned' à
+#   +-gt_tol s, précision, rappel, F1 ; tableau trié par F1 (sinon par nombre d'alertes)
+#   python tools/sweep_abandon.py --logs runs/tflite_video --conf 0.25 0.35 0.45 --iou 0.45 0.6 \
+#       --stationary-s 5 10 20 --person-radius 100 150 200 --gt gt_alerts.json --workers 8
+
+_READERS = {}
+
+
+def list_logs(paths):
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(str(f) for f in Path(p).rglob('*_dets.bin')))
+        else:
+            out.append(p)
+    return out
+
+
+def log_name(path: str) -> str:
+    base = os.path.basename(path)
+    for suffix in ('_dets.bin', '_det.bin'):
+        if base.endswith(suffix):
+            return base[:-len(suffix)]
+    return os.path.splitext(base)[0]
+
+
+def replay_job(path: str, params: dict) -> dict:
+    # Processus worker: un journal, un réglage ; lecteurs memmap gardés par processus
+    log = _READERS.get(path)
+    if log is None:
+        log = _READERS[path] = DetLogReader(path)
+    r = Replayer(params).run(log)
+    return {
+        'alerts': [ev['t'] for ev in r['events'] if ev['type'] == 'abandoned'],
+        'events': len(r['events']),
+        'frames': r['frames'],
+        'wall_s': r['wall_s'],
+        'warnings': r['warnings'],
+    }
+
+
+def make_grid(args):
+    fixed = dict(DEFAULTS)
+    fixed.update({'track_thresh': args.track_thresh, 'track_low': args.track_low, 'track_buffer': args.track_buffer,
+                  'unattended_s': args.unattended_s, 'drift_px': args.drift_px,
+                  'person_classes': tuple(args.person_classes), 'agnostic': args.agnostic_nms})
+    grid = []
+    for conf, iou, st, pr in itertools.product(args.conf, args.iou, args.stationary_s, args.person_radius):
+        p = dict(fixed)
+        p.update({'conf': conf, 'iou': iou, 'stationary_s': st, 'person_radius': pr})
+        grid.append(p)
+    return grid
+
+
+def summarize(params, results, names, gt, tol):
+    row = {k: params[k] for k in ('conf', 'iou', 'stationary_s', 'person_radius')}
+    row['alerts'] = sum(len(r['alerts']) for r in results)
+    row['frames'] = sum(r['frames'] for r in results)
+    if gt is not None:
+        tp = fp = fn = 0
+        for name, r in zip(names, results):
+            m = match_alerts([{'type': 'abandoned', 't': t} for t in r['alerts']], gt.get(name, []), tol)
+            tp, fp, fn = tp + m['tp'], fp + m['fp'], fn + m['fn']
+        prec = tp / (tp + fp) if tp + fp else 0.0
+        rec = tp / (tp + fn) if tp + fn else 0.0
+        row.update({'tp': tp, 'fp': fp, 'fn': fn, 'precision': prec, 'recall': rec,
+                    'f1': 2 * prec * rec / (prec + rec) if prec + rec else 0.0})
+    return row
+
+
+def run_sweep(args):
+    paths = []
+    for p in list_logs(args.logs):
+        kind = DetLogReader(p).meta.get('kind', 'nms')
+        if kind in ('nms', 'raw'):
+            paths.append(p)
+        else:
+            print(f"[WARN] {p} ignoré: journal '{kind}' (sorties du tracker), non rejouable")
+    if not paths:
+        raise SystemExit("[ERREUR] Aucun journal (_dets.bin): enregistrer avec video_infer.py / reanalyze.py --record")
+    names = [log_name(p) for p in paths]
+    frames = sum(DetLogReader(p).n_frames for p in paths)
+    gt = None
+    if args.gt:
+        with open(args.gt, 'r', encoding='utf-8') as f:
+            gt = {k: [float(t) for t in v] for k, v in json.load(f).items()}
+        missing = [n for n in names if n not in gt]
+        if missing:
+            print(f"[WARN] Sans vérité terrain (aucune alerte attendue): {', '.join(missing)}")
+    grid = make_grid(args)
+    n_workers = args.workers or os.cpu_count() or 1
+    print(f"[INFO] journaux={len(paths)} frames={frames} réglages={len(grid)} rejeux={len(grid) * len(paths)} workers={n_workers}")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futs = [[pool.submit(replay_job, p, params) for p in paths] for params in grid]
+        rows = []
+        warned = set()
+        for params, fl in zip(grid, futs):
+            results = [f.result() for f in fl]
+            for w in (w for r in results for w in r['warnings']):
+                if w not in warned:
+                    print(f"[WARN] {w}")
+                    warned.add(w)
+            rows.append(summarize(params, results, names, gt, args.gt_tol))
+    wall = time.perf_counter() - t0
+    key = 'f1' if gt is not None else 'alerts'
+    rows.sort(key=lambda r: (-r[key], r['alerts']) if gt is not None else (r['alerts'],))
+
+    cols = ['conf', 'iou', 'stationary_s', 'person_radius', 'alerts'] + (['tp', 'fp', 'fn', 'precision', 'recall', 'f1'] if gt is not None else [])
+    print(' '.join(f"{c:>13}" for c in cols))
+    for r in rows[:args.top or None]:
+        print(' '.join(f"{r[c]:>13.3f}" if isinstance(r[c], float) else f"{r[c]:>13}" for c in cols))
+    print(f"[SWEEP] réglages={len(grid)} frames rejouées={frames * len(grid)} "
+          f"({frames * len(grid) / wall:.0f} frames/s) wall={wall:.1f} s")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'logs': paths, 'gt': args.gt, 'gt_tol': args.gt_tol, 'rows': rows}, f, indent=2)
+        print(f"[DONE] Résultats: {args.out}")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Balayage des seuils "objet abandonné" par rejeu des détections enregistrées')
+    ap.add_argument('--logs', nargs='+', required=True, help='Journaux _dets.bin / _det.bin ou dossiers (récursif, *_dets.bin)')
+    ap.add_argument('--conf', type=float, nargs='+', default=[DEFAULTS['conf']])
+    ap.add_argument('--iou', type=float, nargs='+', default=[DEFAULTS['iou']])
+    ap.add_argument('--stationary-s', type=float, nargs='+', default=[DEFAULTS['stationary_s']])
+    ap.add_argument('--person-radius', type=float, nargs='+', default=[DEFAULTS['person_radius']])
+    ap.add_argument('--unattended-s', type=float, default=DEFAULTS['unattended_s'])
+    ap.add_argument('--drift-px', type=float, default=DEFAULTS['drift_px'])
+    ap.add_argument('--person-classes', type=int, nargs='*', default=[])
+    ap.add_argument('--agnostic-nms', action='store_true', help='NMS toutes classes confondues au rejeu')
+    ap.add_argument('--track-thresh', type=float, default=DEFAULTS['track_thresh'])
+    ap.add_argument('--track-low', type=float, default=DEFAULTS['track_low'])
+    ap.add_argument('--track-buffer', type=int, default=DEFAULTS['track_buffer'])
+    ap.add_argument('--gt', default='', help='JSON {"<vidéo>": [instants des alertes attendues en s]}')
+    ap.add_argument('--gt-tol', type=float, default=15.0, help='Écart max. (s) entre alerte et vérité terrain')
+    ap.add_argument('--workers', type=int, default=0, help='Processus (0 = nb de cœurs)')
+    ap.add_argument('--top', type=int, default=20, help='Lignes affichées (0 = toutes)')
+    ap.add_argument('--out', default='runs/sweep_abandon/sweep.json')
+    return ap.parse_args()
+
+
+if __name__ == '__main__':
+    run_sweep(parse_args())
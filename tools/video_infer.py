@@ -1,122 +1,247 @@
 import os
 import cv2
-import time
 import argparse
 import numpy as np
-import tensorflow as tf
 from pathlib import Path
 
 # Importer post-traitement depuis scripts racine
 import sys
 ROOT = Path(__file__).resolve().parents[0].parents[0]
-if str(ROOT / 'scripts') not in sys.path:
-    sys.path.append(str(ROOT / 'scripts'))
-from postprocess_yolov8 import decode_yolov8_output, nms, scale_coords
-
-def letterbox(im, new_shape=640, color=(114,114,114)):
-    h, w = im.shape[:2]
-    r = min(new_shape / w, new_shape / h)
-    nw, nh = int(round(w*r)), int(round(h*r))
-    im_r = cv2.resize(im, (nw, nh), interpolation=cv2.INTER_LINEAR)
-    canvas = np.full((new_shape, new_shape, 3), color, dtype=im.dtype)
-    top = (new_shape - nh) // 2
-    left = (new_shape - nw) // 2
-    canvas[top:top+nh, left:left+nw] = im_r
-    return canvas
-
-def load_interpreter(model_path: str):
-    interpreter = tf.lite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
-    inp = interpreter.get_input_details()[0]
-    out = interpreter.get_output_details()[0]
-    print(f"[INFO] Model={model_path}\n       Input shape={inp['shape']} dtype={inp['dtype']} quant={inp.get('quantization')}\n       Output shape={out['shape']} dtype={out['dtype']} quant={out.get('quantization')}")
-    return interpreter, inp, out
-
-def prepare_input(frame_bgr, imgsz, inp_detail):
-    img = letterbox(frame_bgr, imgsz)
-    arr = img.astype(np.float32) / 255.0
-    in_shape = inp_detail['shape']
-    in_dtype = inp_detail['dtype']
-    # NCHW vs NHWC
-    if len(in_shape) == 4 and in_shape[1] == 3 and in_shape[2] == imgsz:
-        arr = np.transpose(arr, (2,0,1))[None, ...]
-    else:
-        arr = arr[None, ...]
-    if in_dtype in (np.uint8, np.int8):
-        s, z = inp_detail['quantization']
-        if s == 0: s = 1.0
-        q = arr / s + z
-        if in_dtype == np.uint8:
-            arr = np.clip(np.round(q), 0, 255).astype(np.uint8)
-        else:
-            arr = np.clip(np.round(q), -128, 127).astype(np.int8)
-    return arr
-
-def process_output(raw_out, out_detail):
-    out = raw_out
-    if out_detail['dtype'] in (np.uint8, np.int8):
-        s, z = out_detail['quantization']
-        if s == 0: s = 1.0
-        out = (out.astype(np.float32) - z) * s
-    if out.ndim == 3 and out.shape[1] == 8400 and out.shape[2] == 5:
-        out = np.transpose(out, (0,2,1))
-    return out
+for _p in (ROOT / 'scripts', ROOT / 'dataset' / 'scripts'):
+    if str(_p) not in sys.path:
+        sys.path.append(str(_p))
+from detector import add_detector_args, create_detector
+from video_pipeline import ThreadedPipeline
+from motion_gate import add_gate_args, gate_from_args
+from roi import add_roi_args, roi_detect
+from tracking import add_track_args, tracker_from_args
+from abandon import ABANDONED, abandon_from_args, add_abandon_args
+from detlog import DetLogWriter, add_detlog_args, detlog_path
+from replay import add_record_args, open_record
+from video_writer import add_output_args, output_from_args
+
+class FrameProcessor:
+    # Traitement d'une frame: gate -> (tuiles ROI | image entière) -> tracking -> objets abandonnés
+    # Garde l'état par vidéo (dernières détections, fond MotionGate, pistes) ; reset() entre deux vidéos.
+    # name: préfixe des événements ; slot: Preprocessor dédié dans le détecteur (un par flux en multi-flux)
+    # detector=None: seul track() est utilisable (détections fournies par ailleurs)
+    def __init__(self, detector, args, name='', slot='main'):
+        self.det = detector
+        self.args = args
+        self.name = name
+        self.slot = slot
+        self.gate = gate_from_args(args)
+        self.abandon = abandon_from_args(args)
+        self.tracker = tracker_from_args(args)
+        if self.tracker is None and self.abandon is not None:
+            args.track = True
+            self.tracker = tracker_from_args(args)
+        # --record: journal de rejeu (voir replay.py), ouvert par vidéo dans self.record
+        self.record = None
+        self.record_raw = getattr(args, 'record', 'off') == 'raw' and not getattr(args, 'roi', False)
+        if self.record_raw and detector is not None:
+            detector.record_conf = args.record_conf
+        # multiclass: classes affichées / écrites dans les sorties jsonl (modèle à plusieurs classes)
+        self.multiclass = detector is not None and detector.nc > 1
+        self.reset()
+
+    def reset(self, fps=25.0):
+        # fps: cadence source, sert d'horloge (idx / fps) à la logique objet abandonné
+        self.fps = fps
+        self.times = []
+        self.events = []
+        self.frame_events = []
+        self.last = {}
+        self.last_idx = 0
+        if self.det is not None:
+            self.det.reset()
+        if self.gate is not None:
+            self.gate.reset()
+        if self.tracker is not None:
+            self.tracker.reset()
+        if self.abandon is not None:
+            self.abandon.reset()
+
+    def detect(self, frame, idx=None):
+        # -> boxes (coordonnées image), scores, classes, infer_t (None si frame sautée par le gate)
+        # idx: numéro de frame source, transmis au détecteur (rejeu indexé par frame)
+        args, last = self.args, self.last
+        if self.gate is not None and not self.gate.update(frame) and 'boxes' in last:
+            return last['boxes'], last['scores'], last['classes'], None
+        if args.roi and 'boxes' in last:
+            tile_t = []
+
+            def detect_tile(crop):
+                boxes, scores, classes = self.det.infer(crop, slot=self.slot + ':tile')
+                tile_t.append(self.det.timing['infer_ms'])
+                return boxes, scores, classes
+
+            res = roi_detect(frame, self.gate.mask, self.gate.scale, self.det.imgsz, detect_tile,
+                             last['boxes'], last['scores'], last['classes'], args.iou,
+                             max_tiles=args.roi_max_tiles, max_cover=args.roi_max_cover, margin=args.roi_margin,
+                             agnostic=self.det.agnostic)
+            if res is not None:
+                last['boxes'], last['scores'], last['classes'] = res[:3]
+                return res[0], res[1], res[2], (sum(tile_t) if tile_t else None)
+        d = self.det.detect(frame, slot=self.slot, idx=idx)
+        last['boxes'], last['scores'], last['classes'] = d.boxes, d.scores, d.classes
+        if self.det.candidates is not None:
+            last['cand'] = self.det.candidates
+        return d.boxes, d.scores, d.classes, d.infer_ms
+
+    def __call__(self, frame, idx):
+        # idx: numéro de frame source (1..N) -> boxes, scores, ids (None sans --track), alert (None sans --abandon), classes
+        boxes, scores, classes, infer_t = self.detect(frame, idx)
+        if infer_t is not None:
+            self.times.append(infer_t)
+        if self.record is not None:
+            rb, rs, rc = self.recorded(boxes, scores, classes)
+            self.record.write(idx, idx / self.fps, rb, rs, classes=rc)
+        return self.track(boxes, scores, idx, classes)
+
+    def recorded(self, boxes, scores, classes):
+        # détections à enregistrer pour le rejeu: candidats avant NMS (--record raw) ou détections
+        if self.record_raw and 'cand' in self.last:
+            return self.last['cand']
+        return boxes, scores, classes
+
+    def track(self, boxes, scores, idx, classes=None):
+        # tracking + objets abandonnés sur des détections déjà calculées (ré-analyse par segments)
+        dt = idx - self.last_idx if self.last_idx else 1
+        self.last_idx = idx
+        if classes is None:
+            classes = np.zeros(len(scores), dtype=np.int32)
+        if self.tracker is None:
+            return boxes, scores, None, None, classes
+        # frames jetées (drop_oldest, budget de latence): prédiction Kalman sur l'écart réel
+        tracks = self.tracker.update(boxes, scores, classes, dt=float(max(dt, 1)))
+        ids = tracks[:, 4].astype(np.int64)
+        classes = tracks[:, 6].astype(np.int32)
+        if self.abandon is None:
+            return tracks[:, :4], tracks[:, 5], ids, None, classes
+        t = idx / self.fps
+        # frame_events: événements de cette frame seulement (nouvelle liste à chaque appel)
+        self.frame_events = self.abandon.update(tracks, t)
+        for ev in self.frame_events:
+            print(f"[EVENT] {self.name + ' ' if self.name else ''}t={t:.2f}s {ev['type']} id={ev['track_id']}" + (f" ({ev['reason']})" if 'reason' in ev else ''))
+            self.events.append(ev)
+        return tracks[:, :4], tracks[:, 5], ids, self.abandon.states(ids) == ABANDONED, classes
+
+def draw_detections(frame, boxes, scores, ids=None, alert=None, classes=None):
+    # classes: None pour un modèle mono-classe (libellé "obj")
+    for i, (b, s) in enumerate(zip(boxes, scores)):
+        x1,y1,x2,y2 = map(int, b.tolist())
+        name = "obj" if classes is None else f"c{int(classes[i])}"
+        label = f"{name} {s:.2f}" if ids is None else f"{'' if classes is None else name + ' '}id {ids[i]} {s:.2f}"
+        color = (0,140,255)
+        if alert is not None and alert[i]:
+            label, color = "ABANDON " + label, (0,0,255)
+        cv2.rectangle(frame, (x1,y1), (x2,y2), color, 2)
+        cv2.putText(frame, label, (x1, max(0,y1-5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+
+def run_serial(cap, out, proc, args, base, log=None):
+    # annotation + encodage dans le thread de VideoOutput
+    frame_id = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_id += 1
+        result = proc(frame, frame_id)
+        if log is not None:
+            log.write(frame_id, frame_id / proc.fps, *result[:3], classes=result[4])
+        out.write(frame_id, frame, result, proc.frame_events)
+        if args.max_frames and frame_id >= args.max_frames:
+            break
+        if frame_id % 50 == 0 and proc.times:
+            print(f"[INFO] {base} frame {frame_id} last {proc.times[-1]:.1f} ms")
+
+def run_threaded(cap, out, proc, args, base, log=None):
+    # décodage / inférence / annotation+encodage en parallèle (voir video_pipeline.py)
+    def infer(idx, frame):
+        result = proc(frame, idx)
+        if idx % 50 == 0 and proc.times:
+            print(f"[INFO] {base} frame {idx} last {proc.times[-1]:.1f} ms")
+        return result, proc.frame_events
+
+    def sink(idx, frame, item):
+        # thread d'encodage: frames dans l'ordre, le journal y est écrit sans verrou
+        result, events = item
+        if log is not None:
+            log.write(idx, idx / proc.fps, *result[:3], classes=result[4])
+        out.write(idx, frame, result, events)
+
+    pipe = ThreadedPipeline(cap.read, infer, sink,
+                            decode_depth=args.queue_depth, encode_depth=args.encode_queue_depth,
+                            drop_oldest=args.drop_oldest, max_frames=args.max_frames)
+    st = pipe.run()
+    print(f"[PIPE] {base} read={st['frames_read']} written={st['frames_written']} dropped={st['dropped']} "
+          f"fps={st['fps']:.2f} decode={st['decode_mean_ms']:.1f} ms infer={st['infer_mean_ms']:.1f} ms encode={st['encode_mean_ms']:.1f} ms")
 
 def run_video(args):
-    interpreter, inp, out = load_interpreter(args.model)
+    detector = create_detector(args)
+    print(f"[INFO] Model={args.model}")
+    print(detector.describe())
     if os.path.isdir(args.source):
         videos = [str(p) for p in Path(args.source).glob('*.mp4')]
     else:
         videos = [args.source]
     os.makedirs(args.outdir, exist_ok=True)
+    proc = FrameProcessor(detector, args)
+
+    def draw(frame, result):
+        draw_detections(frame, *result[:4], classes=result[4] if proc.multiclass else None)
+
+    run_loop = run_threaded if args.pipeline == 'threads' else run_serial
     for vid in videos:
         cap = cv2.VideoCapture(vid)
         if not cap.isOpened():
             print(f"[WARN] Impossible d'ouvrir: {vid}")
             continue
         base = os.path.splitext(os.path.basename(vid))[0]
-        out_path = os.path.join(args.outdir, base + '_pred.mp4')
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         fps_in = cap.get(cv2.CAP_PROP_FPS) or 25.0
-        writer = cv2.VideoWriter(out_path, fourcc, fps_in, (int(cap.get(3)), int(cap.get(4))))
-        frame_id = 0
-        times=[]
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame_id += 1
-            arr = prepare_input(frame, args.imgsz, inp)
-            interpreter.set_tensor(inp['index'], arr)
-            t0 = time.time()
-            interpreter.invoke()
-            infer_t = (time.time()-t0)*1000
-            times.append(infer_t)
-            raw = interpreter.get_tensor(out['index'])
-            out_tensor = process_output(raw, out)
-            boxes, scores = decode_yolov8_output(out_tensor, args.conf)
-            if boxes.size:
-                keep = nms(boxes, scores, args.iou)
-                boxes = boxes[keep]
-                scores = scores[keep]
-                boxes = scale_coords((args.imgsz, args.imgsz), boxes.copy(), (frame.shape[0], frame.shape[1]))
-                for b, s in zip(boxes, scores):
-                    x1,y1,x2,y2 = map(int, b.tolist())
-                    cv2.rectangle(frame, (x1,y1), (x2,y2), (0,140,255), 2)
-                    cv2.putText(frame, f"obj {s:.2f}", (x1, max(0,y1-5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,140,255), 1, cv2.LINE_AA)
-            writer.write(frame)
-            if args.max_frames and frame_id >= args.max_frames:
-                break
-            if frame_id % 50 == 0:
-                print(f"[INFO] {base} frame {frame_id} last {infer_t:.1f} ms")
+        # mode threads: le sink tourne déjà dans le thread d'encodage du pipeline
+        out = output_from_args(args, args.outdir, base, fps_in, (int(cap.get(3)), int(cap.get(4))), draw=draw,
+                               threaded=args.pipeline != 'threads')
+        proc.reset(fps_in)
+        log = None
+        if not args.no_det_log:
+            log = DetLogWriter(detlog_path(args.outdir, base), fps_in, source=os.path.basename(vid),
+                               model=os.path.basename(args.model or ''), conf=args.conf,
+                               kind='tracks' if proc.tracker is not None else 'nms')
+        proc.record = open_record(args, args.outdir, base, fps_in, os.path.basename(vid))
+        try:
+            run_loop(cap, out, proc, args, base, log)
+        finally:
+            st_out = out.close()
+            if log is not None:
+                log.close()
+            if proc.record is not None:
+                proc.record.close()
+                proc.record = None
         cap.release()
-        writer.release()
+        times = proc.times
         if times:
             print(f"[STATS] {base} frames={len(times)} mean={np.mean(times):.2f} ms min={np.min(times):.2f} ms max={np.max(times):.2f} ms")
-        print(f"[DONE] Video sortie: {out_path}")
+        if proc.gate is not None:
+            st = proc.gate.stats()
+            print(f"[GATE] {base} frames={st['frames']} inferred={st['inferred']} gated={st['gated']} ratio={st['gated_ratio']:.2%}")
+        if proc.abandon is not None:
+            n = sum(ev['type'] == 'abandoned' for ev in proc.events)
+            print(f"[ABANDON] {base} events={len(proc.events)} abandoned={n}")
+        if log is not None:
+            print(f"[LOG] {base} frames={log.frames} detections={log.records} -> {log.path}")
+        if st_out['mode'] == 'clips':
+            print(f"[DONE] {base} extraits d'alerte: {len(st_out['clips'])} ({st_out['codec'] or '-'}) "
+                  f"pré-roll max {st_out.get('ring_peak_mb', 0.0):.1f} Mo, évincées (budget) {st_out.get('ring_evicted_budget', 0)}")
+            for c in st_out['clips']:
+                print(f"       {c}")
+        elif st_out['mode'] != 'none':
+            print(f"[DONE] Video sortie: {out.path} ({st_out['codec']}, {st_out['frames_written']} frames, "
+                  f"encodage {st_out['encode_mean_ms']:.1f} ms/frame)")
 
 def parse_args():
-    ap = argparse.ArgumentParser(description='Inference vidéo YOLOv8 TFLite')
+    ap = argparse.ArgumentParser(description='Inference vidéo YOLOv8 (TFLite / ONNX Runtime)')
     ap.add_argument('--model', default='runs/detect/train3/weights/yolov8n_bag_int8.tflite')
     ap.add_argument('--source', required=True, help='Chemin vidéo ou dossier de vidéos')
     ap.add_argument('--outdir', default='runs/tflite_video')
@@ -124,7 +249,23 @@ def parse_args():
     ap.add_argument('--conf', type=float, default=0.25)
     ap.add_argument('--iou', type=float, default=0.45)
     ap.add_argument('--max-frames', type=int, default=0)
-    return ap.parse_args()
+    ap.add_argument('--pipeline', choices=['serial', 'threads'], default='serial', help='serial: boucle séquentielle ; threads: décodage/inférence/encodage en parallèle')
+    ap.add_argument('--queue-depth', type=int, default=4, help='Taille file décodage -> inférence (mode threads)')
+    ap.add_argument('--encode-queue-depth', type=int, default=4, help='Taille file inférence -> encodage (mode threads)')
+    ap.add_argument('--drop-oldest', action='store_true', help='Source live: jeter la frame la plus ancienne si l\'inférence est en retard')
+    add_detector_args(ap)
+    add_gate_args(ap)
+    add_roi_args(ap)
+    add_track_args(ap)
+    add_abandon_args(ap)
+    add_detlog_args(ap)
+    add_record_args(ap)
+    add_output_args(ap)
+    args = ap.parse_args()
+    if args.video_out == 'clips' and not args.abandon:
+        # extraits déclenchés par les alertes 'abandoned' uniquement: sans --abandon, aucune vidéo
+        ap.error("--video-out clips nécessite --abandon (extraits autour des alertes objet abandonné)")
+    return args
 
 if __name__ == '__main__':
     args = parse_args()